@@ -1,7 +1,11 @@
 \c data
 
+-- Keep in sync with `RESULT_COLUMNS` within `ingest.py`.
 create table if not exists result (
-  method                  char    (64) not null,
+  result                  text,
+  host                    text,
+  partition               text,
+  method                  text         not null,
   input                   text         not null,
   size                    bigint       not null,
   threshold               integer      not null,
@@ -21,6 +25,33 @@ create table if not exists result (
   sw_context_switches     bigint       not null,
   sw_cpu_migrations       bigint       not null,
   id                      integer      not null,
-  description             char    (64) not null,
-  run_type                char    (64) not null
+  description             text         not null,
+  run_type                text         not null,
+  retries                 integer,
+  core                    integer,
+  exec                    text,
+  seq                     integer
+) partition by list (description);
+
+-- Cascades to every partition.
+create index if not exists result_lookup_idx on result (method, description, size, threshold);
+create index if not exists result_result_idx on result (result);
+
+-- One partition per input type, created on demand.
+create or replace function ensure_result_partition(d text)
+returns void as $$
+begin
+  execute format(
+    'create table if not exists %I partition of result for values in (%L)',
+    'result_' || d, d
+  );
+end $$ language plpgsql;
+
+-- Bytes/rows of every CSV already ingested by `ingest.py`.
+create table if not exists ingest_watermark (
+  result        text    not null,
+  csv           text    not null,
+  offset_bytes  bigint  not null,
+  num_rows      bigint  not null,
+  primary key (result, csv)
 );
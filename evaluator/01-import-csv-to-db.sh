@@ -1,6 +1,22 @@
 #!/usr/bin/env sh
+# Initial import of the newest result, use `ingest.py` to load every result
+# (and any new rows) afterwards.
 
-latest_result_dir="$(find /results/ -maxdepth 1 -type d | sort | tail -n 1)"
-latest_csv="$(find "$latest_result_dir" -name "*.csv")"
+latest_result_dir="$(find /results/ -mindepth 1 -maxdepth 1 -type d | sort | tail -n 1)"
+[ -n "$latest_result_dir" ] || exit 0
+result="$(basename "$latest_result_dir")"
+partition="$(cat "$latest_result_dir/partition" 2>/dev/null)"
+# The top level "Node" of job_details.json, like `ingest.py`.
+host="$(sed -n 's/^    "Node": "\(.*\)",$/\1/p' "$latest_result_dir/job_details.json" 2>/dev/null)"
 
-psql -U postgres -d data -c "COPY result from '$latest_csv' DELIMITER ',' CSV HEADER;"
+for csv in $(find "$latest_result_dir" -maxdepth 1 -name "output*.csv" | sort); do
+	# Passthrough columns vary between versions of jobs.py.
+	cols="$(head -n 1 "$csv")"
+	psql -v ON_ERROR_STOP=1 -U postgres -d data <<-SQL
+		create temp table staging as select $cols from result limit 0;
+		\copy staging ($cols) from '$csv' with (format csv, header)
+		select ensure_result_partition(d) from (select distinct description as d from staging) as s;
+		insert into result (result, host, partition, $cols) select '$result', nullif('$host', ''), nullif('$partition', ''), $cols from staging;
+		insert into ingest_watermark values ('$result', '$(basename "$csv")', $(wc -c < "$csv"), (select count(*) from staging));
+	SQL
+done
@@ -12,13 +12,14 @@ from typing import Optional
 import dash
 import numpy as np
 import pandas as pd
+import plotly.graph_objects as go
 from bokeh.io import output_file, save
 from bokeh.layouts import gridplot
 from bokeh.models import ColumnDataSource, NumeralTickFormatter
 from bokeh.palettes import Spectral4
 from bokeh.plotting import figure
 from bokeh.util.browser import view
-from dash import dcc
+from dash import Input, Output, dcc, html
 
 # TODO: Add cachegrind / callgrind / massif support.
 
@@ -29,6 +30,9 @@ pd.set_option("display.width", None)
 EXEC_PATH = Path("./src/c/HSO-c")
 RESULTS_DIR = Path("./results")
 
+# Maximum number of points sent to the browser for a single curve.
+MAX_POINTS = 500
+
 GRAPH_ORDER = (
     "random",
     "pipe_organ",
@@ -116,36 +120,229 @@ def update_info(info_json):
     return [dcc.Markdown(formatted_md)]
 
 
-def df_from_json(json_df):
-    """Convert JSON to a dataframe."""
-    if not json_df:
-        raise dash.exceptions.PreventUpdate
-    df = pd.read_json(json_df)
-    return df
-
-
-def update_threshold_slider(json_df):
+def downsample(df: pd.DataFrame, x: str, y: str, max_points=MAX_POINTS):
+    """
+    Reduce a dense curve to roughly `max_points` points.
+
+    The curve is split into equally sized buckets along x, and only the
+    minimum and maximum of every bucket are kept, so the optimum and any
+    spikes stay visible.
+    """
+    if len(df) <= max_points:
+        return df
+
+    df = df.sort_values(by=x)
+    buckets = np.arange(len(df)) * max(max_points // 2, 1) // len(df)
+    grouped = pd.Series(df[y].to_numpy()).groupby(buckets)
+    keep = np.union1d(grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy())
+    return df.iloc[keep]
+
+
+class Tiles:
+    """
+    Pre-aggregated slices of a result, one per (executable, type, size).
+
+    The whole result is aggregated a single time, individual tiles are only
+    split out the first time they are requested by the dashboard. Runs of
+    different executables (`jobs.py` interleaving several) are never averaged
+    together.
+    """
+
+    def __init__(self, df: pd.DataFrame, col="wall_secs"):
+        if "run_type" in df.columns:
+            df = df[df["run_type"] == "base"]
+
+        by = ["description", "size", "method", "threshold"]
+        if "exec" in df.columns:
+            by = ["exec"] + by
+        self.col = col
+        self.agg = df.groupby(by, observed=True)[col].agg(["mean", "std"])
+        self.agg = self.agg.reset_index()
+
+        self.executables = []
+        if "exec" in self.agg.columns:
+            self.executables = sorted(str(i) for i in self.agg["exec"].unique())
+
+        self.types = sorted(self.agg["description"].unique())
+        self.sizes = {
+            k: sorted(int(i) for i in v)
+            for k, v in self.agg.groupby("description")["size"].unique().items()
+        }
+        self.thresholds = sorted(
+            int(i) for i in self.agg["threshold"].unique() if i > 0
+        ) or [0]
+        self._tiles = {}
+
+    def get(
+        self, type_: str, size: int, executable: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Get a single (type, size) slice.
+
+        @param executable: Executable of the slice, may be omitted if the result
+                           has (at most) one.
+        """
+        if executable is None and len(self.executables) > 1:
+            raise ValueError(f"Select one of the executables {self.executables}")
+        if executable is not None and executable not in self.executables:
+            raise ValueError(f"Executable '{executable}' not in {self.executables}")
+
+        key = (executable, type_, size)
+        if key not in self._tiles:
+            agg = self.agg
+            tile = agg[(agg["description"] == type_) & (agg["size"] == size)]
+            if executable is not None:
+                tile = tile[tile["exec"].astype(str) == executable]
+            tile = tile.drop(columns=["exec", "description", "size"], errors="ignore")
+            self._tiles[key] = tile
+        return self._tiles[key]
+
+
+def update_threshold_slider(tiles: Tiles):
     """Update the bounds for the threshold slider."""
-    df = df_from_json(json_df)
-    marks = {int(i): "" for i in sorted(df["threshold"].unique())}
+    marks = {i: "" for i in tiles.thresholds}
     return (
-        df["threshold"].min(),
-        df["threshold"].max(),
+        tiles.thresholds[0],
+        tiles.thresholds[-1],
         marks,
     )
 
 
-def update_size_slider(json_df):
+def update_size_slider(tiles: Tiles, type_: str):
     """Update the bounds for the size slider."""
-    df = df_from_json(json_df)
-    marks = {int(i): "" for i in sorted(df["size"].unique())}
+    sizes = tiles.sizes.get(type_) or [0]
+    marks = {i: "" for i in sizes}
     return (
-        df["size"].min(),
-        df["size"].max(),
+        sizes[0],
+        sizes[-1],
         marks,
     )
 
 
+def threshold_figure(tile, threshold_range, title=None):
+    """Create the threshold vs. runtime figure of a single tile."""
+    low, high = threshold_range
+    fig = go.Figure()
+
+    # Standard methods are only ever run with a threshold of 0.
+    max_threshold = tile.groupby("method", observed=True)["threshold"].transform("max")
+    is_threshold = max_threshold > 0
+    for method, df in tile[is_threshold].groupby("method", observed=True):
+        df = df[(df["threshold"] >= low) & (df["threshold"] <= high)]
+        df = downsample(df, "threshold", "mean")
+        fig.add_trace(
+            go.Scatter(
+                x=df["threshold"],
+                y=df["mean"],
+                error_y={"type": "data", "array": df["std"]},
+                mode="lines+markers",
+                name=method,
+            )
+        )
+
+    # Methods without a threshold are constant across the threshold axis.
+    for row in tile[~is_threshold].itertuples():
+        fig.add_trace(
+            go.Scatter(
+                x=[low, high],
+                y=[row.mean, row.mean],
+                mode="lines",
+                line={"dash": "dash"},
+                name=row.method,
+            )
+        )
+
+    fig.update_layout(
+        title=title,
+        xaxis_title="Threshold",
+        yaxis_title="Runtime",
+        template="plotly_white",
+    )
+    return fig
+
+
+def build_dashboard(result, tiles: Tiles) -> dash.Dash:
+    """Create the Dash app, only the selected slice is ever sent to the browser."""
+    app = dash.Dash(__name__, title="Sorting Optimization Results")
+
+    info = []
+    if result.job_details:
+        details = dict(
+            result.job_details,
+            partition=result.partition,
+            actual_num_sorts=len(result.df),
+        )
+        info = update_info(json.dumps(details))
+
+    threshold_min, threshold_max, threshold_marks = update_threshold_slider(tiles)
+    app.layout = html.Div(
+        [
+            html.Div(info, className="pretty_container"),
+            html.Div(
+                [
+                    dcc.Dropdown(
+                        id="exec",
+                        options=tiles.executables,
+                        value=(tiles.executables or [None])[0],
+                        clearable=False,
+                        # Only worth a choice with several executables.
+                        style={} if len(tiles.executables) > 1 else {"display": "none"},
+                    ),
+                    dcc.Dropdown(
+                        id="type",
+                        options=tiles.types,
+                        value=tiles.types[0],
+                        clearable=False,
+                    ),
+                    dcc.Slider(id="size", step=None),
+                    dcc.RangeSlider(
+                        id="threshold",
+                        min=threshold_min,
+                        max=threshold_max,
+                        marks=threshold_marks,
+                        value=[threshold_min, threshold_max],
+                        step=None,
+                    ),
+                ],
+                className="pretty_container",
+            ),
+            dcc.Graph(id="graph", className="pretty_container"),
+        ]
+    )
+
+    @app.callback(
+        Output("size", "min"),
+        Output("size", "max"),
+        Output("size", "marks"),
+        Output("size", "value"),
+        Input("type", "value"),
+    )
+    def _update_size(type_):
+        minimum, maximum, marks = update_size_slider(tiles, type_)
+        return minimum, maximum, marks, maximum
+
+    @app.callback(
+        Output("graph", "figure"),
+        Input("exec", "value"),
+        Input("type", "value"),
+        Input("size", "value"),
+        Input("threshold", "value"),
+    )
+    def _update_graph(executable, type_, size, threshold_range):
+        if type_ is None or size is None:
+            raise dash.exceptions.PreventUpdate
+        title = f"Threshold vs. Mean Wall Time (size = {size:,}): {type_.capitalize()}"
+        if executable is not None:
+            title = f"{title} ({executable})"
+        return threshold_figure(
+            tiles.get(type_, size, executable),
+            threshold_range,
+            title=title,
+        )
+
+    return app
+
+
 def get_avg_df(df: pd.DataFrame) -> pd.DataFrame:
     """Compute a pivot'ed dataframe and the aggregated features."""
     pivot_columns = [
@@ -193,15 +390,23 @@ class Result:
             raise NotADirectoryError(f"'{self.path}' is not a directory")
 
         # Load df
-        csvs = tuple(self.path.glob("output*.csv"))
+        csvs = sorted(self.path.glob("output*.csv"))
         if not csvs:
             raise FileNotFoundError(f"No CSV files found in '{self.path}'")
-        in_csv = Path(csvs[0])
-        self.df = pd.read_csv(in_csv)
+        # A work queue has one CSV per worker.
+        self.df = pd.concat([pd.read_csv(i) for i in csvs], ignore_index=True)
 
         # Drop unnecessary columns
         self.df = self.df.drop(["input", "id"], axis=1)
 
+        # Only the dashboard keeps the runs of several executables apart.
+        if "exec" in self.df.columns and self.df["exec"].nunique() > 1:
+            logging.warning(
+                "'%s' compares %s, the static plots mix every executable",
+                str(self.path),
+                sorted(self.df["exec"].unique()),
+            )
+
         # Convert from nanoseconds to seconds
         time_columns = [i for i in list(self.df.columns) if i.endswith("_nsecs")]
         for i in time_columns:
@@ -405,14 +610,18 @@ def main():
     ch.setFormatter(formatter)
     logger.addHandler(ch)
 
-    args = sys.argv
-    if len(args) > 2:
-        print("Usage: evaluator")
-        print("       evaluator RESULTS_DIR")
+    args = sys.argv[1:]
+    static = "--static" in args
+    if static:
+        args.remove("--static")
+
+    if len(args) > 1:
+        print("Usage: evaluator [--static]")
+        print("       evaluator [--static] RESULTS_DIR")
         exit()
 
-    if len(args) == 2:
-        result = Result(Path(args[1]))
+    if len(args) == 1:
+        result = Result(Path(args[0]))
     else:
         base_results_dir = Path("./results")
         if not base_results_dir.is_dir():
@@ -421,8 +630,13 @@ def main():
         last_result_path = get_latest_subdir(base_results_dir)
         result = Result(last_result_path)
 
-    output_path = result.plot()
-    view(str(output_path))
+    if static:
+        output_path = result.plot()
+        view(str(output_path))
+        return
+
+    app = build_dashboard(result, Tiles(result.df))
+    app.run(debug=False)
 
 
 if __name__ == "__main__":
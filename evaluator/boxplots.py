@@ -12,7 +12,9 @@ import scienceplots
 # Yes this is ugly, fix it later.
 sys.path.insert(0, "../evaluator")
 
-from mpl import Result, get_avg_df
+from mpl import relative_to_baseline
+from multi import RESULT_KEYS, load_results, most_improved
+from render import FigureSpec, render_figures
 
 pd.set_option("display.max_rows", None)
 pd.set_option("display.max_columns", None)
@@ -50,21 +52,18 @@ def build_parser():
         required=True,
         type=Path,
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        type=int,
+        default=None,
+        help="Number of results to load in parallel.",
+    )
     return parser
 
 
-def generate_boxplots(paths: list[Path], output_dir: Path):
-    results = [Result(i) for i in paths]
-
-    cols = [
-        "method",
-        "description",
-        # "threshold",
-        # "size",
-        "wall_nsecs_relative",
-        # "host",
-    ]
-
+def generate_boxplots(paths: list[Path], output_dir: Path, jobs=None):
     rename_methods_map = {
         "msort_heap_with_old_ins": "Mergesort w/ Primitive InsSort",
         "msort_heap_with_basic_ins": "Mergesort w/ Basic InsSort",
@@ -84,76 +83,55 @@ def generate_boxplots(paths: list[Path], output_dir: Path):
         "pipe_organ": "Pipe Organ",
     }
 
-    most_improved = pd.DataFrame(columns=cols)
+    df = load_results(paths, jobs=jobs)
+    df = df.replace(rename_methods_map)
+    df = df.replace(rename_standard_methods_map)
+    df = df.replace(rename_data_map)
+
+    df = df[df["method"] != "Quicksort w/ Fast InsSort"]
+    df = df[df["method"] != "Quicksort w/ InsSort"]
 
-    for r in results:
+    most_improved_df = most_improved(
+        relative_to_baseline(df, "qsort", keys=RESULT_KEYS)
+    )
 
-        r._threshold_methods.update(set(rename_methods_map.values()))
-        r._standard_methods.update(set(rename_standard_methods_map.values()))
-        r.df = r.df.replace(rename_methods_map)
-        r.df = r.df.replace(rename_standard_methods_map)
-        r.df = r.df.replace(rename_data_map)
+    specs = []
+    for i, ((type_, size), type_df) in enumerate(
+        most_improved_df.groupby(["description", "size"])
+    ):
+        specs.append(
+            FigureSpec(
+                str(i),
+                plot_boxplot,
+                {"df": type_df[["method", "relative"]], "type_": type_, "size": size},
+            )
+        )
 
-        host = r.job_details.get("Node")
-        df = r.df
-        df = df[df["method"] != "Quicksort w/ Fast InsSort"]
-        df = df[df["method"] != "Quicksort w/ InsSort"]
+    render_figures(specs, output_dir, jobs=jobs)
 
-        baseline_df = df[df["method"] == "qsort"]
-        df = df[df["method"] != "qsort"]
 
-        baseline_df = get_avg_df(baseline_df)
-        dfs_by_type = r.gen_sub_dfs(df)
+def plot_boxplot(df: pd.DataFrame, type_: str, size: int):
+    """Plot the best runtime of each method relative to qsort."""
+    type_ = type_.title()
 
-        for type_, dfs in dfs_by_type.items():
-            den = (
-                baseline_df[baseline_df["description"] == type_][("mean", "wall_nsecs")]
-                .reset_index(drop=True)
-                .mean()
-            )
-            for method, sub_df in dfs.items():
-                num = sub_df[("mean", "wall_nsecs")].reset_index(drop=True)
-                relative = num / den
-                sub_df["wall_nsecs_relative"] = relative.values * 100
-
-        for type_, dfs in dfs_by_type.items():
-            for method, sub_df in dfs.items():
-                min_val = sub_df["wall_nsecs_relative"].min()
-                min_row = sub_df[sub_df["wall_nsecs_relative"] == min_val].copy()
-                min_row["host"] = host
-                min_row = min_row[cols]
-                min_row.columns = min_row.columns.droplevel(1)
-                most_improved = pd.concat([most_improved, min_row], axis=0)
-
-    size = df["size"].unique()[0]
-    types = sorted(most_improved["description"].unique())
-    for i in types:
-        type_df = most_improved[most_improved["description"] == i]
-        type_ = i.title()
-
-        title = f"""Runtime Relative to GNU glibc's \\texttt{{qsort}} Across Various Platforms
-        Input size = {size:,}
-        {type_}"""
-
-        ax = type_df.boxplot(
-            by=["method"],
-            grid=False,
-        )
-        ax.axhline(100, color="red", linestyle="--")
+    title = f"""Runtime Relative to GNU glibc's \\texttt{{qsort}} Across Various Platforms
+    Input size = {size:,}
+    {type_}"""
 
-        # Remove default stuff from pandas
-        ax.set_xlabel("")
-        ax.get_figure().suptitle("")
+    ax = df.boxplot(
+        by="method",
+        grid=False,
+    )
+    ax.axhline(100, color="red", linestyle="--")
 
-        # Seet rest of deatils
-        ax.set_ylabel("\% of \\texttt{qsort} runtime")
-        ax.set_title(title)
-        ax.get_figure().tight_layout()
+    # Remove default stuff from pandas
+    ax.set_xlabel("")
+    ax.get_figure().suptitle("")
 
-    figs = [plt.figure(n) for n in plt.get_fignums()]
-    for i, v in enumerate(figs):
-        dst = output_dir / f"{i}.gen.png"
-        v.savefig(dst, bbox_inches="tight")
+    # Seet rest of deatils
+    ax.set_ylabel("\% of \\texttt{qsort} runtime")
+    ax.set_title(title)
+    ax.get_figure().tight_layout()
 
 
 if __name__ == "__main__":
@@ -163,4 +141,4 @@ if __name__ == "__main__":
 
     args["output"].mkdir(exist_ok=True)
 
-    generate_boxplots(args["RESULT_DIRS"], args["output"])
+    generate_boxplots(args["RESULT_DIRS"], args["output"], jobs=args["jobs"])
@@ -0,0 +1,7 @@
+"""
+Columns shared by the evaluator modules, kept apart from `mpl` so the modules
+it imports can use them too.
+"""
+
+# Columns used to identify a single group of runs.
+GROUP_COLUMNS = ["method", "description", "threshold", "size"]
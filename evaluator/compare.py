@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Detect performance regressions between a baseline and a candidate result.
+
+Groups (method, description, threshold, size) found in both results are
+compared with the same statistics as `significance.py`: a bootstrap confidence
+interval of the speedup (baseline mean / candidate mean) and a Mann-Whitney U
+test. P-values are adjusted for the number of groups (Benjamini-Hochberg).
+
+A group is a regression if the candidate is significantly slower, by more
+than the tolerance, and the whole interval is below 1. Exits with 1 if any
+group regressed, so it can gate a rebuild.
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Yes this is ugly, fix it later.
+sys.path.insert(0, str(Path(__file__).parent))
+
+from columns import GROUP_COLUMNS
+from mpl import Result
+from noise import NOISE_MODES
+from significance import bootstrap_speedup, mann_whitney, pad_groups
+
+
+def adjust_p_values(p: np.ndarray) -> np.ndarray:
+    """Benjamini-Hochberg adjusted p-values (false discovery rate)."""
+    n = len(p)
+    if n == 0:
+        return p
+    order = np.argsort(p)
+    ranked = p[order] * n / np.arange(1, n + 1)
+    # Monotone from the largest p-value down.
+    ranked = np.minimum.accumulate(ranked[::-1])[::-1]
+    out = np.empty(n)
+    out[order] = np.minimum(ranked, 1)
+    return out
+
+
+def _runs(df: pd.DataFrame, keys: pd.MultiIndex, col: str):
+    """Pad the runs of every group within `keys`, see `pad_groups`."""
+    codes = keys.get_indexer(pd.MultiIndex.from_frame(df[GROUP_COLUMNS]))
+    keep = codes >= 0
+    return pad_groups(df[col].to_numpy(dtype=float)[keep], codes[keep], len(keys))
+
+
+def compare(
+    baseline: pd.DataFrame,
+    candidate: pd.DataFrame,
+    col="wall_nsecs",
+    confidence=0.95,
+    alpha=0.05,
+    tolerance=0.01,
+    num_resamples=1000,
+    seed: Optional[int] = None,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Compare every group of the candidate against the same group of the baseline.
+
+    @param baseline: Every run of the baseline, with `GROUP_COLUMNS` and `col`.
+    @param candidate: Every run of the candidate.
+    @param confidence: Confidence level of the speedup interval.
+    @param alpha: Significance level, after adjusting for the number of groups.
+    @param tolerance: Smallest change (fraction) reported as a regression or
+                      improvement.
+    @returns (table, summary). The table has one row per shared group with
+             the columns: baseline_mean, candidate_mean, speedup, speedup_low,
+             speedup_high, p_value, p_adjusted and status (regression,
+             improvement or unchanged), worst regression first.
+    """
+    dfs = []
+    for df in (baseline, candidate):
+        df = df[GROUP_COLUMNS + [col]].copy()
+        df["method"] = df["method"].astype(str)
+        df["description"] = df["description"].astype(str)
+        dfs.append(df)
+    baseline, candidate = dfs
+
+    base_keys = pd.MultiIndex.from_frame(baseline[GROUP_COLUMNS].drop_duplicates())
+    cand_keys = pd.MultiIndex.from_frame(candidate[GROUP_COLUMNS].drop_duplicates())
+    keys = base_keys.intersection(cand_keys).sort_values()
+    if keys.empty:
+        raise ValueError("The results do not share any group")
+
+    y, ny = _runs(baseline, keys, col)
+    x, nx = _runs(candidate, keys, col)
+
+    table = keys.to_frame(index=False)
+    table["baseline_runs"] = ny
+    table["candidate_runs"] = nx
+    table["baseline_mean"] = np.nanmean(y, axis=1)
+    table["candidate_mean"] = np.nanmean(x, axis=1)
+    table["speedup"] = table["baseline_mean"] / table["candidate_mean"]
+    table["speedup_low"], table["speedup_high"] = bootstrap_speedup(
+        x, nx, y, ny, confidence, num_resamples, seed
+    )
+    _, p_value = mann_whitney(x, nx, y, ny)
+    table["p_value"] = p_value
+    table["p_adjusted"] = adjust_p_values(p_value)
+
+    significant = table["p_adjusted"] < alpha
+    slower = (table["speedup_high"] < 1) & (table["speedup"] < 1 - tolerance)
+    faster = (table["speedup_low"] > 1) & (table["speedup"] > 1 + tolerance)
+    table["status"] = np.select(
+        [significant & slower, significant & faster],
+        ["regression", "improvement"],
+        "unchanged",
+    )
+    table = table.sort_values(by="speedup", kind="stable").reset_index(drop=True)
+
+    counts = table["status"].value_counts()
+    summary = {
+        "groups": len(table),
+        "regressions": int(counts.get("regression", 0)),
+        "improvements": int(counts.get("improvement", 0)),
+        "unchanged": int(counts.get("unchanged", 0)),
+        "baseline_only": len(base_keys.difference(cand_keys)),
+        "candidate_only": len(cand_keys.difference(base_keys)),
+        "geomean_speedup": float(np.exp(np.log(table["speedup"]).mean())),
+    }
+    return table, summary
+
+
+def format_report(table: pd.DataFrame, summary: dict, top=20) -> str:
+    """Human readable report, the `top` worst regressions and best improvements."""
+    cols = GROUP_COLUMNS + ["speedup", "speedup_low", "speedup_high", "p_adjusted"]
+    lines = [
+        f"Groups compared:  {summary['groups']}"
+        f" ({summary['baseline_only']} baseline only,"
+        f" {summary['candidate_only']} candidate only)",
+        f"Geomean speedup:  {summary['geomean_speedup']:.4f}",
+        f"Regressions:      {summary['regressions']}",
+        f"Improvements:     {summary['improvements']}",
+    ]
+
+    regressions = table[table["status"] == "regression"]
+    if not regressions.empty:
+        lines += ["", "Regressions (slowest first):"]
+        lines.append(regressions[cols].head(top).to_string(index=False))
+
+    improvements = table[table["status"] == "improvement"]
+    if not improvements.empty:
+        lines += ["", "Improvements (fastest first):"]
+        improvements = improvements.iloc[::-1]
+        lines.append(improvements[cols].head(top).to_string(index=False))
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "BASELINE",
+        action="store",
+        type=Path,
+        help="Baseline result directory.",
+    )
+    parser.add_argument(
+        "CANDIDATE",
+        action="store",
+        type=Path,
+        help="Candidate result directory, may be the baseline with --*-exec.",
+    )
+    parser.add_argument(
+        "--baseline-exec",
+        action="store",
+        help="Only use the runs of this executable from the baseline.",
+    )
+    parser.add_argument(
+        "--candidate-exec",
+        action="store",
+        help="Only use the runs of this executable from the candidate.",
+    )
+    parser.add_argument(
+        "-c",
+        "--col",
+        action="store",
+        default="wall_nsecs",
+        help="Column to compare.",
+    )
+    parser.add_argument(
+        "--confidence",
+        action="store",
+        type=float,
+        default=0.95,
+        help="Confidence level of the speedup interval.",
+    )
+    parser.add_argument(
+        "--alpha",
+        action="store",
+        type=float,
+        default=0.05,
+        help="Significance level, after adjusting for the number of groups.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        action="store",
+        type=float,
+        default=1.0,
+        help="Smallest change in percent reported as a regression.",
+    )
+    parser.add_argument(
+        "--resamples",
+        action="store",
+        type=int,
+        default=1000,
+        help="Number of bootstrap resamples.",
+    )
+    parser.add_argument(
+        "--seed",
+        action="store",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--denoise",
+        action="store",
+        choices=NOISE_MODES[:1],
+        help="Drop runs perturbed by other processes, see noise.py.",
+    )
+    parser.add_argument(
+        "--top",
+        action="store",
+        type=int,
+        default=20,
+        help="Number of regressions/improvements to print.",
+    )
+    parser.add_argument(
+        "--json",
+        metavar="FILE",
+        action="store",
+        type=Path,
+        help="Save the summary and every group to a JSON file.",
+    )
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    baseline = Result(args.BASELINE, denoise=args.denoise, executable=args.baseline_exec)
+    candidate = Result(
+        args.CANDIDATE, denoise=args.denoise, executable=args.candidate_exec
+    )
+    table, summary = compare(
+        baseline.df,
+        candidate.df,
+        col=args.col,
+        confidence=args.confidence,
+        alpha=args.alpha,
+        tolerance=args.tolerance / 100,
+        num_resamples=args.resamples,
+        seed=args.seed,
+    )
+
+    print(format_report(table, summary, top=args.top))
+    if args.json is not None:
+        report = {
+            "baseline": {"path": str(args.BASELINE), "exec": args.baseline_exec},
+            "candidate": {"path": str(args.CANDIDATE), "exec": args.candidate_exec},
+            "col": args.col,
+            "summary": summary,
+            "groups": table.to_dict(orient="records"),
+        }
+        with open(args.json, "w") as fp:
+            json.dump(report, fp, indent=4)
+
+    return 1 if summary["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Estimate the drift of the machine over the course of a result.
+
+Every run is expressed relative to the median of its group, so only the
+effect of *when* it ran remains. The trend of that ratio over the run order
+(the `seq` column written by `jobs.py`) is the drift: a slowly heating or
+throttling node shows up as a slope. It is only reported once its confidence
+interval excludes +-`MAX_DRIFT`, so noise alone doesn't.
+
+Drift only biases a threshold curve if the run order is confounded with the
+threshold, which is checked by the rank correlation of threshold and run order
+within every method. `jobs.py --order=random` (or latin) keeps it near 0.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from columns import GROUP_COLUMNS
+
+# Report drift (fraction over the whole result) confidently above this.
+MAX_DRIFT = 0.01
+
+# Two sided 95% quantile of the normal distribution.
+Z_95 = 1.959964
+
+# Report methods whose thresholds correlate with the run order above this.
+MAX_ORDER_CORRELATION = 0.3
+
+
+def relative_to_group(df: pd.DataFrame, col="wall_nsecs") -> pd.Series:
+    """
+    log(value / group median) of every run, winsorized to the 1st and 99th
+    percentile so a few outliers (cold caches, ...) don't dominate the trend.
+    """
+    median = df.groupby(GROUP_COLUMNS, observed=True)[col].transform("median")
+    with np.errstate(divide="ignore"):
+        ratio = np.log(df[col] / median).replace([np.inf, -np.inf], np.nan)
+    return ratio.clip(ratio.quantile(0.01), ratio.quantile(0.99))
+
+
+def estimate_drift(df: pd.DataFrame, col="wall_nsecs", bins=10) -> dict:
+    """
+    Estimate the drift of `col` over the run order.
+
+    The runs of a job share its position and machine state, so the trend is
+    fitted to the mean of every job rather than to every run, which would
+    understate its standard error.
+
+    @param df: Every run, with a `seq` column.
+    @param bins: Number of equally sized spans of the run order to summarize.
+    @returns The least squares `slope` (log ratio per job) and its `stderr`,
+             the resulting `drift` over the whole result (ex: 0.02 is 2%
+             slower by the end) within its 95% confidence interval (`low`,
+             `high`), and the mean drift within every span (`bins`), relative
+             to the whole result.
+    """
+    ratio = relative_to_group(df, col)
+    seq = df["seq"].astype(float)
+    keep = ratio.notna() & (seq >= 0)
+    ratio, seq = ratio[keep], seq[keep]
+    if seq.nunique() < 3:
+        raise ValueError("Not enough distinct run positions to estimate drift")
+
+    jobs = ratio.groupby(seq).mean()
+    x, y = jobs.index.to_numpy(float), jobs.to_numpy()
+    centered = x - x.mean()
+    sxx = (centered**2).sum()
+    slope = float((centered * (y - y.mean())).sum() / sxx)
+    residuals = y - y.mean() - slope * centered
+    stderr = float(np.sqrt((residuals**2).sum() / (len(x) - 2) / sxx))
+    span = x.max() - x.min()
+
+    spans = pd.cut(seq, bins=min(bins, seq.nunique()))
+    binned = np.expm1(ratio.groupby(spans, observed=True).mean() - ratio.mean())
+    binned.index = [f"{int(i.left)}-{int(i.right)}" for i in binned.index]
+
+    return {
+        "slope": slope,
+        "stderr": stderr,
+        "drift": float(np.expm1(slope * span)),
+        "low": float(np.expm1((slope - Z_95 * stderr) * span)),
+        "high": float(np.expm1((slope + Z_95 * stderr) * span)),
+        "bins": binned.rename("drift"),
+    }
+
+
+def order_correlation(df: pd.DataFrame) -> pd.Series:
+    """
+    Rank correlation of threshold and run order within every method.
+
+    The correlation is taken within every description and size (a single
+    threshold curve), then averaged per method. Methods without a threshold
+    (a single value) are left out.
+    """
+    keys = ["method", "description", "size"]
+    jobs = df[keys + ["threshold", "seq"]].drop_duplicates()
+    jobs = jobs[jobs["seq"] >= 0].copy()
+    by = jobs.groupby(keys, observed=True)
+    jobs["threshold_rank"] = by["threshold"].rank()
+    jobs["seq_rank"] = by["seq"].rank()
+
+    out = {}
+    for key, group in jobs.groupby(keys, observed=True):
+        if group["threshold"].nunique() < 2:
+            continue
+        out[key] = group["threshold_rank"].corr(group["seq_rank"])
+    if not out:
+        return pd.Series(name="correlation", dtype=float)
+
+    corr = pd.Series(out, name="correlation", dtype=float)
+    return corr.groupby(level=0).mean()
+
+
+def check(df: pd.DataFrame, col="wall_nsecs", bins=10) -> list[str]:
+    """Get a warning for every problem found, empty if the result is fine."""
+    if "seq" not in df.columns:
+        return ["No seq column, the run order was not recorded"]
+
+    warnings = []
+    drift = estimate_drift(df, col, bins)
+    if drift["low"] > MAX_DRIFT or drift["high"] < -MAX_DRIFT:
+        warnings.append(
+            f"{col} drifted by {drift['drift']:+.2%} "
+            f"({drift['low']:+.2%} to {drift['high']:+.2%}) over the result"
+        )
+
+    corr = order_correlation(df)
+    for method, value in corr[corr.abs() > MAX_ORDER_CORRELATION].items():
+        warnings.append(
+            f"{method}: threshold is confounded with the run order (rho={value:+.2f})"
+        )
+    return warnings
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "RESULT_DIRS",
+        metavar="DIR",
+        action="store",
+        nargs="+",
+        type=Path,
+    )
+    parser.add_argument(
+        "-c",
+        "--col",
+        action="store",
+        default="wall_nsecs",
+        help="Column to estimate the drift of.",
+    )
+    parser.add_argument(
+        "-b",
+        "--bins",
+        action="store",
+        type=int,
+        default=10,
+        help="Number of spans of the run order to summarize.",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    # Yes this is ugly, fix it later.
+    sys.path.insert(0, str(Path(__file__).parent))
+
+    from mpl import Result
+
+    parser = build_parser()
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    status = 0
+    for path in args.RESULT_DIRS:
+        result = Result(path)
+        order = result.job_details.get("Order") or {}
+        strategy, seed = order.get("Strategy"), order.get("Seed")
+        print(f"{path.name} (order: {strategy}, seed: {seed})")
+
+        if "seq" in result.df.columns:
+            drift = estimate_drift(result.df, args.col, args.bins)
+            print(
+                f"  drift: {drift['drift']:+.2%} "
+                f"(95% CI {drift['low']:+.2%} to {drift['high']:+.2%})"
+            )
+            print(drift["bins"].map("{:+.2%}".format).to_string())
+            corr = order_correlation(result.df)
+            if not corr.empty:
+                print(corr.map("{:+.2f}".format).to_string())
+
+        for warning in check(result.df, args.col, args.bins):
+            print(f"  [Warning]: {warning}")
+            status = 1
+        print()
+
+    sys.exit(status)
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Incrementally ingest every result directory into a database.
+
+Supports a local SQLite or DuckDB file as well as the Postgres container from
+`docker-compose.yml`. Only rows appended since the previous ingest are loaded,
+tracked by a per-CSV byte offset (watermark) stored within the database.
+"""
+import argparse
+import io
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+# Column name -> SQL type, the order matches a newly created `result` table.
+# Columns appended later are added to existing tables, see `create_schema`.
+RESULT_COLUMNS = {
+    "result": "text",
+    "host": "text",
+    "partition": "text",
+    "method": "text",
+    "input": "text",
+    "size": "bigint",
+    "threshold": "integer",
+    "wall_nsecs": "bigint",
+    "user_nsecs": "bigint",
+    "system_nsecs": "bigint",
+    "hw_cpu_cycles": "bigint",
+    "hw_instructions": "bigint",
+    "hw_cache_references": "bigint",
+    "hw_cache_misses": "bigint",
+    "hw_branch_instructions": "bigint",
+    "hw_branch_misses": "bigint",
+    "hw_bus_cycles": "bigint",
+    "sw_cpu_clock": "bigint",
+    "sw_task_clock": "bigint",
+    "sw_page_faults": "bigint",
+    "sw_context_switches": "bigint",
+    "sw_cpu_migrations": "bigint",
+    "id": "integer",
+    "description": "text",
+    "run_type": "text",
+    "retries": "integer",
+    "core": "integer",
+    "exec": "text",
+    "seq": "integer",
+}
+
+# Columns Grafana filters on.
+INDEX_COLUMNS = ("method", "description", "size", "threshold")
+
+# Approximate number of bytes parsed and inserted at once.
+CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _quote(name: str) -> str:
+    return f'"{name}"'
+
+
+def _columns(names=RESULT_COLUMNS) -> str:
+    return ", ".join(_quote(i) for i in names)
+
+
+class Database:
+    """Common interface of all the supported databases."""
+
+    # DB-API parameter placeholder.
+    param = "?"
+    # Appended to `create table result (...)`.
+    partition_by = ""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql: str, params=()):
+        cur = self.conn.cursor()
+        if params:
+            cur.execute(sql, params)
+        else:
+            cur.execute(sql)
+        return cur
+
+    def create_schema(self):
+        """
+        Create the tables and indexes if they do not already exist, and add
+        any column of `RESULT_COLUMNS` missing from an older `result` table.
+        """
+        cols = ",\n  ".join(f"{_quote(k)} {v}" for k, v in RESULT_COLUMNS.items())
+        self.execute(
+            f"create table if not exists result (\n  {cols}\n){self.partition_by}"
+        )
+        self._add_columns()
+        self._create_indexes()
+        self.execute(
+            "create table if not exists ingest_watermark (\n"
+            "  result text not null,\n"
+            "  csv    text not null,\n"
+            "  offset_bytes bigint not null,\n"
+            "  num_rows     bigint not null,\n"
+            "  primary key (result, csv)\n"
+            ")"
+        )
+        self.commit()
+
+    def _add_columns(self):
+        # On a partitioned table the columns cascade to every partition.
+        for k, v in RESULT_COLUMNS.items():
+            self.execute(f"alter table result add column if not exists {_quote(k)} {v}")
+
+    def _create_indexes(self):
+        # On a partitioned table the indexes cascade to every partition.
+        self.execute(
+            "create index if not exists result_lookup_idx "
+            f"on result ({_columns(INDEX_COLUMNS)})"
+        )
+        self.execute("create index if not exists result_result_idx on result (result)")
+
+    def get_watermark(self, result: str, csv: str) -> tuple[int, int]:
+        """Get the (byte offset, number of rows) already ingested from a CSV."""
+        p = self.param
+        row = self.execute(
+            "select offset_bytes, num_rows from ingest_watermark "
+            f"where result = {p} and csv = {p}",
+            (result, csv),
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+    def set_watermark(self, result: str, csv: str, offset: int, num_rows: int):
+        p = self.param
+        self.execute(
+            f"delete from ingest_watermark where result = {p} and csv = {p}",
+            (result, csv),
+        )
+        self.execute(
+            "insert into ingest_watermark (result, csv, offset_bytes, num_rows) "
+            f"values ({p}, {p}, {p}, {p})",
+            (result, csv, offset, num_rows),
+        )
+
+    def insert(self, df: pd.DataFrame):
+        """Bulk insert rows, `df` must contain every column of `result`."""
+        raise NotImplementedError
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class SQLiteDatabase(Database):
+    def __init__(self, path: Path):
+        import sqlite3
+
+        super().__init__(sqlite3.connect(path))
+
+    def _add_columns(self):
+        # SQLite has no `add column if not exists`.
+        existing = {i[1] for i in self.execute("pragma table_info(result)")}
+        for k, v in RESULT_COLUMNS.items():
+            if k not in existing:
+                self.execute(f"alter table result add column {_quote(k)} {v}")
+
+    def insert(self, df: pd.DataFrame):
+        # sqlite3 can not bind numpy scalars.
+        rows = df.astype(object).where(df.notna(), None).to_numpy().tolist()
+        params = ", ".join([self.param] * len(RESULT_COLUMNS))
+        self.conn.executemany(
+            f"insert into result ({_columns()}) values ({params})", rows
+        )
+
+
+class DuckDBDatabase(Database):
+    def __init__(self, path: Path):
+        import duckdb
+
+        super().__init__(duckdb.connect(str(path)))
+        self.conn.begin()
+
+    def execute(self, sql: str, params=()):
+        return self.conn.execute(sql, params or None)
+
+    def insert(self, df: pd.DataFrame):
+        self.conn.register("chunk", df)
+        self.conn.execute(
+            f"insert into result ({_columns()}) select {_columns()} from chunk"
+        )
+        self.conn.unregister("chunk")
+
+    def commit(self):
+        self.conn.commit()
+        self.conn.begin()
+
+
+class PostgresDatabase(Database):
+    """
+    Postgres, the `result` table is list partitioned by description.
+
+    Partitions are created on demand so every input type gets its own
+    (smaller) table and indexes.
+    """
+
+    param = "%s"
+    partition_by = " partition by list (description)"
+
+    def __init__(self, dsn: str):
+        try:
+            import psycopg2
+        except ImportError as e:
+            raise ImportError("Postgres support requires 'psycopg2'") from e
+
+        super().__init__(psycopg2.connect(dsn))
+        self._partitions = set()
+
+    def _ensure_partitions(self, descriptions):
+        for d in set(descriptions) - self._partitions:
+            self.execute("select ensure_result_partition(%s)", (d,))
+            self._partitions.add(d)
+
+    def create_partition_function(self):
+        """Same function as within `00-psql_dump.sql`."""
+        self.execute(
+            """
+            create or replace function ensure_result_partition(d text)
+            returns void as $$
+            begin
+              execute format(
+                'create table if not exists %I partition of result for values in (%L)',
+                'result_' || d, d
+              );
+            end $$ language plpgsql
+            """
+        )
+        self.commit()
+
+    def insert(self, df: pd.DataFrame):
+        self._ensure_partitions(df["description"].unique())
+        buf = io.StringIO()
+        df.to_csv(buf, header=False, index=False)
+        buf.seek(0)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(
+                f"copy result ({_columns()}) from stdin with (format csv)", buf
+            )
+
+
+def connect(database: str, backend: Optional[str] = None) -> Database:
+    """
+    Connect to a database, guessing the backend from the name if not given.
+
+    @param database: Path to a SQLite/DuckDB file or a Postgres DSN.
+    @param backend: One of "sqlite", "duckdb" or "postgres".
+    """
+    if backend is None:
+        if database.startswith(("postgres://", "postgresql://")):
+            backend = "postgres"
+        elif database.endswith((".duckdb", ".ddb")):
+            backend = "duckdb"
+        else:
+            backend = "sqlite"
+
+    if backend == "sqlite":
+        db = SQLiteDatabase(Path(database))
+    elif backend == "duckdb":
+        db = DuckDBDatabase(Path(database))
+    elif backend == "postgres":
+        db = PostgresDatabase(database)
+        db.create_partition_function()
+    else:
+        raise ValueError(f"Unknown backend '{backend}'")
+
+    db.create_schema()
+    return db
+
+
+def load_metadata(result_dir: Path) -> dict:
+    """Get the host/partition columns of a result directory."""
+    job_details_path = result_dir / "job_details.json"
+    job_details = {}
+    if job_details_path.is_file():
+        job_details = json.loads(job_details_path.read_text())
+
+    partition_path = result_dir / "partition"
+    arcc_partition = job_details.get("ARCC Partition") or {}
+    if partition_path.is_file():
+        partition = partition_path.read_text().strip()
+    else:
+        partition = arcc_partition.get("partition")
+
+    return {
+        "result": result_dir.name,
+        "host": job_details.get("Node"),
+        "partition": partition,
+    }
+
+
+def _read_chunks(csv: Path, offset: int):
+    """
+    Yield (dataframe, end offset) for every complete line after `offset`.
+
+    A trailing partial line (a run that is still being written) is left for
+    the next ingest.
+    """
+    with open(csv, "rb") as fp:
+        header = fp.readline()
+        names = header.decode().strip().split(",")
+        offset = max(offset, len(header))
+
+        fp.seek(0, io.SEEK_END)
+        size = fp.tell()
+        fp.seek(offset)
+
+        while offset < size:
+            buf = fp.read(CHUNK_BYTES)
+            if not buf.endswith(b"\n"):
+                buf += fp.readline()
+            if not buf.endswith(b"\n"):
+                buf = buf[: buf.rfind(b"\n") + 1]
+                if not buf:
+                    break
+
+            df = pd.read_csv(io.BytesIO(buf), names=names, header=None)
+            offset += len(buf)
+            yield df, offset
+
+            if len(buf) < CHUNK_BYTES:
+                break
+            fp.seek(offset)
+
+
+def ingest_result(db: Database, result_dir: Path) -> int:
+    """
+    Ingest any new rows of a single result directory.
+
+    @returns Number of new rows.
+    """
+    metadata = load_metadata(result_dir)
+    total = 0
+    for csv in sorted(result_dir.glob("output*.csv")):
+        offset, num_rows = db.get_watermark(metadata["result"], csv.name)
+        if offset >= csv.stat().st_size:
+            continue
+
+        for df, offset in _read_chunks(csv, offset):
+            for k, v in metadata.items():
+                df[k] = v
+            # Missing (newer/older) passthrough columns become NULL.
+            df = df.reindex(columns=list(RESULT_COLUMNS))
+
+            db.insert(df)
+            num_rows += len(df)
+            total += len(df)
+            # Data and watermark are committed together.
+            db.set_watermark(metadata["result"], csv.name, offset, num_rows)
+            db.commit()
+
+    return total
+
+
+def ingest(db: Database, results_dir: Path) -> int:
+    """Ingest every result directory within `results_dir`."""
+    if not results_dir.is_dir():
+        raise NotADirectoryError(f"'{results_dir}' is not a directory")
+
+    total = 0
+    for result_dir in sorted(i for i in results_dir.iterdir() if i.is_dir()):
+        n = ingest_result(db, result_dir)
+        if n:
+            logging.info("Ingested %d rows from '%s'", n, result_dir)
+        total += n
+    return total
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "DATABASE",
+        action="store",
+        help="SQLite/DuckDB file or Postgres DSN (postgresql://...).",
+    )
+    parser.add_argument(
+        "-r",
+        "--results",
+        metavar="DIR",
+        action="store",
+        type=Path,
+        default=Path("./results"),
+        help="Directory containing every result.",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        action="store",
+        choices=("sqlite", "duckdb", "postgres"),
+        default=None,
+        help="Database backend, guessed from DATABASE by default.",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    db = connect(args.DATABASE, backend=args.backend)
+    try:
+        total = ingest(db, args.results)
+    finally:
+        db.close()
+    print(f"Ingested {total} new rows", file=sys.stderr)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Flag which groups have instrumentation (valgrind) data, and interpolate it for
+the rest.
+
+With `jobs.py --sample`, valgrind only runs for a sample of the sizes and
+thresholds. Every group (method, description, threshold, size) with base runs
+is flagged per tool, and the totals of the valgrind output files (events of
+callgrind/cachegrind, the peak memory of massif) are estimated for every
+group: within a (method, description), every measured size is first completed
+along the threshold, then every threshold along log2(size). Estimates are
+linear between the nearest measured neighbours (interpolated), and held
+constant past the measured range (extrapolated).
+"""
+import argparse
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from columns import GROUP_COLUMNS
+
+TOOLS = ("callgrind", "cachegrind", "massif")
+
+# Status of every estimate, see `interpolate`.
+STATUS = ("measured", "interpolated", "extrapolated", "missing")
+
+MASSIF_PATTERN = re.compile(r"^mem_(heap|heap_extra|stacks)_B=(\d+)$")
+
+
+def read_valgrind(path: Path) -> dict[str, float]:
+    """
+    Totals of a valgrind output file.
+
+    Callgrind and cachegrind have every event (Ir, D1mr, ...) of the whole
+    process, massif the peak of its heap, heap overhead and stacks
+    (`mem_peak_B`).
+    """
+    events, totals = [], []
+    snapshot, peak = 0, 0
+    with open(path, "r", errors="replace") as fp:
+        for line in fp:
+            line = line.strip()
+            if line.startswith("events:"):
+                events = line.split()[1:]
+            elif line.startswith(("summary:", "totals:")):
+                totals = [float(i) for i in line.split()[1:]]
+            elif match := MASSIF_PATTERN.match(line):
+                snapshot += int(match.group(2))
+                if match.group(1) == "stacks":
+                    peak = max(peak, snapshot)
+                    snapshot = 0
+
+    if events:
+        return dict(zip(events, totals))
+    return {"mem_peak_B": float(peak)}
+
+
+def load_instrumentation(result_dir: Path) -> pd.DataFrame:
+    """
+    Totals of every valgrind output file of a result.
+
+    @returns One row per instrumented command, with `GROUP_COLUMNS`, the
+             `run_type` (tool) and the columns of `read_valgrind`.
+    """
+    csvs = sorted(result_dir.glob("output*.csv"))
+    if not csvs:
+        raise FileNotFoundError(f"No CSV files found in '{result_dir}'")
+    cols = GROUP_COLUMNS + ["id", "run_type"]
+    df = pd.concat([pd.read_csv(i, usecols=cols) for i in csvs], ignore_index=True)
+    df = df[df["run_type"].isin(TOOLS)].drop_duplicates(subset=["id", "run_type"])
+
+    rows, missing = [], 0
+    for row in df.itertuples(index=False):
+        path = Path(result_dir, "valgrind", f"{row.id}_{row.run_type}.out")
+        if not path.is_file():
+            missing += 1
+            continue
+        rows.append({**row._asdict(), **read_valgrind(path)})
+    if missing:
+        logging.warning("%d valgrind output files are missing", missing)
+
+    return pd.DataFrame(rows, columns=None if rows else cols).drop(columns="id")
+
+
+def coverage(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Which groups have instrumentation data.
+
+    @param df: Every run, with `GROUP_COLUMNS` and `run_type`.
+    @returns One row per group with base runs, and whether it has any runs of
+             every tool (one boolean column per tool).
+    """
+    groups = df.loc[df["run_type"] == "base", GROUP_COLUMNS].drop_duplicates()
+    groups = groups.sort_values(by=GROUP_COLUMNS).reset_index(drop=True)
+    keys = pd.MultiIndex.from_frame(groups)
+    for tool in TOOLS:
+        runs = df.loc[df["run_type"] == tool, GROUP_COLUMNS]
+        groups[tool] = keys.isin(pd.MultiIndex.from_frame(runs))
+    return groups
+
+
+def interpolate(measured: pd.DataFrame, groups: pd.DataFrame, col: str) -> pd.DataFrame:
+    """
+    Estimate a column for every group from the measured ones.
+
+    @param measured: Measured values, with `GROUP_COLUMNS` and `col`, several
+                     rows of a group are averaged.
+    @param groups: Every group to estimate, with `GROUP_COLUMNS`.
+    @returns `groups` with `col` and `<col>_status` (see `STATUS`).
+    """
+    measured = measured.groupby(GROUP_COLUMNS, observed=True)[col].mean()
+    measured = measured.dropna().reset_index()
+
+    out = groups[GROUP_COLUMNS].copy().reset_index(drop=True)
+    values = np.full(len(out), np.nan)
+    status = np.full(len(out), "missing", dtype=object)
+    by = ["method", "description"]
+    for key, index in out.groupby(by, observed=True).indices.items():
+        method, description = key
+        known = measured[
+            (measured["method"] == method) & (measured["description"] == description)
+        ]
+        if known.empty:
+            continue
+
+        thresholds = out["threshold"].to_numpy(float)[index]
+        sizes = out["size"].to_numpy(float)[index]
+        exact = pd.MultiIndex.from_frame(known[["threshold", "size"]])
+        is_exact = pd.MultiIndex.from_arrays(
+            [out["threshold"].to_numpy()[index], out["size"].to_numpy()[index]]
+        ).isin(exact)
+
+        # Every threshold at every measured size.
+        known_sizes, grid, inside = [], [], []
+        for size, at in known.sort_values(by="threshold").groupby("size"):
+            t = at["threshold"].to_numpy(float)
+            known_sizes.append(float(size))
+            grid.append(np.interp(thresholds, t, at[col].to_numpy(float)))
+            inside.append((thresholds >= t[0]) & (thresholds <= t[-1]))
+        known_sizes = np.log2(known_sizes)
+        grid, inside = np.array(grid), np.array(inside)
+
+        # Then every size, from the two nearest measured sizes.
+        x = np.log2(sizes)
+        hi = np.clip(np.searchsorted(known_sizes, x), 0, len(known_sizes) - 1)
+        lo = np.clip(np.searchsorted(known_sizes, x, side="right") - 1, 0, None)
+        columns = np.arange(len(index))
+        for k in columns:
+            values[index[k]] = np.interp(x[k], known_sizes, grid[:, k])
+        within = (
+            (x >= known_sizes[0])
+            & (x <= known_sizes[-1])
+            & inside[lo, columns]
+            & inside[hi, columns]
+        )
+        status[index] = np.where(
+            is_exact, "measured", np.where(within, "interpolated", "extrapolated")
+        )
+
+    out[col] = values
+    out[f"{col}_status"] = status
+    return out
+
+
+def estimate(result_dir: Path, df: pd.DataFrame, cols=None) -> pd.DataFrame:
+    """
+    Coverage of every group, and the estimate of every instrumented column.
+
+    @param df: Every run of the result, see `coverage`.
+    @param cols: Columns of `read_valgrind` to estimate, every one if None.
+    @returns `coverage` with `<tool>_<col>` and `<tool>_<col>_status` per tool
+             and column.
+    """
+    groups = coverage(df)
+    instrumentation = load_instrumentation(result_dir)
+    for tool, measured in instrumentation.groupby("run_type"):
+        measured = measured.dropna(axis=1, how="all")
+        metrics = [i for i in measured.columns if i not in GROUP_COLUMNS + ["run_type"]]
+        for col in metrics if cols is None else [i for i in cols if i in metrics]:
+            est = interpolate(measured, groups, col)
+            groups[f"{tool}_{col}"] = est[col]
+            groups[f"{tool}_{col}_status"] = est[f"{col}_status"]
+    return groups
+
+
+def format_coverage(groups: pd.DataFrame) -> str:
+    """Number of groups with instrumentation data, per tool and method."""
+    tools = [i for i in TOOLS if groups[i].any()]
+    if not tools:
+        return f"Groups: {len(groups)}, none of them instrumented"
+
+    table = groups.groupby("method", observed=True)[tools].sum()
+    table.insert(0, "groups", groups.groupby("method", observed=True).size())
+    table.loc["total"] = table.sum()
+    lines = ["Instrumented groups:", table.to_string()]
+
+    statuses = [i for i in groups.columns if i.endswith("_status")]
+    if statuses:
+        counts = pd.DataFrame(
+            {i[: -len("_status")]: groups[i].value_counts() for i in statuses}
+        )
+        counts = counts.reindex(STATUS).fillna(0).astype(int).T
+        lines += ["", "Estimates:", counts.to_string()]
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "RESULT_DIR",
+        action="store",
+        type=Path,
+    )
+    parser.add_argument(
+        "-c",
+        "--col",
+        action="append",
+        help="Column of the valgrind output to estimate, ex: Ir, D1mr or "
+        "mem_peak_B. Can be given multiple times, defaults to every column.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        action="store",
+        type=Path,
+        help="Save the coverage and estimates of every group to a CSV.",
+    )
+    return parser
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    csvs = sorted(args.RESULT_DIR.glob("output*.csv"))
+    if not csvs:
+        raise FileNotFoundError(f"No CSV files found in '{args.RESULT_DIR}'")
+    df = pd.concat(
+        [pd.read_csv(i, usecols=GROUP_COLUMNS + ["run_type"]) for i in csvs],
+        ignore_index=True,
+    )
+
+    groups = estimate(args.RESULT_DIR, df, args.col)
+    print(format_coverage(groups))
+    if args.output is not None:
+        groups.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
+import hashlib
 import json
 import logging
+import os
 import sys
 from collections import defaultdict
 from dataclasses import dataclass
@@ -17,6 +19,11 @@ import pandas as pd
 import scienceplots
 from matplotlib.ticker import FormatStrFormatter
 
+from columns import GROUP_COLUMNS
+from instrumentation import coverage
+from noise import NOISE_MODES, classify, get_weighted_avg_df
+from render import FigureSpec, load_worker_result, plot_result, render_figures
+
 pd.set_option("display.max_rows", None)
 pd.set_option("display.max_columns", None)
 pd.set_option("display.width", None)
@@ -63,6 +70,35 @@ def get_avg_df(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def relative_to_baseline(
+    df: pd.DataFrame,
+    baseline: str,
+    keys=("description", "size"),
+) -> pd.DataFrame:
+    """
+    Express the mean of every group as a percentage of the baseline method.
+
+    @param df: Long dataframe with `method` and `mean` (and optionally `std`)
+               columns, one row per group.
+    @param baseline: Method to use as 100%.
+    @param keys: Columns the baseline is matched on.
+    @returns All non-baseline rows with `relative` (and `relative_std`) columns.
+    """
+    keys = list(keys)
+    baseline_df = df[df["method"] == baseline]
+    if baseline_df.empty:
+        raise ValueError(f"Baseline method '{baseline}' not found")
+
+    baseline_df = baseline_df.groupby(keys, observed=True)["mean"].mean()
+    baseline_df = baseline_df.rename("baseline_mean").reset_index()
+
+    df = df[df["method"] != baseline].merge(baseline_df, on=keys, how="inner")
+    df["relative"] = df["mean"] / df["baseline_mean"] * 100
+    if "std" in df.columns:
+        df["relative_std"] = df["std"] / df["baseline_mean"] * 100
+    return df
+
+
 class Result:
     """Represent a single 'result' from HSO-c."""
 
@@ -71,15 +107,46 @@ class Result:
     job_details: dict
     partition: Optional[str]
 
+    persist_cache: bool
+    denoise: Optional[str]
+    noise: Optional[pd.DataFrame]
+    instrumented: Optional[pd.DataFrame]
+    executable: Optional[str]
+    executables: list[str]
+
     _standard_methods: list[str]
     _threshold_methods: list[str]
 
-    def __init__(self, p: Path) -> None:
-        """Parse the output CSV and load into memory."""
+    def __init__(
+        self, p: Path, persist_cache=False, denoise=None, executable=None
+    ) -> None:
+        """
+        Parse the output CSV and load into memory.
+
+        @param p: Path to the result directory.
+        @param persist_cache: Save aggregated dataframes next to the result.
+        @param denoise: How to handle noisy runs, see `noise.classify`.
+                        Either None (keep), "filter" (drop) or "weight"
+                        (down-weight when aggregating).
+        @param executable: Only keep the runs of this executable (exec
+                           column), for results comparing several of them.
+        """
+        if denoise is not None and denoise not in NOISE_MODES:
+            raise ValueError(f"Unknown denoise mode '{denoise}'")
+
         self.path = p
         self.df = pd.DataFrame()
         self.job_details = {}
         self.partition = None
+        self.persist_cache = persist_cache
+        self.denoise = denoise
+        self.noise = None
+        self.instrumented = None
+        self.executable = executable
+        self.executables = []
+
+        self._csv_paths = []
+        self._avg_cache = {}
 
         self._standard_methods = []
         self._threshold_methods = []
@@ -91,11 +158,11 @@ class Result:
         if not self.path.is_dir():
             raise NotADirectoryError(f"'{self.path}' is not a directory")
 
-        # Load df
-        csvs = tuple(self.path.glob("output*.csv"))
+        # Load df, a work queue has one CSV per worker.
+        csvs = sorted(self.path.glob("output*.csv"))
         if not csvs:
             raise FileNotFoundError(f"No CSV files found in '{self.path}'")
-        in_csv = Path(csvs[0])
+        self._csv_paths = csvs
         dtype = {
             "method": "category",
             "size": int,
@@ -117,12 +184,52 @@ class Result:
             "sw_cpu_migrations": int,
             "description": "category",
         }
-        self.df = pd.read_csv(
-            in_csv,
-            engine="c",
-            dtype=dtype,
-            usecols=dtype.keys(),
+        # Optional columns, missing from older results.
+        header = set.intersection(
+            *(set(pd.read_csv(i, nrows=0).columns) for i in csvs)
+        )
+        if "exec" in header:
+            dtype["exec"] = "category"
+        if "seq" in header:
+            dtype["seq"] = int
+        if "run_type" in header:
+            dtype["run_type"] = "category"
+
+        self.df = pd.concat(
+            [
+                pd.read_csv(i, engine="c", dtype=dtype, usecols=dtype.keys())
+                for i in csvs
+            ],
+            ignore_index=True,
         )
+        # The categories of every CSV differ, so concat falls back to object.
+        for col, kind in dtype.items():
+            if kind == "category":
+                self.df[col] = self.df[col].astype("category")
+
+        # Keep a single executable, groups would mix them otherwise.
+        if "exec" in self.df.columns:
+            self.executables = sorted(self.df["exec"].unique())
+            if self.executable is not None:
+                if self.executable not in self.executables:
+                    raise ValueError(
+                        f"Executable '{self.executable}' not in {self.executables}"
+                    )
+                self.df = self.df[self.df["exec"] == self.executable]
+            elif len(self.executables) > 1:
+                logging.warning(
+                    "'%s' compares %s, runs of every executable are mixed",
+                    str(self.path),
+                    self.executables,
+                )
+            self.df = self.df.drop(columns="exec")
+        elif self.executable is not None:
+            raise ValueError(f"'{self.path}' does not have an exec column")
+
+        # Only keep the timings of base runs, flag the groups valgrind ran for.
+        if "run_type" in self.df.columns:
+            self.instrumented = coverage(self.df)
+            self.df = self.df[self.df["run_type"] == "base"].drop(columns="run_type")
         # fcols = self.df.select_dtypes("float").columns
         # icols = self.df.select_dtypes("float").columns
         # self.df[fcols] = self.df[fcols].apply(pd.to_numeric, downcast="float")
@@ -135,6 +242,14 @@ class Result:
             self.df[new_name] = self.df[i] / 1_000_000_000
         self.cds = {}
 
+        # Flag runs perturbed by other processes
+        if self.denoise is not None:
+            self.noise = classify(self.df)
+            if self.denoise == "filter":
+                self.df = self.df[~self.noise["noisy"]]
+            else:
+                self.df["noise_weight"] = self.noise["noise_weight"]
+
         # Load job details
         job_details_path = self.path / "job_details.json"
         if job_details_path.is_file():
@@ -156,17 +271,75 @@ class Result:
         else:
             logging.info("'%s' does not exist.", str(partition_path))
 
-    def gen_sub_dfs(self, df=None):
-        """Generate dfs by input data type and sorting method used."""
+    def get_avg_df(self, query=None):
+        """
+        Aggregate the runs matching `query`, caching the result.
+
+        The aggregate covers every column, so plotting many columns for the
+        same slice only pivots the data once. Results are keyed by the query
+        string and, if enabled, persisted next to the result on disk.
+        """
+        key = query or ""
+        if key in self._avg_cache:
+            return self._avg_cache[key]
+
+        cache_path = self._avg_cache_path(key)
+        if cache_path is not None and cache_path.is_file():
+            avg_df = pd.read_pickle(cache_path)
+        else:
+            df = self.df if not query else self.df.query(query)
+            if self.denoise == "weight":
+                avg_df = get_weighted_avg_df(df)
+            else:
+                avg_df = get_avg_df(df)
+            if cache_path is not None:
+                # Other processes may be rendering from the same result.
+                tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+                avg_df.to_pickle(tmp_path)
+                os.replace(tmp_path, cache_path)
+
+        self._avg_cache[key] = avg_df
+        return avg_df
+
+    def _avg_cache_path(self, key) -> Optional[Path]:
+        """Path to persist an aggregate to, None if persistence is disabled."""
+        if not self.persist_cache:
+            return None
+
+        # Invalidate whenever any CSV or the (possibly renamed) labels change,
+        # and for aggregates from before valgrind runs were dropped.
+        digest = hashlib.sha1(key.encode())
+        for path in self._csv_paths:
+            stat = path.stat()
+            digest.update(f"{path.name},{stat.st_size},{stat.st_mtime_ns},".encode())
+        digest.update(f"{self.denoise},{self.executable}".encode())
+        if self.instrumented is not None:
+            digest.update(b",base")
+        for col in ("method", "description"):
+            digest.update(",".join(sorted(map(str, self.df[col].unique()))).encode())
+        return self.path / f"avg.cache.{digest.hexdigest()[:16]}.pkl"
+
+    def clear_cache(self):
+        """Drop all in-memory aggregates, required after modifying `df`."""
+        self._avg_cache.clear()
+
+    def gen_sub_dfs(self, df=None, query=None):
+        """
+        Generate dfs by input data type and sorting method used.
+
+        If `df` is not provided, the cached aggregate of the runs matching
+        `query` is split instead of re-aggregating the data.
+        """
         if df is None:
-            df = self.df
+            df = self.get_avg_df(query)
+        else:
+            df = get_avg_df(df)
 
         types = sorted(df["description"].unique())
         methods = sorted(df["method"].unique())
         dfs = defaultdict(dict)
         for i in types:
             type_df = df[df["description"] == i]
-            type_df = get_avg_df(type_df)
             for m in methods:
                 method_df = type_df[type_df["method"] == m]
                 dfs[i][m] = method_df
@@ -258,8 +431,9 @@ class Result:
 
     def plot_threshold_v_col(self, col, interactive=False):
         """Plot threshold vs some other aggregated column within the dfs."""
-        standard_data = self.df.query("method in @self._standard_methods")
-        threshold_data = self.df.query("method in @self._threshold_methods")
+        standard_query = "method in @self._standard_methods"
+        threshold_query = "method in @self._threshold_methods"
+        threshold_data = self.get_avg_df(threshold_query)
 
         min_threshold = threshold_data["threshold"].min()
         max_threshold = threshold_data["threshold"].max()
@@ -277,10 +451,8 @@ class Result:
         else:
             size = sizes[0]
 
-        standard_data = standard_data[standard_data["size"] == size]
-        threshold_data = threshold_data[threshold_data["size"] == size]
-        standard_dfs = self.gen_sub_dfs(standard_data)
-        threshold_dfs = self.gen_sub_dfs(threshold_data)
+        standard_dfs = self.gen_sub_dfs(query=f"{standard_query} and size == {size}")
+        threshold_dfs = self.gen_sub_dfs(query=f"{threshold_query} and size == {size}")
 
         fig, axes = self._plot_threshold_v_col(
             threshold_dfs,
@@ -299,37 +471,44 @@ class Result:
 
     def plot_size_v_runtime(self, interactive=False):
         """Plot size vs wall_nsecs."""
-        df = self.df
         thresholds = self.df["threshold"].unique()
         if len(thresholds) > 1:
             if interactive:
                 threshold = self._prompt_for_thing("threshold", list(thresholds))
             else:
                 threshold = thresholds[-1]
-            df = df[(df["threshold"] == threshold) | (df["threshold"] == 0)]
         else:
             threshold = thresholds[0]
-            df = df[(df["threshold"] == threshold) | (df["threshold"] == 0)]
 
-        dfs = self.gen_sub_dfs(df)
+        dfs = self.gen_sub_dfs(query=f"threshold == {threshold} or threshold == 0")
 
         fig, axes = self._plot_size_v_runtime(dfs)
         fig.suptitle("Size vs. Runtime", fontsize=16)
         fig.tight_layout()
 
-    def plot_relative_difference(self, baseline_method, interactive=False):
-        """Plot % difference between custom methods and built-in qsort."""
-        baseline_df = self.df[self.df["method"] == baseline_method]
-        baseline_df = self.df[self.df["method"] != baseline_method]
-        df = baseline_df.query("method in @self._threshold_methods").copy()
+    def relative_table(self, baseline, col="wall_nsecs", df=None):
+        """
+        Compute every group as a percentage of the baseline method.
 
-        other_baselines = baseline_df.query("method in @self._standard_methods").copy()
-        other_baselines = self.gen_sub_dfs(other_baselines)
+        The baseline is matched on the same description and size, so every
+        method, type, threshold and size is handled in a single merge.
+        """
+        if df is None:
+            df = self.df
 
-        min_threshold = df["threshold"].min()
-        max_threshold = df["threshold"].max()
+        df = df.groupby(GROUP_COLUMNS, observed=True)[col].agg(["mean", "std"])
+        return relative_to_baseline(df.reset_index(), baseline)
+
+    def plot_relative_difference(self, baseline_method, interactive=False, types=None):
+        """Plot % difference between custom methods and built-in qsort."""
+        table = self.relative_table(baseline_method)
+        if types is not None:
+            table = table[table["description"].isin(types)]
+        threshold_table = table.query("method in @self._threshold_methods")
 
-        sizes = df["size"].unique()
+        max_threshold = threshold_table["threshold"].max()
+
+        sizes = threshold_table["size"].unique()
         if not len(sizes):
             # No supported plots createable
             return
@@ -341,45 +520,36 @@ class Result:
                 size = sizes[-1]
         else:
             size = sizes[0]
-        df = df[df["size"] == size]
-        dfs = self.gen_sub_dfs(df)
+        table = table[table["size"] == size]
 
-        for type_, sub_df in dfs.items():
+        for type_, type_df in table.groupby("description", observed=True):
             fig = plt.figure()
             ax = fig.subplots()
-            # den = baseline_df["wall_nsecs"].reset_index(drop=True).mean()
-            den = (
-                baseline_df[baseline_df["description"] == type_]["wall_nsecs"]
-                .reset_index(drop=True)
-                .mean()
-            )
-            for method, df in sub_df.items():
-                num = df[("mean", "wall_nsecs")].reset_index(drop=True)
-                relative = num / den
-                df["wall_nsecs_relative"] = relative.values * 100
 
-                title = f"""Threshold vs. Runtime Relative to GNU glibc's \\texttt{{{baseline_method}}}
-                Input size = ${size:,}$
-                {type_.title()}"""
+            title = f"""Threshold vs. Runtime Relative to GNU glibc's \\texttt{{{baseline_method}}}
+            Input size = ${size:,}$
+            {type_.title()}"""
+            is_threshold = type_df["method"].isin(self._threshold_methods)
+            for method, df in type_df[is_threshold].groupby("method", observed=True):
                 df.plot.line(
                     x="threshold",
-                    y="wall_nsecs_relative",
+                    y="relative",
                     marker="o",
                     title=title,
                     ax=ax,
                     label=method,
                 )
             ax.plot([0, max_threshold], [100, 100], "--", label=baseline_method)
-            for v in other_baselines[type_].values():
-                row = v.iloc[0]
-                val = row[("mean", "wall_nsecs")]
-                # I have no idea why this is a series, there's a bug somewhere
-                label = row["method"].values[0]
-                relative = val / den
-                relative *= 100
-                ax.plot([0, max_threshold], [relative, relative], "--", label=label)
-
-            ax.get_legend().remove()
+            for row in type_df[~is_threshold].itertuples():
+                ax.plot(
+                    [0, max_threshold],
+                    [row.relative, row.relative],
+                    "--",
+                    label=row.method,
+                )
+
+            if ax.get_legend() is not None:
+                ax.get_legend().remove()
             fig.legend(
                 bbox_to_anchor=(0.5, -0.10),
                 ncols=2,
@@ -390,7 +560,7 @@ class Result:
 
             ax.set_xlabel("Threshold")
             # Escape % since it is the comment char of latex
-            ax.set_ylabel(f"\% of \\texttt{{{baseline_method}}} runtime")
+            ax.set_ylabel(f"\\% of \\texttt{{{baseline_method}}} runtime")
             ax.xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
 
             fig.tight_layout()
@@ -420,8 +590,8 @@ def get_fig_size(width=117, fraction=1):
     return fig_dim
 
 
-def gen_report_plots(result: Result):
-    """Generate publication quality plots."""
+def rename_result(result: Result):
+    """Replace method and data type names with publication quality names."""
     rename_methods_map = {
         "msort_heap_with_old_ins": "Mergesort w/ Primitive InsSort",
         "msort_heap_with_basic_ins": "Mergesort w/ Basic InsSort",
@@ -442,9 +612,25 @@ def gen_report_plots(result: Result):
     }
     result._threshold_methods.update(set(rename_methods_map.values()))
     result._standard_methods.update(set(rename_standard_methods_map.values()))
-    result.df = result.df.replace(rename_methods_map)
-    result.df = result.df.replace(rename_standard_methods_map)
-    result.df = result.df.replace(rename_data_map)
+
+    # Several methods map onto the same name, so the categories can't simply
+    # be renamed.
+    methods_map = {**rename_methods_map, **rename_standard_methods_map}
+    for col, rename_map in (("method", methods_map), ("description", rename_data_map)):
+        result.df[col] = (
+            result.df[col].astype(str).replace(rename_map).astype("category")
+        )
+    result.clear_cache()
+
+
+def gen_report_plots(result: Result, jobs=None, formats=("png",)):
+    """
+    Generate publication quality plots.
+
+    Every figure is independent, so they are rendered and saved within a pool
+    of processes, see `render.render_figures`.
+    """
+    rename_result(result)
     plots_dir = result.path / "plots"
     plots_dir.mkdir(exist_ok=True)
 
@@ -463,16 +649,44 @@ def gen_report_plots(result: Result):
         "sw_context_switches",
         "sw_cpu_migrations",
     ]
-    for i in cols:
-        result.plot_threshold_v_col(i)
-
-    result.plot_size_v_runtime()
-    result.plot_relative_difference("qsort")
+    specs = [
+        FigureSpec(
+            f"threshold_v_{i}",
+            plot_result,
+            {"method": "plot_threshold_v_col", "col": i},
+        )
+        for i in cols
+    ]
+    specs.append(
+        FigureSpec("size_v_runtime", plot_result, {"method": "plot_size_v_runtime"})
+    )
+    for i in sorted(result.df["description"].unique()):
+        specs.append(
+            FigureSpec(
+                f"relative_{i.lower().replace(' ', '_')}",
+                plot_result,
+                {
+                    "method": "plot_relative_difference",
+                    "baseline_method": "qsort",
+                    "types": [i],
+                },
+            )
+        )
 
-    figs = [plt.figure(n) for n in plt.get_fignums()]
-    for i, v in enumerate(figs):
-        dst = plots_dir / f"{i}.gen.png"
-        v.savefig(dst, bbox_inches="tight")
+    render_figures(
+        specs,
+        plots_dir,
+        formats=formats,
+        jobs=jobs,
+        initializer=load_worker_result,
+        initargs=(
+            result.path,
+            result.persist_cache,
+            rename_result,
+            result.denoise,
+            result.executable,
+        ),
+    )
 
 
 def main():
@@ -488,14 +702,14 @@ def main():
     logger.addHandler(ch)
 
     if len(sys.argv) > 1:
-        result = Result(Path(sys.argv[1]))
+        result = Result(Path(sys.argv[1]), persist_cache=True)
     else:
         base_results_dir = Path("./results")
         if not base_results_dir.is_dir():
             raise NotADirectoryError(f"'{base_results_dir}' is not a directory")
 
         last_result_path = get_latest_subdir(base_results_dir)
-        result = Result(last_result_path)
+        result = Result(last_result_path, persist_cache=True)
 
     gen_report_plots(result)
 
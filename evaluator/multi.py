@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Compare many results (partitions, CPU constraints, ...) against a baseline."""
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+# Yes this is ugly, fix it later.
+sys.path.insert(0, str(Path(__file__).parent))
+
+from columns import GROUP_COLUMNS
+from mpl import Result, relative_to_baseline
+
+# Columns the baseline is matched on across results.
+RESULT_KEYS = ("result", "description", "size")
+
+
+def _load_result(path: Path, col: str) -> pd.DataFrame:
+    """
+    Load a single result and reduce it to one row per group.
+
+    This runs within a worker process, so only the (small) aggregated frame is
+    sent back to the parent rather than every single run.
+    """
+    result = Result(path)
+    df = result.df.groupby(GROUP_COLUMNS, observed=True)[col].agg(
+        ["mean", "std", "count"]
+    )
+    df = df.reset_index()
+    df["method"] = df["method"].astype(str)
+    df["description"] = df["description"].astype(str)
+
+    arcc_partition = result.job_details.get("ARCC Partition") or {}
+    # Results of different partitions often share the same (date) name.
+    df["result"] = str(path)
+    df["host"] = result.job_details.get("Node")
+    df["partition"] = result.partition or arcc_partition.get("partition")
+    df["constraint"] = arcc_partition.get("constraint")
+    return df
+
+
+def load_results(
+    paths: list[Path],
+    col: str = "wall_nsecs",
+    jobs: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Load many result directories in parallel and align them.
+
+    @param paths: Result directories to load.
+    @param col: Column to aggregate.
+    @param jobs: Number of worker processes, defaults to one per CPU.
+    @returns Long dataframe with one row per result, method, description,
+             threshold and size.
+    """
+    if not paths:
+        raise ValueError("No result directories specified")
+
+    jobs = min(jobs or os.cpu_count() or 1, len(paths))
+    if jobs == 1:
+        dfs = [_load_result(p, col) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            dfs = list(pool.map(_load_result, paths, [col] * len(paths)))
+
+    return pd.concat(dfs, ignore_index=True)
+
+
+def most_improved(df: pd.DataFrame) -> pd.DataFrame:
+    """Select the best threshold for each method within every result."""
+    by = ["result", "method", "description", "size"]
+    idx = df.groupby(by, observed=True)["relative"].idxmin()
+    return df.loc[idx].reset_index(drop=True)
+
+
+def summarize(df: pd.DataFrame) -> pd.DataFrame:
+    """Summarize the best relative runtimes across every result."""
+    by = ["method", "description", "size"]
+    summary = df.groupby(by, observed=True).agg(
+        results=("result", "nunique"),
+        relative_min=("relative", "min"),
+        relative_median=("relative", "median"),
+        relative_max=("relative", "max"),
+        threshold_min=("threshold", "min"),
+        threshold_max=("threshold", "max"),
+    )
+    return summary.reset_index().sort_values(by=["description", "size", "method"])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "RESULT_DIRS",
+        metavar="DIR",
+        action="store",
+        nargs="+",
+        type=Path,
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        action="store",
+        default="qsort",
+        help="Method to compare all other methods against.",
+    )
+    parser.add_argument(
+        "-c",
+        "--col",
+        action="store",
+        default="wall_nsecs",
+        help="Column to compare.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        type=int,
+        default=None,
+        help="Number of results to load in parallel.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        action="store",
+        type=Path,
+        help="Save the best threshold per result to a CSV.",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    df = load_results(args.RESULT_DIRS, col=args.col, jobs=args.jobs)
+    best = most_improved(
+        relative_to_baseline(df, args.baseline, keys=RESULT_KEYS)
+    )
+    if args.output is not None:
+        best.to_csv(args.output, index=False)
+
+    print(summarize(best).to_string(index=False))
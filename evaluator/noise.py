@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Detect runs perturbed by other processes from the software counters.
+
+A run is flagged as noisy if it:
+
+- migrated between CPUs (`sw_cpu_migrations`), or
+- was context switched (`sw_context_switches`) or page faulted
+  (`sw_page_faults`) far more often than the other runs of its group.
+
+Time spent off-CPU can't be detected: HSO-c's `wall_nsecs` is the CPU time of
+the process (CLOCK_PROCESS_CPUTIME_ID), just like `sw_task_clock`.
+
+Noisy runs can then be dropped or down-weighted when aggregating.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from columns import GROUP_COLUMNS
+
+# Number of (scaled) median absolute deviations above the group median before
+# a counter counts as abnormal.
+MAX_DEVIATIONS = 3.5
+
+# Counters checked against the rest of their group.
+GROUP_COUNTERS = ("sw_context_switches", "sw_page_faults")
+
+NOISE_MODES = ("filter", "weight")
+
+
+def _robust_outliers(df: pd.DataFrame, col: str) -> pd.Series:
+    """Flag values far above the median of their group."""
+    groups = df.groupby(GROUP_COLUMNS, observed=True)[col]
+    median = groups.transform("median")
+    mad = (df[col] - median).abs().groupby(
+        [df[i] for i in GROUP_COLUMNS], observed=True
+    ).transform("median")
+    # A single extra event is never abnormal, even if every other run had none.
+    limit = median + np.maximum(MAX_DEVIATIONS * 1.4826 * mad, 1)
+    return df[col] > limit
+
+
+def classify(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Flag the noisy runs.
+
+    @param df: Every run, as loaded from the HSO-c CSV.
+    @returns One boolean column per cause, `noisy` if any of them is set and
+             a `noise_weight` in (0, 1] for weighted aggregation.
+    """
+    flags = pd.DataFrame(index=df.index)
+    flags["migrated"] = df["sw_cpu_migrations"] > 0
+    for col in GROUP_COUNTERS:
+        flags[col.removeprefix("sw_")] = _robust_outliers(df, col)
+
+    flags["noisy"] = flags.any(axis=1)
+    # Halve the weight for every cause.
+    causes = flags.drop(columns="noisy").sum(axis=1)
+    flags["noise_weight"] = 0.5**causes
+    return flags
+
+
+def noise_score(df: pd.DataFrame, by="host") -> pd.DataFrame:
+    """
+    Summarize how noisy every node (or any other `by` column) is.
+
+    @param df: Runs with the columns from `classify`.
+    @returns Per `by` the number of runs, the share of noisy runs (the score)
+             and the share of runs affected by every cause.
+    """
+    causes = ["migrated", "context_switches", "page_faults"]
+    summary = df.groupby(by, observed=True).agg(
+        runs=("noisy", "size"),
+        score=("noisy", "mean"),
+        **{i: (i, "mean") for i in causes},
+    )
+    return summary.sort_values(by="score", ascending=False)
+
+
+def get_weighted_avg_df(df: pd.DataFrame, weight="noise_weight") -> pd.DataFrame:
+    """
+    Weighted version of `mpl.get_avg_df`, with the same layout.
+
+    The mean and (reliability weighted, unbiased) std of every column is
+    computed from per group sums, so no Python level loop over the groups.
+    """
+    w = df[weight]
+    values = df.drop(columns=weight).select_dtypes("number")
+    values = values.drop(columns=[i for i in GROUP_COLUMNS if i in values.columns])
+    values = values.drop(columns=[i for i in values.columns if values[i].dtype == bool])
+    keys = [df[i] for i in GROUP_COLUMNS]
+
+    w_sum = w.groupby(keys, observed=True).sum()
+    w2_sum = (w**2).groupby(keys, observed=True).sum()
+    mean = values.mul(w, axis=0).groupby(keys, observed=True).sum().div(w_sum, axis=0)
+    sq = (values**2).mul(w, axis=0).groupby(keys, observed=True).sum()
+    var = sq.div(w_sum, axis=0) - mean**2
+    # Unbiased for reliability weights.
+    var = var.mul(w_sum**2 / (w_sum**2 - w2_sum), axis=0)
+    std = np.sqrt(var.clip(lower=0))
+
+    out = pd.concat({"mean": mean, "std": std}, axis=1).sort_index(axis=1)
+    out = out.reset_index()
+    out = out.sort_values(by=["size", "threshold"])
+    return out
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "RESULT_DIRS",
+        metavar="DIR",
+        action="store",
+        nargs="+",
+        type=Path,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        action="store",
+        type=Path,
+        help="Save the classification of every run to a CSV.",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    # Yes this is ugly, fix it later.
+    sys.path.insert(0, str(Path(__file__).parent))
+
+    from mpl import Result
+
+    parser = build_parser()
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    dfs = []
+    for path in args.RESULT_DIRS:
+        result = Result(path)
+        df = result.df[GROUP_COLUMNS].join(classify(result.df))
+        df["result"] = path.name
+        df["host"] = result.job_details.get("Node", path.name)
+        dfs.append(df)
+    df = pd.concat(dfs, ignore_index=True)
+
+    if args.output is not None:
+        df.to_csv(args.output, index=False)
+
+    print(noise_score(df).to_string())
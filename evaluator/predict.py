@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Predict the best thresholds of an unseen CPU from previous results.
+
+The best threshold of every (method, description, size) is collected from each
+result, along with the CPU features saved in its `job_details.json` (cache
+sizes, clock, core count and vector extensions). A ridge regression of
+log2(threshold) on the standardized features is fit per group, and the
+leave-one-out error of that fit gives the width of a confirmation sweep, so a
+new partition only needs a narrow `jobs.py -t MIN,MAX,STEP` run rather than a
+full one.
+"""
+import argparse
+import json
+import logging
+import math
+import re
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Yes this is ugly, fix it later.
+sys.path.insert(0, str(Path(__file__).parent))
+
+from multi import load_results
+
+# A group without its threshold, the threshold is what is predicted.
+CURVE_COLUMNS = ["method", "description", "size"]
+
+# Vector extensions worth a feature, anything else is too rare to learn from.
+FEATURE_FLAGS = ("sse4_2", "avx", "avx2", "avx512f", "asimd", "sve")
+
+# Smallest leave-one-out error (in log2) used for a sweep, so the range never
+# collapses to a single threshold.
+MIN_LOG2_ERROR = 0.25
+
+_SIZE_UNITS = {"": 1, "B": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def _parse_cache_size(value) -> float:
+    """Cache size in bytes, older py-cpuinfo versions return ex: "32 KiB"."""
+    if value is None:
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.match(r"\s*([\d.]+)\s*([KMG]?)", str(value).upper())
+    if match is None:
+        return math.nan
+    return float(match.group(1)) * _SIZE_UNITS[match.group(2)]
+
+
+def cpu_features(cpu_info: dict) -> dict[str, float]:
+    """
+    Numeric features of a CPU.
+
+    @param cpu_info: Output of `cpuinfo.get_cpu_info()`, as saved by
+                     `src/info.py` under "CPU Info".
+    @returns Cache sizes and clock (log2), core count and one 0/1 feature per
+             `FEATURE_FLAGS`. Missing values are NaN.
+    """
+    hz = cpu_info.get("hz_advertised") or cpu_info.get("hz_actual") or [math.nan]
+    flags = set(cpu_info.get("flags") or ())
+
+    features = {}
+    for cache in ("l1_data_cache_size", "l2_cache_size", "l3_cache_size"):
+        size = _parse_cache_size(cpu_info.get(cache))
+        features[cache] = math.log2(size) if size > 0 else math.nan
+    features["hz"] = math.log2(hz[0]) if hz[0] and hz[0] > 0 else math.nan
+    features["count"] = float(cpu_info.get("count") or math.nan)
+    for flag in FEATURE_FLAGS:
+        features[f"flag_{flag}"] = float(flag in flags)
+    return features
+
+
+def load_cpu_info(path: Path) -> dict:
+    """
+    Load CPU info from a result, a `job_details.json` or a `cpuinfo --json`.
+    """
+    if path.is_dir():
+        path = path / "job_details.json"
+    with open(path, "r") as fp:
+        info = json.load(fp)
+    return info.get("CPU Info", info)
+
+
+def best_thresholds(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Best threshold of every group within every result.
+
+    @param df: Aggregated results, see `multi.load_results`.
+    @returns One row per result and group, methods with a single threshold
+             (no threshold) are dropped.
+    """
+    by = ["result"] + CURVE_COLUMNS
+    num_thresholds = df.groupby(by, observed=True)["threshold"].transform("nunique")
+    df = df[num_thresholds > 1]
+    idx = df.groupby(by, observed=True)["mean"].idxmin()
+    return df.loc[idx, by + ["threshold"]].reset_index(drop=True)
+
+
+class ThresholdModel:
+    """Ridge regression of log2(best threshold) per group."""
+
+    features: list[str]
+    groups: pd.DataFrame
+    alpha: float
+
+    def __init__(self, alpha: float = 1.0) -> None:
+        """
+        @param alpha: Ridge penalty, with few results the prediction shrinks
+                      towards the mean best threshold.
+        """
+        self.alpha = alpha
+        self.features = []
+        self.groups = pd.DataFrame()
+        self._mean = np.empty(0)
+        self._scale = np.empty(0)
+        self._coef = np.empty((0, 0))
+
+    def fit(self, best: pd.DataFrame, features: pd.DataFrame) -> "ThresholdModel":
+        """
+        Fit every group at once.
+
+        @param best: See `best_thresholds`.
+        @param features: One row of `cpu_features` per result, indexed by result.
+        """
+        features = features.dropna(axis=1, how="any")
+        self.features = list(features.columns)
+        results = features.index
+
+        self._mean = features.mean().to_numpy()
+        self._scale = features.std(ddof=0).replace(0, 1).to_numpy()
+        x = (features.to_numpy() - self._mean) / self._scale
+
+        # (results, groups) matrix, NaN where a result lacks a group.
+        y = best.pivot_table(
+            index="result", columns=CURVE_COLUMNS, values="threshold", aggfunc="first"
+        )
+        y = np.log2(y.reindex(results))
+        groups = y.columns.to_frame(index=False)
+        y = y.to_numpy(dtype=float)
+
+        num_groups = y.shape[1]
+        intercept = np.full(num_groups, np.nan)
+        coef = np.zeros((num_groups, x.shape[1]))
+        loo_error = np.full(num_groups, np.nan)
+
+        # Groups seen on the same results share the same design matrix, so
+        # they are solved together.
+        seen = ~np.isnan(y)
+        patterns, pattern_of = np.unique(seen, axis=1, return_inverse=True)
+        for p, rows in enumerate(patterns.T):
+            cols = np.flatnonzero(pattern_of.reshape(-1) == p)
+            if not rows.any():
+                continue
+            xs = x[rows]
+            ys = y[np.ix_(rows, cols)]
+            x_mean = xs.mean(axis=0)
+            y_mean = ys.mean(axis=0)
+            xc = xs - x_mean
+
+            gram = xc.T @ xc + self.alpha * np.eye(xs.shape[1])
+            w = np.linalg.solve(gram, xc.T @ (ys - y_mean))
+            coef[cols] = w.T
+            intercept[cols] = y_mean - x_mean @ w
+
+            # Closed form leave-one-out residuals, r / (1 - h).
+            n = len(xs)
+            if n > 1:
+                hat = 1 / n + np.einsum("ij,jk,ik->i", xc, np.linalg.inv(gram), xc)
+                resid = ys - (y_mean + xc @ w)
+                loo = resid / np.maximum(1 - hat, 1e-6)[:, None]
+                loo_error[cols] = np.sqrt(np.mean(loo**2, axis=0))
+
+        groups["num_results"] = seen.sum(axis=0)
+        groups["loo_error"] = loo_error
+        self.groups = groups
+        self._intercept = intercept
+        self._coef = coef
+        return self
+
+    def predict(self, cpu_info: dict, spread: float = 2.0) -> pd.DataFrame:
+        """
+        Predict the best threshold of every group for a CPU.
+
+        @param cpu_info: See `cpu_features`.
+        @param spread: Width of the sweep, in leave-one-out errors either side.
+        @returns The groups with `threshold`, `low` and `high` columns.
+        """
+        features = cpu_features(cpu_info)
+        x = np.array([features.get(i, math.nan) for i in self.features])
+        missing = [f for f, v in zip(self.features, x) if math.isnan(v)]
+        if missing:
+            logging.warning("Missing features %s, using the mean", missing)
+        x = np.where(np.isnan(x), self._mean, x)
+        x = (x - self._mean) / self._scale
+
+        log2_pred = self._intercept + self._coef @ x
+        # A single result has no error estimate, assume a factor of 2.
+        error = self.groups["loo_error"].fillna(1.0).clip(lower=MIN_LOG2_ERROR)
+
+        df = self.groups[CURVE_COLUMNS + ["num_results"]].copy()
+        df["threshold"] = np.round(2**log2_pred).astype(int)
+        df["low"] = np.floor(2 ** (log2_pred - spread * error)).astype(int)
+        df["high"] = np.ceil(2 ** (log2_pred + spread * error)).astype(int)
+        df["low"] = df["low"].clip(lower=1)
+        return df
+
+
+def threshold_step(df: pd.DataFrame) -> int:
+    """Smallest step between the thresholds swept in the results."""
+    thresholds = np.unique(df["threshold"].to_numpy())
+    steps = np.diff(thresholds[thresholds > 0])
+    return int(np.gcd.reduce(steps)) if len(steps) else 1
+
+
+def sweep_ranges(pred: pd.DataFrame, step: int = 1) -> pd.DataFrame:
+    """Single `jobs.py -t MIN,MAX,STEP` range per method covering every group."""
+    df = pred.groupby("method").agg(low=("low", "min"), high=("high", "max"))
+    df["low"] = np.maximum(df["low"] // step * step, step)
+    df["high"] = -(-df["high"] // step) * step
+    df["step"] = step
+    df["threshold"] = (
+        df["low"].astype(str) + "," + df["high"].astype(str) + "," + str(step)
+    )
+    return df.reset_index()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "RESULT_DIRS",
+        metavar="DIR",
+        action="store",
+        nargs="+",
+        type=Path,
+        help="Results to learn from.",
+    )
+    parser.add_argument(
+        "--cpu",
+        metavar="FILE",
+        action="store",
+        type=Path,
+        help=(
+            "CPU to predict, either a result, a job_details.json or the output "
+            "of `cpuinfo --json`. Defaults to this machine."
+        ),
+    )
+    parser.add_argument(
+        "-c",
+        "--col",
+        action="store",
+        default="wall_nsecs",
+        help="Column to minimize.",
+    )
+    parser.add_argument(
+        "--alpha",
+        action="store",
+        type=float,
+        default=1.0,
+        help="Ridge penalty.",
+    )
+    parser.add_argument(
+        "--spread",
+        action="store",
+        type=float,
+        default=2.0,
+        help="Width of the sweep, in leave-one-out errors either side.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        type=int,
+        default=None,
+        help="Number of results to load in parallel.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        action="store",
+        type=Path,
+        help="Save the prediction of every group to a CSV.",
+    )
+    return parser
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.cpu is not None:
+        cpu_info = load_cpu_info(args.cpu)
+    else:
+        from cpuinfo import get_cpu_info
+
+        cpu_info = get_cpu_info()
+
+    df = load_results(args.RESULT_DIRS, col=args.col, jobs=args.jobs)
+    best = best_thresholds(df)
+    features = pd.DataFrame(
+        {str(p): cpu_features(load_cpu_info(p)) for p in args.RESULT_DIRS}
+    ).T
+
+    model = ThresholdModel(alpha=args.alpha).fit(best, features)
+    pred = model.predict(cpu_info, spread=args.spread)
+    if args.output is not None:
+        pred.to_csv(args.output, index=False)
+
+    print(f"Features: {', '.join(model.features)}")
+    print(pred.sort_values(by=CURVE_COLUMNS).to_string(index=False))
+    print()
+    print("Confirmation sweeps (jobs.py -t):")
+    ranges = sweep_ranges(pred, threshold_step(df))
+    print(ranges[["method", "threshold"]].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
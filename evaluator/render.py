@@ -0,0 +1,115 @@
+"""Render independent figures in parallel."""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+import matplotlib.pyplot as plt
+
+# Result loaded once per worker process by `load_worker_result`.
+_result = None
+
+
+@dataclass
+class FigureSpec:
+    """Represent a single figure (or set of figures) to render and save."""
+
+    name: str
+    # Must be a module level function so it can be sent to a worker.
+    func: Callable
+    kwargs: dict = field(default_factory=dict)
+
+
+def _init_worker(initializer, initargs):
+    """Use a non-interactive backend, then run the user supplied initializer."""
+    plt.switch_backend("Agg")
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def load_worker_result(
+    path: Path, persist_cache=False, prepare=None, denoise=None, executable=None
+):
+    """Worker initializer, load the result a single time per process."""
+    global _result
+
+    # Avoid a circular import, mpl uses this module.
+    from mpl import Result
+
+    _result = Result(
+        path, persist_cache=persist_cache, denoise=denoise, executable=executable
+    )
+    if prepare is not None:
+        prepare(_result)
+
+
+def plot_result(method, **kwargs):
+    """Call a plotting method of the worker's result."""
+    if _result is None:
+        raise RuntimeError("Worker was not initialized with a result")
+    getattr(_result, method)(**kwargs)
+
+
+def _render(spec: FigureSpec, output_dir: Path, formats) -> list[Path]:
+    """Render a single spec, then save and close every figure it created."""
+    before = set(plt.get_fignums())
+    spec.func(**spec.kwargs)
+    new = [i for i in plt.get_fignums() if i not in before]
+
+    written = []
+    for i, num in enumerate(new):
+        fig = plt.figure(num)
+        name = spec.name if len(new) == 1 else f"{spec.name}_{i}"
+        for fmt in formats:
+            dst = output_dir / f"{name}.gen.{fmt}"
+            fig.savefig(dst, bbox_inches="tight")
+            written.append(dst)
+        # Only ever hold the figures of one spec in memory.
+        plt.close(fig)
+
+    return written
+
+
+def render_figures(
+    specs: list[FigureSpec],
+    output_dir: Path,
+    formats=("png",),
+    jobs: Optional[int] = None,
+    initializer=None,
+    initargs=(),
+) -> list[Path]:
+    """
+    Render every spec within a pool of processes using the Agg backend.
+
+    @param specs: Figures to render.
+    @param output_dir: Directory to save figures to.
+    @param formats: File extensions to save each figure as (png, pdf, ...).
+    @param jobs: Number of worker processes, defaults to one per CPU.
+    @param initializer: Optional per worker setup, ex: `load_worker_result`.
+    @param initargs: Arguments to pass to `initializer`.
+    @returns Paths to all the saved figures.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(specs)))
+
+    if jobs == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        results = [_render(s, output_dir, formats) for s in specs]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(initializer, initargs),
+        ) as pool:
+            results = list(
+                pool.map(
+                    _render,
+                    specs,
+                    [output_dir] * len(specs),
+                    [formats] * len(specs),
+                )
+            )
+
+    return [path for paths in results for path in paths]
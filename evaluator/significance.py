@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Statistical significance of every threshold against a baseline method.
+
+Every (method, description, size, threshold) group is compared against the
+baseline method of the same description and size using:
+
+- a bootstrap confidence interval of the speedup (baseline mean / mean), and
+- a two-sided Mann-Whitney U test (normal approximation).
+
+All groups are handled at once, runs are padded into a (groups, runs) matrix
+and resampled/compared with NumPy broadcasting, in chunks to bound memory.
+"""
+import argparse
+import logging
+import math
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Yes this is ugly, fix it later.
+sys.path.insert(0, str(Path(__file__).parent))
+
+from columns import GROUP_COLUMNS
+from mpl import Result
+
+# Maximum number of elements of a temporary array, bounds memory use.
+MAX_CHUNK_ELEMENTS = 1 << 22
+
+_erfc = np.vectorize(math.erfc, otypes=[float])
+
+
+def pad_groups(values: np.ndarray, codes: np.ndarray, num_groups: int):
+    """
+    Pad the runs of every group into the rows of a matrix.
+
+    @param values: Value of every run.
+    @param codes: Group (0 <= code < num_groups) of every run.
+    @returns (matrix, counts), the matrix is padded with NaN.
+    """
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    counts = np.bincount(codes, minlength=num_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    positions = np.arange(len(codes)) - starts[codes]
+
+    out = np.full((num_groups, max(counts.max(initial=0), 1)), np.nan)
+    out[codes, positions] = values[order]
+    return out, counts
+
+
+def _chunks(num_groups: int, per_group: int):
+    step = max(1, MAX_CHUNK_ELEMENTS // max(per_group, 1))
+    for start in range(0, num_groups, step):
+        yield slice(start, min(start + step, num_groups))
+
+
+def _bootstrap_means(x, counts, num_resamples, rng):
+    """Bootstrap resampled means of every row, shape (groups, resamples)."""
+    width = x.shape[1]
+    # Draw `width` indices per resample, only the first `count` are used.
+    u = rng.random((x.shape[0], num_resamples, width))
+    idx = (u * counts[:, None, None]).astype(np.intp)
+    samples = np.take_along_axis(x[:, None, :], idx, axis=2)
+    mask = np.arange(width) < counts[:, None, None]
+    return np.where(mask, samples, 0).sum(axis=2) / np.maximum(counts, 1)[:, None]
+
+
+def bootstrap_speedup(
+    x, nx, y, ny, confidence=0.95, num_resamples=1000, rng=None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Bootstrap confidence interval of mean(y) / mean(x) for every row.
+
+    @param x: Padded runs of every group, see `pad_groups`.
+    @param nx: Number of runs of every group.
+    @param y: Padded runs of the matching baseline group.
+    @param ny: Number of runs of the matching baseline group.
+    @returns (low, high) bounds.
+    """
+    rng = np.random.default_rng(rng)
+    low = np.empty(len(x))
+    high = np.empty(len(x))
+    q = [(1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100]
+
+    per_group = num_resamples * max(x.shape[1], y.shape[1])
+    for s in _chunks(len(x), per_group):
+        x_means = _bootstrap_means(x[s], nx[s], num_resamples, rng)
+        y_means = _bootstrap_means(y[s], ny[s], num_resamples, rng)
+        low[s], high[s] = np.percentile(y_means / x_means, q, axis=1)
+    return low, high
+
+
+def mann_whitney(x, nx, y, ny) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Two-sided Mann-Whitney U test of every row of x against the same row of y.
+
+    Uses the normal approximation with a continuity and tie correction, which
+    is accurate for the number of runs typically used (>= 8 per group).
+
+    @returns (U, p-value), U counts the pairs where x is smaller than y.
+    """
+    u = np.empty(len(x))
+    tie_sum = np.empty(len(x))
+    per_group = x.shape[1] * y.shape[1]
+    for s in _chunks(len(x), per_group):
+        a = x[s][:, :, None]
+        b = y[s][:, None, :]
+        # NaN padding compares False, so it never contributes.
+        u[s] = (a < b).sum(axis=(1, 2)) + 0.5 * (a == b).sum(axis=(1, 2))
+
+        # Tie correction, sum(t^3 - t) over tied values of the pooled sample.
+        pooled = np.sort(np.concatenate((x[s], y[s]), axis=1), axis=1)
+        ties = np.zeros(len(pooled))
+        run = np.ones(len(pooled))
+        for j in range(1, pooled.shape[1]):
+            same = pooled[:, j] == pooled[:, j - 1]
+            ties += np.where(same, 0, run**3 - run)
+            run = np.where(same, run + 1, 1)
+        tie_sum[s] = ties + run**3 - run
+
+    n = nx + ny
+    mu = nx * ny / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = nx * ny / 12 * ((n + 1) - tie_sum / (n * (n - 1)))
+        z = (np.abs(u - mu) - 0.5) / np.sqrt(var)
+    z = np.where(var > 0, np.maximum(z, 0), 0)
+    p = _erfc(z / math.sqrt(2))
+    return u, p
+
+
+def analyze(
+    df: pd.DataFrame,
+    baseline="qsort",
+    col="wall_nsecs",
+    confidence=0.95,
+    alpha=0.05,
+    num_resamples=1000,
+    seed: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Compare every group against the baseline method.
+
+    @param df: Every run, with at least `GROUP_COLUMNS` and `col`.
+    @param baseline: Method to compare against, matched on description/size.
+    @param confidence: Confidence level of the speedup interval.
+    @param alpha: Significance level of the Mann-Whitney U test.
+    @param num_resamples: Number of bootstrap resamples.
+    @param seed: Seed of the bootstrap.
+    @returns One row per non-baseline group with the columns:
+             speedup (baseline mean / mean), speedup_low, speedup_high,
+             u, p_value, significant, best and near_best. `near_best` marks
+             thresholds whose interval overlaps the best threshold of the same
+             method, description and size.
+    """
+    df = df[GROUP_COLUMNS + [col]].copy()
+    df["method"] = df["method"].astype(str)
+    df["description"] = df["description"].astype(str)
+
+    groups = df.groupby(GROUP_COLUMNS, sort=True)
+    codes = groups.ngroup().to_numpy()
+    table = groups[col].agg(["count", "mean", "std"]).reset_index()
+    runs, counts = pad_groups(df[col].to_numpy(dtype=float), codes, len(table))
+
+    is_baseline = (table["method"] == baseline).to_numpy()
+    if not is_baseline.any():
+        raise ValueError(f"Baseline method '{baseline}' not found")
+
+    # Index of the baseline group of every group.
+    keys = ["description", "size"]
+    baseline_idx = (
+        table[is_baseline]
+        .reset_index()
+        .groupby(keys)["index"]
+        .first()
+        .rename("baseline_idx")
+    )
+    table = table.merge(baseline_idx, left_on=keys, right_index=True, how="left")
+    keep = ~is_baseline & table["baseline_idx"].notna().to_numpy()
+    if not keep.all():
+        missing = table.loc[~is_baseline & ~keep, keys].drop_duplicates()
+        if not missing.empty:
+            logging.warning("No baseline for:\n%s", missing.to_string(index=False))
+
+    table = table[keep].reset_index(drop=True)
+    x_idx = np.flatnonzero(keep)
+    y_idx = table["baseline_idx"].to_numpy(dtype=np.intp)
+    x, nx = runs[x_idx], counts[x_idx]
+    y, ny = runs[y_idx], counts[y_idx]
+
+    table["baseline_mean"] = np.nanmean(y, axis=1)
+    table["speedup"] = table["baseline_mean"] / table["mean"]
+    table["speedup_low"], table["speedup_high"] = bootstrap_speedup(
+        x, nx, y, ny, confidence, num_resamples, seed
+    )
+    table["u"], table["p_value"] = mann_whitney(x, nx, y, ny)
+    table["significant"] = table["p_value"] < alpha
+
+    # Best threshold per method, anything overlapping its interval is
+    # indistinguishable from it.
+    by = table.groupby(["method", "description", "size"], sort=True)
+    best_idx = by["speedup"].idxmax().to_numpy()
+    best_low = table["speedup_low"].to_numpy()[best_idx][by.ngroup().to_numpy()]
+    table["best"] = table.index.isin(best_idx)
+    table["near_best"] = table["speedup_high"] >= best_low
+
+    return table.drop(columns=["baseline_idx"])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "RESULT_DIR",
+        action="store",
+        type=Path,
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        action="store",
+        default="qsort",
+        help="Method to compare all other methods against.",
+    )
+    parser.add_argument(
+        "-c",
+        "--col",
+        action="store",
+        default="wall_nsecs",
+        help="Column to compare.",
+    )
+    parser.add_argument(
+        "--confidence",
+        action="store",
+        type=float,
+        default=0.95,
+        help="Confidence level of the speedup interval.",
+    )
+    parser.add_argument(
+        "--alpha",
+        action="store",
+        type=float,
+        default=0.05,
+        help="Significance level of the Mann-Whitney U test.",
+    )
+    parser.add_argument(
+        "--resamples",
+        action="store",
+        type=int,
+        default=1000,
+        help="Number of bootstrap resamples.",
+    )
+    parser.add_argument(
+        "--seed",
+        action="store",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        action="store",
+        type=Path,
+        help="Save every group to a CSV.",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    result = Result(args.RESULT_DIR)
+    table = analyze(
+        result.df,
+        baseline=args.baseline,
+        col=args.col,
+        confidence=args.confidence,
+        alpha=args.alpha,
+        num_resamples=args.resamples,
+        seed=args.seed,
+    )
+    if args.output is not None:
+        table.to_csv(args.output, index=False)
+
+    cols = ["method", "description", "size", "threshold", "speedup"]
+    cols += ["speedup_low", "speedup_high", "p_value"]
+    near_best = table[table["near_best"]].sort_values(
+        by=["description", "size", "method", "threshold"]
+    )
+    print(near_best[cols].to_string(index=False))
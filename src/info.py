@@ -7,6 +7,7 @@ Usage:
 
 Options:
     -h, --help               Show this help.
+    --refresh                Ignore the cached fingerprint of this node.
     -c, --concurrent=N       Specify number of simultaenous runs jobs.
     -e, --exec=FILE          Specify executable path.
     -r, --runs=N             Specify number of runs.
@@ -19,17 +20,37 @@ Description:
     total_num_jobs  - number of jobs generated by src/jobs.py
     total_num_sorts - number of actual sorts taking place
                       (runs * total_num_jobs) over the entire experiment.
+
+    The CPU info, cache/NUMA topology and executable details are cached per
+    node in $XDG_CACHE_HOME/HSO/fingerprint, keyed by the boot id and the hash
+    of the executable.
 """
+import hashlib
 import json
 import multiprocessing
+import os
 import platform
 import subprocess
 from pathlib import Path
+from typing import Optional
 
 from cpuinfo import get_cpu_info
 from docopt import docopt
 
-VERSION = "1.0.3"
+from topology import SYSFS_CPU, parse_cpu_list
+
+VERSION = "1.1.0"
+
+FINGERPRINT_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "HSO" / "fingerprint"
+)
+
+BOOT_ID = Path("/proc/sys/kernel/random/boot_id")
+SYSFS_NODE = Path("/sys/devices/system/node")
+SYSFS_THP = Path("/sys/kernel/mm/transparent_hugepage")
+
+# In-process cache, {(exec path, mtime, size): fingerprint}
+_fingerprints = {}
 
 
 def get_exec_version(exec_path: Path):
@@ -68,6 +89,169 @@ def get_supported_methods(exec_path: Path):
     return valid_methods, threshold_methods
 
 
+def _read(path: Path) -> Optional[str]:
+    """Read a sysfs/procfs file, None if it does not exist (VMs, containers)."""
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def _selected(value: Optional[str]) -> Optional[str]:
+    """Get the selected option of ex: "always [madvise] never"."""
+    if value is None or "[" not in value:
+        return value
+    return value.split("[", 1)[1].split("]", 1)[0]
+
+
+def get_boot_id() -> str:
+    """Get an id unique to this boot of this node."""
+    return _read(BOOT_ID) or platform.node()
+
+
+def hash_exec(exec_path: Path) -> str:
+    """SHA-256 of the executable, changes whenever it is rebuilt."""
+    digest = hashlib.sha256()
+    with open(exec_path, "rb") as f:
+        # hashlib.file_digest is 3.11+, the clusters run 3.10.
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_cache_hierarchy(sysfs: Path = SYSFS_CPU) -> list[dict]:
+    """
+    Get every distinct CPU cache.
+
+    @param sysfs: Path to /sys/devices/system/cpu.
+    @returns: Level, type, size, associativity, line size and the CPUs sharing
+              it, for every cache.
+    """
+    caches = {}
+    for index in sorted(sysfs.glob("cpu[0-9]*/cache/index[0-9]*")):
+        cache = {
+            "Level": _read(index / "level"),
+            "Type": _read(index / "type"),
+            "Size": _read(index / "size"),
+            "Ways": _read(index / "ways_of_associativity"),
+            "Line Size": _read(index / "coherency_line_size"),
+            "Shared CPUs": _read(index / "shared_cpu_list"),
+        }
+        caches.setdefault(tuple(cache.values()), cache)
+    return sorted(caches.values(), key=lambda i: (i["Level"] or "", i["Type"] or ""))
+
+
+def get_numa_layout(sysfs: Path = SYSFS_NODE) -> dict[str, dict]:
+    """
+    Get the CPUs and memory of every NUMA node.
+
+    @param sysfs: Path to /sys/devices/system/node.
+    """
+    nodes = {}
+    for node in sorted(sysfs.glob("node[0-9]*")):
+        cpus = _read(node / "cpulist")
+        mem_total = None
+        for line in (_read(node / "meminfo") or "").splitlines():
+            if "MemTotal:" in line:
+                mem_total = int(line.split()[-2]) * 1024
+        nodes[node.name] = {
+            "CPUs": parse_cpu_list(cpus) if cpus else [],
+            "Memory": mem_total,
+        }
+    return nodes
+
+
+def get_frequency_settings(sysfs: Path = SYSFS_CPU) -> dict:
+    """
+    Get the scaling driver/governor of every CPU and the turbo state.
+
+    @returns: Governor is {governor: number of CPUs}, turbo is None if unknown.
+    """
+    governors = {}
+    for governor in sysfs.glob("cpu[0-9]*/cpufreq/scaling_governor"):
+        name = _read(governor)
+        governors[name] = governors.get(name, 0) + 1
+
+    turbo = None
+    no_turbo = _read(sysfs / "intel_pstate" / "no_turbo")
+    boost = _read(sysfs / "cpufreq" / "boost")
+    if no_turbo is not None:
+        turbo = no_turbo == "0"
+    elif boost is not None:
+        turbo = boost == "1"
+
+    return {
+        "Driver": _read(sysfs / "cpu0" / "cpufreq" / "scaling_driver"),
+        "Governor": governors,
+        "Turbo": turbo,
+    }
+
+
+def get_thp_settings(sysfs: Path = SYSFS_THP) -> dict:
+    """Get the transparent huge page settings."""
+    return {
+        "Enabled": _selected(_read(sysfs / "enabled")),
+        "Defrag": _selected(_read(sysfs / "defrag")),
+    }
+
+
+def get_fingerprint(exec_path: Path, refresh=False) -> dict:
+    """
+    Get everything about this node and executable that is slow to collect.
+
+    The CPU info, cache hierarchy, NUMA layout and executable details are
+    cached on disk until the node reboots or the executable changes. The
+    frequency and THP settings can change at any time, they are cheap to read
+    so they are always read again.
+
+    @param exec_path: Path to executable.
+    @param refresh: Ignore (and overwrite) any cached fingerprint.
+    """
+    exec_path = Path(exec_path)
+    stat = exec_path.stat()
+    key = (str(exec_path.resolve()), stat.st_mtime_ns, stat.st_size)
+    fingerprint = None if refresh else _fingerprints.get(key)
+
+    if fingerprint is None:
+        boot_id = get_boot_id()
+        exec_hash = hash_exec(exec_path)
+        path = FINGERPRINT_DIR / f"{platform.node()}-{boot_id}-{exec_hash[:16]}.json"
+
+        if not refresh and path.is_file():
+            with open(path, "r") as fp:
+                fingerprint = json.load(fp)
+        else:
+            methods, threshold_methods = get_supported_methods(exec_path)
+            fingerprint = {
+                "Boot ID": boot_id,
+                "Executable Hash": exec_hash,
+                "Executable Version": get_exec_version(exec_path),
+                "Methods": {
+                    "All": sorted(methods),
+                    "Threshold": sorted(threshold_methods),
+                },
+                "CPU Info": get_cpu_info(),
+                "Caches": get_cache_hierarchy(),
+                "NUMA": get_numa_layout(),
+            }
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp, "w") as fp:
+                    json.dump(fingerprint, fp, indent=4)
+                tmp.replace(path)
+            except OSError:
+                # Read-only home, just don't cache
+                pass
+        _fingerprints[key] = fingerprint
+
+    return {
+        **fingerprint,
+        "Frequency": get_frequency_settings(),
+        "THP": get_thp_settings(),
+    }
+
+
 def write_info(
     output_folder,
     command=None,
@@ -81,6 +265,14 @@ def write_info(
     base=True,
     callgrind=False,
     massif=False,
+    placement=None,
+    calibration=None,
+    refresh=False,
+    execs=None,
+    order=None,
+    memory_budget=None,
+    valgrind_lane=None,
+    valgrind_sample=None,
 ):
     """
     Write system information to disk.
@@ -93,6 +285,16 @@ def write_info(
     @param runs: Number of times this particular dataset is rerun.
     @param total_num_jobs: Total number of jobs to be submitted.
     @param total_num_sorts: Total number of sorts to take place across all jobs.
+    @param placement: CPU each worker is pinned to, None if not pinned.
+    @param calibration: Concurrency calibration of this node (jobs.py calibrate).
+    @param refresh: Ignore the cached fingerprint, see `get_fingerprint`.
+    @param execs: Every executable of a comparison, {exec column: path}.
+    @param order: Run order strategy and seed (jobs.py --order/--seed).
+    @param memory_budget: Bytes all concurrent jobs may use (jobs.py --memory).
+    @param valgrind_lane: Where valgrind ran, and the workers of every lane
+                          (jobs.py --valgrind-lane).
+    @param valgrind_sample: Sampling policy of the valgrind runs (jobs.py
+                            --sample).
     """
     if data_details_path is not None and data_details_path.is_file():
         with open(data_details_path, "r") as data_details_file:
@@ -100,8 +302,16 @@ def write_info(
     else:
         data_details = None
 
-    vers = get_exec_version(exec_path)
-    methods, threshold_methods = get_supported_methods(exec_path)
+    fingerprint = get_fingerprint(exec_path, refresh=refresh)
+
+    executables = {}
+    for label, path in (execs or {}).items():
+        exec_fingerprint = get_fingerprint(path, refresh=refresh)
+        executables[label] = {
+            "Path": str(Path(path).absolute()),
+            "Version": exec_fingerprint["Executable Version"],
+            "Hash": exec_fingerprint["Executable Hash"],
+        }
 
     info = {
         "Architecture": platform.architecture(),
@@ -113,14 +323,20 @@ def write_info(
         "Number of concurrent jobs": concurrent,
         "Platform": platform.platform(),
         "Processor": platform.processor(),
-        "CPU Info": get_cpu_info(),
+        "CPU Info": fingerprint["CPU Info"],
         "Executable": {
             "Name": str(exec_path.name),
-            "Version": vers,
-            "Methods": {
-                "All": methods,
-                "Threshold": threshold_methods,
-            },
+            "Version": fingerprint["Executable Version"],
+            "Hash": fingerprint["Executable Hash"],
+            "Methods": fingerprint["Methods"],
+        },
+        "Executables": executables,
+        "Hardware": {
+            "Boot ID": fingerprint["Boot ID"],
+            "Caches": fingerprint["Caches"],
+            "NUMA": fingerprint["NUMA"],
+            "Frequency": fingerprint["Frequency"],
+            "THP": fingerprint["THP"],
         },
         "Release": platform.release(),
         "Runs": runs,
@@ -131,6 +347,12 @@ def write_info(
         "Callgrind": callgrind,
         "Massif": massif,
         "ARCC Partition": arcc_partition,
+        "CPU Placement": placement,
+        "Calibration": calibration,
+        "Order": order,
+        "Memory Budget": memory_budget,
+        "Valgrind Lane": valgrind_lane,
+        "Valgrind Sample": valgrind_sample,
         "Version": platform.version(),
     }
 
@@ -142,10 +364,10 @@ if __name__ == "__main__":
     args = docopt(__doc__, version=VERSION)
     OUT_DIR = Path(args.get("DIR"))
 
-    concurrent = args.get("--concurrent", 1)
+    concurrent = args.get("--concurrent") or 1
     concurrent = int(concurrent)
 
-    total_num_jobs = args.get("--total", 0)
+    total_num_jobs = args.get("--total") or 0
     total_num_jobs = int(total_num_jobs)
 
     runs = args.get("--runs") or 1
@@ -154,8 +376,9 @@ if __name__ == "__main__":
     write_info(
         OUT_DIR,
         concurrent=concurrent,
-        exec_path=args.get("--exec"),
+        exec_path=Path(args.get("--exec")),
         runs=runs,
         total_num_jobs=total_num_jobs,
         total_num_sorts=total_num_jobs * runs,
+        refresh=args.get("--refresh"),
     )
@@ -8,21 +8,32 @@ dispatch slurm job array batches. Only use the native scheduling features if
 running on a local multi-core machine.
 
 Usage:
+    jobs.py calibrate <EXEC> <DATA_DIR> [options]
     jobs.py <EXEC> <DATA_DIR> [options]
     jobs.py <EXEC> <DATA_DIR> [options] (--threshold=THRESH ...)
     jobs.py <EXEC> <DATA_DIR> [options] (--valgrind-opt=OPT ...)
     jobs.py <EXEC> <DATA_DIR> [options] (--threshold=THRESH ...) (--valgrind-opt=OPT ...)
     jobs.py -h | --help
 
+Arguments:
+    <EXEC>                   Executable, or a comma seperated list of
+                             executables to compare. Every executable runs the
+                             same jobs, interleaved in a random order, and is
+                             recorded within the exec column.
+
 Options:
     -h, --help               Show this help.
-    -j, --jobs=N             Do N jobs in parallel.
+    -j, --jobs=N             Do N jobs in parallel, CPU for one per physical core
+                             or auto for the calibrated value of this node.
     -c, --output-chunks=N    Preaverage N chunks within HSO itself.
     -m, --methods=METHODS    Comma seperated list of methods to use for sorters.
     -o, --output=FILE        Output CSV to save results.
     -p, --progress           Enable a progress bar.
     -r, --runs=N             Number of times to run the same input data.
     -s, --slurm=DIR          Generate a batch of slurm data files in this dir.
+    -q, --queue=DIR          Create a work queue in this dir, run it with
+                             `workqueue.py DIR` on any number of nodes sharing
+                             it.
     -t, --threshold=THRESH   Comma seperated range for threshold (min,max,[step])
                              including both endpoints, or a single value.
 
@@ -36,47 +47,271 @@ Options:
     --callgrind              Enable callgrind data collection for each job.
     --cachegrind             Enable cachegrind data collection for each job.
     --massif                 Enable massif data collection for each job.
+    --valgrind-lane=LANE     Where valgrind runs, so it doesn't perturb the base
+                             runs: after (once every base run is done), cores
+                             (at the same time, on the cores left over by the
+                             base runs, requires --affinity) or shared (right
+                             after the base run of the same job, by the same
+                             worker) [default: after].
+    --valgrind-jobs=N        Number of concurrent valgrind runs, defaults to one
+                             per CPU (left over with --valgrind-lane=cores).
+    --sample=POLICY          Only run valgrind on a sample of the jobs, comma
+                             seperated KEY=VALUE pairs, a key prefixed by a tool
+                             (ex: massif.runs=2) only applies to that tool.
+                             sizes=cache (inputs next to the cache sizes of this
+                             node) or N (inputs per data type), thresholds=N
+                             (around the fastest one of --sample-from, evenly
+                             spread otherwise) and runs=N (1 unless set).
+    --sample-from=DIRS       Comma seperated previous results to find the
+                             fastest threshold of every method and input from.
     --arcc-partition=PART    ARCC Partition, Must be parseable JSON.
+    --block-runs=N           Split the runs of every job into blocks of N runs
+                             when comparing executables, so all of them are
+                             measured across the same machine state. Defaults
+                             to every run within a single block.
+    --order=ORDER            Order to run jobs in, one of: sequential (every
+                             threshold of a method back to back), random,
+                             latin (Latin square of methods/thresholds across
+                             inputs) or round-robin (alternate between inputs)
+                             [default: random].
+    --seed=N                 Seed of the random order, recorded within
+                             job_details.json. Defaults to a random seed.
+
+    --plan                   Print the predicted CPU time, wall time at --jobs,
+                             peak RAM per job and output size of the jobs,
+                             by method and data type, rather than running them.
+    --plan-from=DIRS         Comma seperated previous results to calibrate the
+                             runtime and output size of --plan from.
+
+    --affinity               Pin every worker to a dedicated physical core,
+                             rather than letting the kernel place jobs. Runs
+                             fewer than --jobs jobs at once if there are fewer
+                             cores.
+    --smt                    With --affinity, also pin workers to SMT siblings,
+                             by default siblings of a used core are left idle.
+
+    --memory=SIZE            Memory budget of all running jobs, ex: 64G, or a
+                             percent of the available memory. A job only starts
+                             once its estimated peak RSS fits [default: 90%].
+                             Linux counts the peak RSS of jobs.py itself within
+                             the peak of every job, so a job below it isn't
+                             measured (empty within memory.csv) and doesn't
+                             refine the estimates.
+
+    --retries=N              Rerun jobs perturbed by other processes up to N
+                             times, halving the concurrency each time [default: 0].
+    --noise-limits=LIMITS    Comma seperated COL=MAX limits on the HSO-c counter
+                             columns, any base run above a limit is perturbed
+                             [default: sw_cpu_migrations=0,sw_context_switches=5].
+
+Calibration:
+    calibrate                Run a reference job set (one input per data type)
+                             at 1, 2, 4, ... concurrent jobs and save the
+                             highest concurrency whose mean slowdown vs. a
+                             single job stays within the budget for this node.
+    --budget=PCT             Maximum mean slowdown in percent [default: 2].
+    --max-jobs=N             Highest concurrency to try, defaults to one per
+                             core.
 
 """
+import collections
+import csv
 import itertools
 import json
-import multiprocessing
 import os
 import platform
+import random
+import resource
 import shutil
 import signal
+import statistics
 import subprocess
 import sys
+import tempfile
 import threading
-from collections import deque
-from copy import deepcopy
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 from docopt import docopt
 from tqdm import tqdm
 
-from info import get_supported_methods, write_info
+from info import get_fingerprint, write_info
+from plan import CostModel, estimate, format_plan, input_sizes, peak_rss
+from sample import fastest_thresholds, parse_sample_arg, sample_jobs
+from topology import (
+    get_allowed_cpus,
+    get_cache_sizes,
+    get_cores,
+    get_placement,
+    pin_thread,
+)
+from workqueue import WorkQueue
 
 VERSION = "1.1.7"
 
 
 DATA_TYPES = {"ascending", "descending", "random", "single_num", "pipe_organ"}
 
+ORDERS = ("sequential", "random", "latin", "round-robin")
+
+# Where valgrind runs, relative to the base runs, see `Scheduler._lanes`.
+VALGRIND_LANES = ("after", "cores", "shared")
+
+CALIBRATION_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "HSO" / "calibration"
+)
+
 # Maximum array index supported by slurm
 # https://slurm.schedmd.com/job_array.html
 MAX_BATCH = 4_500
 
+# Jobs after the next one searched for one fitting within the memory budget.
+ADMISSION_LOOKAHEAD = 1024
+
+MEMINFO = Path("/proc/meminfo")
+
+# Columns of memory.csv, the measured peak RSS of every command.
+MEMORY_COLUMNS = [
+    "id",
+    "exec",
+    "method",
+    "description",
+    "size",
+    "run_type",
+    "retries",
+    "max_rss_kb",
+    "estimated_kb",
+]
+
+
+# Columns every command passes through to the output CSV, see `Job`.
+PASSTHROUGH_COLUMNS = (
+    "id",
+    "description",
+    "run_type",
+    "retries",
+    "core",
+    "exec",
+    "seq",
+)
+
+# Counter columns of the HSO-c output CSV, the columns `--noise-limits` applies to.
+COUNTER_COLUMNS = (
+    "wall_nsecs",
+    "user_nsecs",
+    "system_nsecs",
+    "hw_cpu_cycles",
+    "hw_instructions",
+    "hw_cache_references",
+    "hw_cache_misses",
+    "hw_branch_instructions",
+    "hw_branch_misses",
+    "hw_bus_cycles",
+    "sw_cpu_clock",
+    "sw_task_clock",
+    "sw_page_faults",
+    "sw_context_switches",
+    "sw_cpu_migrations",
+)
+
+# Options of every valgrind tool, `{out}` is the output file.
+VALGRIND_TOOLS = {
+    "callgrind": [
+        "--tool=callgrind",
+        "--callgrind-out-file={out}",
+        "--dump-line=yes",
+        "--dump-instr=yes",
+        "--instr-atstart=yes",
+        "--collect-atstart=yes",
+        "--collect-jumps=yes",
+        "--collect-systime=yes",
+        "--collect-bus=yes",
+        "--cache-sim=yes",
+        "--branch-sim=yes",
+    ],
+    "cachegrind": [
+        "--tool=cachegrind",
+        "--cachegrind-out-file={out}",
+        "--cache-sim=yes",
+        "--branch-sim=yes",
+    ],
+    "massif": [
+        "--tool=massif",
+        "--massif-out-file={out}",
+        "--stacks=yes",
+    ],
+}
+
+
+def valgrind_command(tool: str, out, valgrind_opts=None) -> list[str]:
+    """Valgrind prefix of a command running `tool`, up to and including `--`."""
+    command = ["valgrind", "--time-stamp=yes", "--quiet"]
+    command.extend(i.format(out=out) for i in VALGRIND_TOOLS[tool])
+    if valgrind_opts is not None:
+        command.extend(valgrind_opts)
+    command.append("--")
+    return command
+
+
+def _call(command) -> int:
+    """
+    Run a command to completion, like `subprocess.run(check=True)`.
+
+    The child is reaped with `os.wait4` for its own resource usage, its
+    output goes to temporary files so it can't block on a full pipe.
+
+    @returns: Peak RSS of the command in KiB. Linux keeps the peak from before
+              `exec`, so it is never below the RSS of this process.
+    """
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        p = subprocess.Popen(command, stdout=out, stderr=err)
+        _, status, usage = os.wait4(p.pid, 0)
+        p.returncode = os.waitstatus_to_exitcode(status)
+        if p.returncode:
+            out.seek(0)
+            err.seek(0)
+            raise subprocess.CalledProcessError(
+                p.returncode, command, out.read(), err.read()
+            )
+    return usage.ru_maxrss
+
 
-@dataclass
 class Job:
-    """Represent a single call to executable."""
+    """
+    Represent a single call to executable.
+
+    Sweeps keep their jobs within a `JobTable`, a `Job` is only created when
+    it is dispatched.
+    """
+
+    __slots__ = (
+        "job_id",
+        "exec_path",
+        "exec_label",
+        "infile_path",
+        "description",
+        "method",
+        "runs",
+        "output",
+        "threshold",
+        "output_chunks",
+        "base",
+        "callgrind",
+        "cachegrind",
+        "massif",
+        "valgrind_opts",
+        "retries",
+        "core",
+        "seq",
+        "valgrind_runs",
+    )
 
     job_id: int
     exec_path: Path
+    exec_label: str
     infile_path: Path
     description: str
     method: str
@@ -107,6 +342,11 @@ class Job:
         cachegrind=False,
         massif=False,
         valgrind_opts=None,
+        retries=0,
+        core=None,
+        exec_label=None,
+        seq=-1,
+        valgrind_runs=None,
     ):
         """
         Define the base parameters.
@@ -131,9 +371,18 @@ class Job:
 
         @param valgrind_opts: Other arguments to pass to valgrind. Only used
                               when callgrind, cachegrind, or massif are True.
+        @param retries: Number of times this job has been rerun.
+        @param core: CPU this job is pinned to, None if not pinned.
+        @param exec_label: Name of the executable within the exec column,
+                           defaults to its file name.
+        @param seq: Position of this job within the run order, -1 until it is
+                    dispatched.
+        @param valgrind_runs: Number of runs of every valgrind tool, {tool: runs},
+                              `runs` for any other tool.
         """
         self.job_id = job_id
         self.exec_path = exec_path
+        self.exec_label = exec_label or Path(exec_path).name
         self.infile_path = infile_path
         self.description = description
         self.method = method
@@ -147,6 +396,10 @@ class Job:
         self.cachegrind = None
         self.massif = None
         self.valgrind_opts = valgrind_opts
+        self.retries = retries
+        self.core = core
+        self.seq = seq
+        self.valgrind_runs = valgrind_runs or {}
 
         if callgrind:
             self.callgrind = (
@@ -162,25 +415,28 @@ class Job:
         if not any([self.callgrind, self.cachegrind, self.massif]):
             self.base = True
 
-    @staticmethod
-    def _passthrough_args(passthrough) -> list[str]:
+    def _passthrough_args(self, run_type: str) -> list[str]:
         """Generate arguments for passthrough options."""
+        passthrough = [
+            str(self.job_id),
+            str(self.description),
+            run_type,
+            str(self.retries),
+            str(self.core if self.core is not None else -1),
+            str(self.exec_label),
+            str(self.seq),
+        ]
         return [
             "--cols",
-            ",".join(passthrough.keys()),
+            ",".join(PASSTHROUGH_COLUMNS),
             "--vals",
-            ",".join(passthrough.values()),
+            ",".join(passthrough),
         ]
 
     @property
     def commands(self):
         """Return all possible subproccess commands given the parameters from init."""
         all_commands = []
-        passthrough_opts = {
-            "id": str(self.job_id),
-            "description": str(self.description),
-            "run_type": None,
-        }
         base_command = [
             str(self.exec_path.absolute()),
             str(self.infile_path.absolute()),
@@ -197,96 +453,26 @@ class Job:
             base_command.append("--threshold")
             base_command.append(str(self.threshold))
 
-        base_valgrind_opts = [
-            "valgrind",
-            "--time-stamp=yes",
-            "--quiet",
-        ]
-
         if self.base:
-            my_pt = deepcopy(passthrough_opts)
-            my_pt["run_type"] = "base"
             all_commands.append(
-                tuple(itertools.chain(base_command, self._passthrough_args(my_pt)))
+                tuple(itertools.chain(base_command, self._passthrough_args("base")))
             )
 
         # Parse valgrind specific stuff
-        if self.callgrind:
-            out = str(self.callgrind)
-            opts = [
-                "--tool=callgrind",
-                f"--callgrind-out-file={out}",
-                "--dump-line=yes",
-                "--dump-instr=yes",
-                "--instr-atstart=yes",
-                "--collect-atstart=yes",
-                "--collect-jumps=yes",
-                "--collect-systime=yes",
-                "--collect-bus=yes",
-                "--cache-sim=yes",
-                "--branch-sim=yes",
-            ]
-            if self.valgrind_opts is not None:
-                opts.extend(self.valgrind_opts)
-            opts.append("--")
-
-            my_pt = deepcopy(passthrough_opts)
-            my_pt["run_type"] = "callgrind"
-            all_commands.append(
-                tuple(
-                    itertools.chain(
-                        base_valgrind_opts,
-                        opts,
-                        base_command,
-                        self._passthrough_args(my_pt),
-                    )
-                )
-            )
-        if self.cachegrind:
-            out = str(self.cachegrind)
-            opts = [
-                "--tool=cachegrind",
-                f"--cachegrind-out-file={out}",
-                "--cache-sim=yes",
-                "--branch-sim=yes",
-            ]
-            if self.valgrind_opts is not None:
-                opts.extend(self.valgrind_opts)
-            opts.append("--")
-
-            my_pt = deepcopy(passthrough_opts)
-            my_pt["run_type"] = "cachegrind"
-            all_commands.append(
-                tuple(
-                    itertools.chain(
-                        base_valgrind_opts,
-                        opts,
-                        base_command,
-                        self._passthrough_args(my_pt),
-                    )
-                )
-            )
-        if self.massif:
-            out = str(self.massif)
-            opts = [
-                "--tool=massif",
-                f"--massif-out-file={out}",
-                "--stacks=yes",
-            ]
-            if self.valgrind_opts is not None:
-                opts.extend(self.valgrind_opts)
-            opts.append("--")
-
-            my_pt = deepcopy(passthrough_opts)
-            my_pt["run_type"] = "massif"
-
+        for tool in VALGRIND_TOOLS:
+            out = getattr(self, tool)
+            if not out:
+                continue
+            command = base_command
+            if tool in self.valgrind_runs:
+                command = base_command.copy()
+                command[command.index("--runs") + 1] = str(self.valgrind_runs[tool])
             all_commands.append(
                 tuple(
                     itertools.chain(
-                        base_valgrind_opts,
-                        opts,
-                        base_command,
-                        self._passthrough_args(my_pt),
+                        valgrind_command(tool, out, self.valgrind_opts),
+                        command,
+                        self._passthrough_args(tool),
                     )
                 )
             )
@@ -298,8 +484,17 @@ class Job:
         """Return the raw CLI equivalent of the subprocess command(s)."""
         return [" ".join([str(i) for i in command]) for command in self.commands]
 
-    def run(self, quiet=False, pbar=None):
-        """Call the subprocess and run the job."""
+    def run(self, quiet=False, pbar=None, core=None) -> list[int]:
+        """
+        Call the subprocess and run the job.
+
+        @param core: CPU the calling thread is pinned to (see
+                     `topology.pin_thread`), recorded within the core column.
+                     A tuple of CPUs shared with other jobs is recorded as -1.
+        @returns: Peak RSS of every command in KiB.
+        """
+        self.core = core if not isinstance(core, tuple) else None
+        max_rss = []
         for i in self.commands:
             if not quiet:
                 print(" ".join(i))
@@ -307,7 +502,7 @@ class Job:
                 pbar.update()
 
             try:
-                subprocess.run(i, capture_output=True, check=True)
+                max_rss.append(_call(i))
             except subprocess.CalledProcessError as e:
                 print("".join(["-"] * 80), end="\n\n")
                 print("stdout:")
@@ -316,10 +511,350 @@ class Job:
                 print("stderr:")
                 print(e.stderr.decode())
                 raise e
+        return max_rss
 
     def __len__(self) -> int:
         """Return the number of required subcommand calls."""
-        return len(self.commands)
+        return sum(map(bool, (self.base, self.callgrind, self.cachegrind, self.massif)))
+
+
+# Run types of a job, bits of `JobTable.rows["flags"]`.
+BASE, CALLGRIND, CACHEGRIND, MASSIF = 1, 2, 4, 8
+RUN_TYPES = {
+    BASE: "base",
+    CALLGRIND: "callgrind",
+    CACHEGRIND: "cachegrind",
+    MASSIF: "massif",
+}
+VALGRIND = CALLGRIND | CACHEGRIND | MASSIF
+
+JOB_DTYPE = np.dtype(
+    [
+        ("exec", np.uint8),
+        ("input", np.uint32),
+        ("method", np.uint16),
+        ("threshold", np.int32),  # -1 for methods without a threshold
+        ("block", np.uint16),
+        ("runs", np.uint32),
+        ("flags", np.uint8),
+        ("retries", np.uint16),
+        ("seq", np.int64),
+    ]
+)
+
+
+class JobTable:
+    """
+    Every job of a sweep, one row of `JOB_DTYPE` per job.
+
+    Paths and names are stored once and referenced by index, so a job only
+    takes a few bytes until it is dispatched and rendered as a `Job`. The job
+    id is the row.
+    """
+
+    def __init__(
+        self,
+        execs: list[Path],
+        exec_labels: list[str],
+        inputs: list[Path],
+        descriptions: list[str],
+        methods: list[str],
+        output: Path,
+        output_chunks=0,
+        valgrind_opts=None,
+        rows: Optional[np.ndarray] = None,
+        valgrind_runs: Optional[dict[str, int]] = None,
+    ):
+        """
+        @param execs: Every executable, referenced by the exec column.
+        @param inputs: Every input file, referenced by the input column.
+        @param descriptions: Data type of every input.
+        @param methods: Every method, referenced by the method column.
+        @param output: CSV every job writes to.
+        @param rows: The jobs, an empty table if None.
+        @param valgrind_runs: Runs of every valgrind tool, rather than the runs
+                              column, see `sample.sample_jobs`.
+        """
+        self.execs = execs
+        self.exec_labels = exec_labels
+        self.inputs = inputs
+        self.descriptions = descriptions
+        self.methods = methods
+        self.output = output
+        self.output_chunks = output_chunks
+        self.valgrind_opts = valgrind_opts
+        self.rows = rows if rows is not None else np.empty(0, dtype=JOB_DTYPE)
+        self.valgrind_runs = valgrind_runs if valgrind_runs is not None else {}
+
+    @classmethod
+    def sweep(
+        cls,
+        execs: list[Path],
+        exec_labels: list[str],
+        inputs: list[Path],
+        descriptions: list[str],
+        methods: list[str],
+        threshold_methods,
+        thresholds,
+        blocks: list[int],
+        flags: int,
+        output: Path,
+        output_chunks=0,
+        valgrind_opts=None,
+        rng: Optional[np.random.Generator] = None,
+    ) -> "JobTable":
+        """
+        Every combination of input, method/threshold, block and executable.
+
+        Rows are ordered by input, method, threshold and block; each unit (the
+        executables of a block, consecutive rows) is in a random order.
+        Valgrind (`flags` other than BASE) only runs with the first block.
+
+        @param blocks: Number of runs of every block.
+        @param flags: Run types, BASE | CALLGRIND | ...
+        """
+        rng = np.random.default_rng(rng)
+
+        unit_method, unit_threshold = [], []
+        for i, method in enumerate(methods):
+            for t in thresholds if method in threshold_methods else [-1]:
+                unit_method.append(i)
+                unit_threshold.append(t)
+
+        num_pairs, num_blocks, num_execs = len(unit_method), len(blocks), len(execs)
+        num_units = len(inputs) * num_pairs * num_blocks
+        pair = np.tile(np.repeat(np.arange(num_pairs), num_blocks), len(inputs))
+        block = np.tile(np.arange(num_blocks), len(inputs) * num_pairs)
+
+        rows = np.zeros(num_units * num_execs, dtype=JOB_DTYPE)
+        per_input = num_pairs * num_blocks * num_execs
+        rows["input"] = np.repeat(np.arange(len(inputs)), per_input)
+        rows["method"] = np.repeat(np.asarray(unit_method)[pair], num_execs)
+        rows["threshold"] = np.repeat(np.asarray(unit_threshold)[pair], num_execs)
+        rows["block"] = np.repeat(block, num_execs)
+        rows["runs"] = np.asarray(blocks)[rows["block"]]
+        rows["exec"] = np.argsort(rng.random((num_units, num_execs)), axis=1).ravel()
+        rows["flags"] = np.where(rows["block"] == 0, flags, BASE)
+        rows["seq"] = -1
+
+        return cls(
+            execs,
+            exec_labels,
+            inputs,
+            descriptions,
+            methods,
+            output,
+            output_chunks,
+            valgrind_opts,
+            rows,
+        )
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def num_units(self) -> int:
+        """Number of units, every unit has one job per executable."""
+        return len(self.rows) // len(self.execs)
+
+    def num_commands(self, job_ids=None) -> int:
+        """Number of subprocess calls of the given jobs, defaults to every job."""
+        flags = self.rows["flags"] if job_ids is None else self.rows["flags"][job_ids]
+        return int(sum(np.count_nonzero(flags & bit) for bit in RUN_TYPES))
+
+    def job(self, job_id: int, flags: int = BASE | VALGRIND) -> Job:
+        """Render a single job, only with the run types within `flags`."""
+        row = self.rows[job_id]
+        flags &= int(row["flags"])
+        threshold = int(row["threshold"])
+        return Job(
+            job_id=int(job_id),
+            exec_path=self.execs[row["exec"]],
+            exec_label=self.exec_labels[row["exec"]],
+            infile_path=self.inputs[row["input"]],
+            description=self.descriptions[row["input"]],
+            method=self.methods[row["method"]],
+            runs=int(row["runs"]),
+            output=self.output,
+            threshold=threshold if threshold >= 0 else None,
+            output_chunks=self.output_chunks,
+            base=bool(flags & BASE),
+            callgrind=bool(flags & CALLGRIND),
+            cachegrind=bool(flags & CACHEGRIND),
+            massif=bool(flags & MASSIF),
+            valgrind_opts=self.valgrind_opts,
+            retries=int(row["retries"]),
+            seq=int(row["seq"]),
+            valgrind_runs=self.valgrind_runs,
+        )
+
+    def save(self, path: Path):
+        """
+        Save to a directory, `jobs.npy` for the rows and `jobs.json` for the
+        paths (absolute, so any node sharing the filesystem can load it).
+        """
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(Path(path, "jobs.npy"), self.rows)
+        with open(Path(path, "jobs.json"), "w") as fp:
+            json.dump(
+                {
+                    "Executables": [str(i.absolute()) for i in self.execs],
+                    "Executable Labels": self.exec_labels,
+                    "Inputs": [str(i.absolute()) for i in self.inputs],
+                    "Descriptions": self.descriptions,
+                    "Methods": self.methods,
+                    "Output": str(self.output),
+                    "Output Chunks": self.output_chunks,
+                    "Valgrind Options": self.valgrind_opts,
+                    "Valgrind Runs": self.valgrind_runs,
+                },
+                fp,
+                indent=4,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "JobTable":
+        """Load a table written by `save`."""
+        with open(Path(path, "jobs.json"), "r") as fp:
+            info = json.load(fp)
+        return cls(
+            [Path(i) for i in info["Executables"]],
+            info["Executable Labels"],
+            [Path(i) for i in info["Inputs"]],
+            info["Descriptions"],
+            info["Methods"],
+            Path(info["Output"]),
+            info["Output Chunks"],
+            info["Valgrind Options"],
+            np.load(Path(path, "jobs.npy")),
+            info.get("Valgrind Runs"),
+        )
+
+    def like(self, rows: Optional[np.ndarray] = None) -> "JobTable":
+        """Table with the same paths and names, but other rows."""
+        return JobTable(
+            self.execs,
+            self.exec_labels,
+            self.inputs,
+            self.descriptions,
+            self.methods,
+            self.output,
+            self.output_chunks,
+            self.valgrind_opts,
+            rows,
+            self.valgrind_runs,
+        )
+
+    def render(self, job_ids, rows: Optional[np.ndarray] = None) -> str:
+        """
+        Render the CLI of many jobs at once, the same lines as `Job.cli`.
+
+        Everything shared between jobs (paths, valgrind options, ...) is only
+        formatted once, which is several times faster than a `Job` per row.
+
+        @param job_ids: Jobs to render, in order.
+        @param rows: Rows of `job_ids`, defaults to `self.rows[job_ids]`.
+        @returns Every command, one per line.
+        """
+        job_ids = np.asarray(job_ids)
+        if rows is None:
+            rows = self.rows[job_ids]
+
+        execs = [str(i.absolute()) for i in self.execs]
+        inputs = [str(i.absolute()) for i in self.inputs]
+        output = f" --output {self.output} --runs "
+        chunks = f" --output-chunks {self.output_chunks}"
+        cols = f" --cols {','.join(PASSTHROUGH_COLUMNS)} --vals "
+
+        # (bit, run type, text before and after the job id, runs or None)
+        out_dir = self.output.parent / "valgrind"
+        tools = []
+        for bit, tool in RUN_TYPES.items():
+            if bit == BASE:
+                continue
+            before, after = " ".join(
+                valgrind_command(tool, "\0", self.valgrind_opts)
+            ).split("\0")
+            tools.append(
+                (
+                    bit,
+                    tool,
+                    f"{before}{out_dir}/",
+                    f"_{tool}.out{after} ",
+                    self.valgrind_runs.get(tool),
+                )
+            )
+
+        lines = []
+        for job_id, e, i, m, threshold, runs, flags, retries, seq in zip(
+            job_ids.tolist(),
+            rows["exec"].tolist(),
+            rows["input"].tolist(),
+            rows["method"].tolist(),
+            rows["threshold"].tolist(),
+            rows["runs"].tolist(),
+            rows["flags"].tolist(),
+            rows["retries"].tolist(),
+            rows["seq"].tolist(),
+        ):
+            head = f"{execs[e]} {inputs[i]} --method {self.methods[m]}{output}"
+            tail = chunks
+            if threshold >= 0:
+                tail = f"{tail} --threshold {threshold}"
+            command = f"{head}{runs}{tail}"
+            desc = f"{cols}{job_id},{self.descriptions[i]},"
+            rest = f",{retries},-1,{self.exec_labels[e]},{seq}"
+
+            if flags & BASE:
+                lines.append(f"{command}{desc}base{rest}\n")
+            for bit, tool, before, after, tool_runs in tools:
+                if flags & bit:
+                    tool_command = command
+                    if tool_runs is not None:
+                        tool_command = f"{head}{tool_runs}{tail}"
+                    lines.append(
+                        f"{before}{job_id}{after}{tool_command}{desc}{tool}{rest}\n"
+                    )
+        return "".join(lines)
+
+
+def batch_bounds(flags: np.ndarray, max_batch: int) -> list[tuple[int, int]]:
+    """
+    Split jobs into batches of about `max_batch` commands.
+
+    A batch ends with the job reaching `max_batch` commands, so no job is split
+    between batches.
+
+    @param flags: Run types of every job, in order.
+    @returns (start, end) of every batch.
+    """
+    counts = sum((flags & bit) != 0 for bit in RUN_TYPES)
+    total = np.cumsum(counts, dtype=np.int64)
+
+    bounds = []
+    start, done = 0, 0
+    while start < len(total):
+        end = min(int(np.searchsorted(total, done + max_batch)) + 1, len(total))
+        bounds.append((start, end))
+        start, done = end, int(total[end - 1])
+    return bounds
+
+
+# Paths and names of the table being written by this process, see `gen_slurm`.
+_WRITER: Optional[JobTable] = None
+
+
+def _init_writer(table: JobTable):
+    global _WRITER
+    _WRITER = table
+
+
+def _write_batch(path: Path, job_ids: np.ndarray, rows: np.ndarray) -> int:
+    """Write a single batch file, returns the number of commands."""
+    text = _WRITER.render(job_ids, rows)
+    with open(path, "w") as fp:
+        fp.write(text)
+    return text.count("\n")
 
 
 def parse_threshold_arg(user_input):
@@ -349,6 +884,65 @@ def parse_threshold_arg(user_input):
     return list(set(result))
 
 
+def parse_noise_limits(user_input) -> dict[str, float]:
+    """
+    Parse the --noise-limits argument from the CLI.
+
+    @param user_input: Comma seperated COL=MAX pairs.
+    @returns: Maximum value of each column.
+    """
+    limits = {}
+    for arg in (user_input or "").split(","):
+        if not arg:
+            continue
+        col, sep, value = arg.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid noise limit: {arg}")
+        col = col.strip()
+        if col not in COUNTER_COLUMNS:
+            raise ValueError(f"Invalid noise limit column: '{col}'")
+        limits[col] = float(value)
+    return limits
+
+
+def get_available_memory(meminfo: Path = MEMINFO) -> int:
+    """Memory available to new processes in bytes (MemAvailable)."""
+    try:
+        for line in meminfo.read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+
+
+def parse_memory_arg(user_input: str, available: Optional[int] = None) -> int:
+    """
+    Parse the --memory argument from the CLI.
+
+    @param user_input: A size with an optional K, M, G or T suffix (ex: 64G),
+                       or a percent of the available memory (ex: 90%).
+    @param available: Available memory, defaults to `get_available_memory`.
+    @returns: The budget in bytes.
+    """
+    value = user_input.strip().upper().removesuffix("B")
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    try:
+        if value.endswith("%"):
+            if available is None:
+                available = get_available_memory()
+            budget = float(value[:-1]) / 100 * available
+        elif value[-1:] in units:
+            budget = float(value[:-1]) * units[value[-1]]
+        else:
+            budget = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid memory budget: '{user_input}'") from None
+    if budget <= 0:
+        raise ValueError("Memory budget must be > 0")
+    return int(budget)
+
+
 def parse_args(args):
     """Parse CLI args from docopt."""
     parsed = {}
@@ -358,20 +952,29 @@ def parse_args(args):
     if not parsed["data_dir"].is_dir():
         raise NotADirectoryError("Invalid data directory")
 
-    # Executable location
-    parsed["exec"] = args.get("<EXEC>")
-    parsed["exec"] = Path(parsed["exec"])
-    if not parsed["exec"].is_file():
-        loc = parsed["exec"].absolute()
-        raise FileNotFoundError(f"Can't find executable: '{loc}'")
+    # Executable location(s)
+    parsed["execs"] = [Path(i) for i in args.get("<EXEC>").split(",")]
+    for i in parsed["execs"]:
+        if not i.is_file():
+            raise FileNotFoundError(f"Can't find executable: '{i.absolute()}'")
+    if len(set(exec_labels(parsed["execs"]))) != len(parsed["execs"]):
+        raise ValueError("Executables must be unique")
 
-    # Populate the supported methods by calling the subprocess.
-    valid_methods, _ = get_supported_methods(parsed["exec"])
+    # Populate the supported methods, cached per node and executable.
+    valid_methods, _ = get_common_methods(parsed["execs"])
+
+    # Calibration of this node, if any
+    parsed["calibration"] = load_calibration()
 
     # Num jobs
     if args.get("--jobs") == "CPU":
-        parsed["jobs"] = multiprocessing.cpu_count() - 1
-        parsed["jobs"] = parsed["jobs"] if parsed["jobs"] > 0 else 1
+        parsed["jobs"] = len(get_cores())
+    elif args.get("--jobs") == "auto":
+        if parsed["calibration"] is None:
+            raise ValueError(
+                f"'{platform.node()}' is not calibrated, run `jobs.py calibrate` first"
+            )
+        parsed["jobs"] = parsed["calibration"]["Recommended jobs"]
     else:
         parsed["jobs"] = args.get("--jobs") or 1
         parsed["jobs"] = int(parsed["jobs"])
@@ -381,6 +984,15 @@ def parse_args(args):
     # Chuncked output
     parsed["output_chunks"] = int(args.get("--output-chunks") or 0)
 
+    # Interleaved blocks of runs
+    parsed["block_runs"] = args.get("--block-runs")
+    if parsed["block_runs"] is not None:
+        parsed["block_runs"] = int(parsed["block_runs"])
+        if parsed["block_runs"] <= 0:
+            raise ValueError("Block runs must be >= 1")
+        if parsed["output_chunks"] and parsed["block_runs"] % parsed["output_chunks"]:
+            raise ValueError("Block runs must be a multiple of the output chunks")
+
     # Methods
     try:
         methods = args.get("--methods").rsplit(",")
@@ -405,10 +1017,26 @@ def parse_args(args):
         Path(args.get("--slurm")) if args.get("--slurm") is not None else None
     )
 
+    # Work queue
+    parsed["queue"] = (
+        Path(args.get("--queue")) if args.get("--queue") is not None else None
+    )
+    if parsed["queue"] is not None and parsed["queue"].exists():
+        raise FileExistsError(f"Work queue already exists: '{parsed['queue']}'")
+
+    # Dry run, results to calibrate it from
+    parsed["plan"] = None
+    if args.get("--plan"):
+        plan_from = args.get("--plan-from") or ""
+        parsed["plan"] = [Path(i) for i in plan_from.split(",") if i]
+        for i in parsed["plan"]:
+            if not i.is_dir():
+                raise NotADirectoryError(f"Invalid result directory: '{i}'")
+
     # Output
     now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     if args.get("--output") is None:
-        if parsed["slurm"] is not None:
+        if any(parsed[i] is not None for i in ("slurm", "queue", "plan")):
             # Don't create an output folder if using slurm,
             # that is the shell script's responsibility.
             # Assume that the output should be in the folder I'm in.
@@ -431,20 +1059,93 @@ def parse_args(args):
     parsed["cachegrind"] = args.get("--cachegrind")
     parsed["massif"] = args.get("--massif")
     parsed["valgrind_opts"] = args.get("--valgrind-opt")
-
-    if parsed["slurm"] is None:
+    parsed["valgrind_lane"] = args.get("--valgrind-lane") or "after"
+    if parsed["valgrind_lane"] not in VALGRIND_LANES:
+        raise ValueError(f"Invalid valgrind lane: '{parsed['valgrind_lane']}'")
+    parsed["valgrind_jobs"] = args.get("--valgrind-jobs")
+    if parsed["valgrind_jobs"] is not None:
+        parsed["valgrind_jobs"] = int(parsed["valgrind_jobs"])
+        if parsed["valgrind_jobs"] <= 0:
+            raise ValueError("Valgrind jobs must be >= 1")
+
+    # Sampling of the valgrind runs
+    parsed["sample"] = None
+    if args.get("--sample") is not None:
+        parsed["sample"] = parse_sample_arg(args["--sample"], list(VALGRIND_TOOLS))
+    parsed["sample_from"] = [
+        Path(i) for i in (args.get("--sample-from") or "").split(",") if i
+    ]
+    for i in parsed["sample_from"]:
+        if not i.is_dir():
+            raise NotADirectoryError(f"Invalid result directory: '{i}'")
+
+    # Reruns
+    parsed["retries"] = int(args.get("--retries") or 0)
+    if parsed["retries"] < 0:
+        raise ValueError("Retries must be >= 0")
+    parsed["noise_limits"] = parse_noise_limits(args.get("--noise-limits"))
+
+    # Run order
+    parsed["order"] = args.get("--order") or "random"
+    if parsed["order"] not in ORDERS:
+        raise ValueError(f"Invalid order: '{parsed['order']}'")
+    parsed["seed"] = int(args["--seed"]) if args.get("--seed") else None
+
+    # Placement
+    parsed["affinity"] = bool(args.get("--affinity"))
+    parsed["smt"] = args.get("--smt")
+
+    # Memory budget of local runs
+    parsed["memory_budget"] = None
+    if all(parsed[i] is None for i in ("slurm", "queue", "plan")):
+        parsed["memory_budget"] = parse_memory_arg(args.get("--memory") or "90%")
+
+    if all(parsed[i] is None for i in ("slurm", "queue", "plan")):
         Path(parsed["output"].parent, "valgrind").mkdir(exist_ok=True)
 
     return parsed
 
 
+class Lane:
+    """
+    Jobs dispatched to one group of workers, in order.
+
+    A lane only runs the commands within its `flags`, so the base and valgrind
+    runs of the same job may run in different lanes, see `Scheduler._lanes`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        queue: np.ndarray,
+        flags: int = BASE | VALGRIND,
+        placement: Optional[list] = None,
+    ):
+        """
+        @param queue: Job ids in run order, `cursor` is the next one to dispatch.
+        @param flags: Run types to run, BASE | CALLGRIND | ...
+        @param placement: CPU of every worker, see `Job.run`.
+        """
+        self.name = name
+        self.queue = queue
+        self.cursor = 0
+        self.flags = flags
+        self.placement = placement or []
+        # Jobs admitted ahead of the next one in a row, see `Scheduler._admit`.
+        self.skipped = 0
+
+    def remaining(self) -> np.ndarray:
+        """Ids of the jobs not dispatched yet."""
+        return self.queue[self.cursor :]
+
+
 class Scheduler:
     """Utility class allowing for easy job generation and scheduling across many threads."""
 
     def __init__(
         self,
         data_dir: Path,
-        exec: Path,
+        execs: list[Path],
         jobs: int,
         output_chunks: int,
         methods: list[str],
@@ -459,12 +1160,26 @@ class Scheduler:
         cachegrind: bool,
         massif: bool,
         valgrind_opts: Optional[list[str]],
+        retries: int = 0,
+        noise_limits: Optional[dict[str, float]] = None,
+        affinity: bool = False,
+        smt: bool = False,
+        calibration: Optional[dict] = None,
+        block_runs: Optional[int] = None,
+        order: str = "random",
+        seed: Optional[int] = None,
+        queue: Optional[Path] = None,
+        memory_budget: Optional[int] = None,
+        valgrind_lane: str = "after",
+        valgrind_jobs: Optional[int] = None,
+        sample: Optional[dict[str, dict]] = None,
+        sample_from: Optional[list[Path]] = None,
     ):
         """
         Define the base parameters.
 
         @param data_dir: Path to input data.
-        @param exec: Path to executable.
+        @param execs: Path to every executable, all of them run the same jobs.
         @param jobs: Number of jobs to run concurrently.
         @param methods: List of all the methods to test.
         @param output: Path to output CSV file with all test results.
@@ -475,9 +1190,32 @@ class Scheduler:
         @param progress: Optionally enable a progress bar.
         @param callgrind: Optionally run all experiments with callgrind.
         @param massif: Optionally run all experiments with massif.
+        @param retries: Maximum number of times to rerun perturbed jobs.
+        @param noise_limits: Maximum value of HSO-c counter columns before a
+                             run counts as perturbed.
+        @param affinity: Pin every worker to a dedicated physical core.
+        @param smt: Also pin workers to SMT siblings of used cores.
+        @param calibration: Concurrency calibration of this node, if any.
+        @param block_runs: Split the runs of every job into blocks of this many
+                           runs when comparing executables, the blocks of every
+                           executable are interleaved in a random order.
+        @param order: Order to run the jobs in, see `order_units`.
+        @param seed: Seed of the random order, a random seed if None.
+        @param queue: Optional path to a work queue to create, rather than
+                      running the jobs.
+        @param memory_budget: Bytes of memory all running jobs may use, see
+                              `_admit`. No limit if None.
+        @param valgrind_lane: Where valgrind runs, see `_lanes`.
+        @param valgrind_jobs: Number of concurrent valgrind runs, one per
+                              available CPU if None.
+        @param sample: Sampling policy of the valgrind runs, every job runs
+                       them if None, see `sample.sample_jobs`.
+        @param sample_from: Previous results to center the sampled thresholds
+                            on, see `sample.fastest_thresholds`.
         """
         self.data_dir = data_dir
-        self.exec = exec
+        self.execs = execs
+        self.exec_labels = exec_labels(execs)
         self.jobs = jobs
         self.output_chunks = output_chunks
         self.methods = methods
@@ -493,87 +1231,341 @@ class Scheduler:
         self.cachegrind = cachegrind
         self.massif = massif
         self.valgrind_opts = valgrind_opts
+        self.retries = retries
+        self.noise_limits = noise_limits or {}
+        self.affinity = affinity
+        self.smt = smt
+        self.calibration = calibration
+        self.block_runs = block_runs
+        self.order = order
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2**32)
+        self.queue = queue
+        self.memory_budget = memory_budget
+        self.valgrind_lane = valgrind_lane
+        self.valgrind_jobs = valgrind_jobs
+        self.sample = sample
+        self.sample_from = sample_from or []
+        self.rng = np.random.default_rng(self.seed)
 
         if not any([self.callgrind, self.cachegrind, self.massif]):
             self.base = True
 
-        self.job_queue: "deque[Job]" = deque()
-        self.active_queue: "deque[Job]" = deque()
+        self.table: Optional[JobTable] = None
+        # Job ids in run order, `lane` holds the ones not dispatched yet.
+        self.job_order = np.empty(0, dtype=np.int64)
+        self.lane = Lane("all", self.job_order.copy())
+        self._lock = threading.Lock()
+
+        # Admission control, see `_admit`.
+        self._admission = threading.Condition(self._lock)
+        self._reserved: dict[tuple[str, int], float] = {}
+        self._memory_used = 0.0
+        self._memory_log = None
 
-        self.valid_methods, self.threshold_methods = get_supported_methods(self.exec)
+        self.valid_methods, self.threshold_methods = get_common_methods(self.execs)
 
         self._gen_jobs()
 
     def _get_exec_version(self) -> str:
         """Call the process and parse the version output."""
-        cmd = (self.exec, "--version")
+        cmd = (self.execs[0], "--version")
         p = subprocess.Popen(cmd, stdout=subprocess.PIPE)
         stdout, _ = p.communicate()
         return stdout.decode()
 
+    def _run_blocks(self) -> list[int]:
+        """Get the number of runs of every block of a job."""
+        if len(self.execs) == 1 or self.block_runs is None or not self.base:
+            return [self.runs]
+
+        blocks = [self.block_runs] * (self.runs // self.block_runs)
+        if self.runs % self.block_runs:
+            blocks.append(self.runs % self.block_runs)
+        return blocks
+
     def _gen_jobs(self):
-        """Populate the queue with jobs."""
-        files = self.data_dir.glob(r"**/*.gz")
-        self.job_queue.clear()
+        """
+        Populate the job table and the run order.
+
+        Every executable gets the same jobs. The runs of a job are split into
+        blocks (see `block_runs`), each block is run by every executable in a
+        random order, so drifting machine state affects all of them equally.
+        Valgrind only runs with the first block.
 
-        job_id = 0
-        for f in files:
+        The units are then ordered, see `order_units`.
+        """
+        inputs = sorted(self.data_dir.glob(r"**/*.gz"))
+        descriptions = []
+        for f in inputs:
             # Get the type of data from one of the subdirectory names.
             desc = "N/A"
             for t in DATA_TYPES:
                 if f"/{t}" in str(f):
                     desc = t
                     break
-
-            params = {
-                "job_id": job_id,
-                "exec_path": self.exec,
-                "infile_path": f,
-                "description": desc,
-                "method": None,
-                "runs": self.runs,
-                "output": self.output,
-                "threshold": 1,
-                "output_chunks": self.output_chunks,
-                "base": self.base,
-                "callgrind": self.callgrind,
-                "cachegrind": self.cachegrind,
-                "massif": self.massif,
-                "valgrind_opts": self.valgrind_opts,
-            }
-            for method in self.methods:
-                params["method"] = method
-                # Only methods in THRESHOLD_METHODS care about threshold value.
-                if method in self.threshold_methods:
-                    for thresh in self.threshold:
-                        params["threshold"] = thresh
-                        job = Job(**params)
-                        self.job_queue.append(job)
-                        job_id += 1
-                        params["job_id"] = job_id
-                else:
-                    params["threshold"] = None
-                    job = Job(**params)
-                    self.job_queue.append(job)
-                    job_id += 1
-                    params["job_id"] = job_id
-
-        # random.shuffle(self.job_queue)
-        self.active_queue = self.job_queue
+            descriptions.append(desc)
+
+        flags = BASE if self.base else 0
+        flags |= CALLGRIND if self.callgrind else 0
+        flags |= CACHEGRIND if self.cachegrind else 0
+        flags |= MASSIF if self.massif else 0
+
+        self.table = JobTable.sweep(
+            self.execs,
+            self.exec_labels,
+            inputs,
+            descriptions,
+            list(self.methods),
+            set(self.threshold_methods),
+            sorted(self.threshold),
+            self._run_blocks(),
+            flags,
+            self.output,
+            output_chunks=self.output_chunks,
+            valgrind_opts=self.valgrind_opts,
+            rng=self.rng,
+        )
+        if self.sample is not None and flags & VALGRIND:
+            self._sample_jobs()
+
+        # Units are the consecutive rows of every executable.
+        rows = self.table.rows[:: len(self.execs)]
+        units = order_units(
+            rows["input"],
+            rows["block"],
+            rows["method"].astype(np.int64) << 32 | rows["threshold"].astype(np.uint32),
+            self.order,
+            self.rng,
+        )
+        self.job_order = (
+            units[:, None] * len(self.execs) + np.arange(len(self.execs))
+        ).ravel()
+        self._restore_jobs()
+
+    def _sample_jobs(self):
+        """Only keep the valgrind runs within the sampling policy."""
+        caches = get_cache_sizes()
+        if not caches and any(i["sizes"] == "cache" for i in self.sample.values()):
+            print(
+                "[Warning]: Unknown cache sizes, running valgrind with every size",
+                file=sys.stderr,
+            )
+        sample_jobs(
+            self.table,
+            input_sizes(self.data_dir, self.table.inputs),
+            self.sample,
+            {k: v for k, v in RUN_TYPES.items() if k & VALGRIND},
+            fastest=fastest_thresholds(self.sample_from),
+            caches=caches,
+        )
 
     def _restore_jobs(self):
         """Bring all the jbos from the last _gen_jobs() back into the active queue."""
-        self.active_queue = self.job_queue
+        self.lane = Lane("all", self.job_order.copy())
+
+    def _next_job(self, lane: Lane) -> Optional[Job]:
+        """
+        Get the next job of a lane to dispatch, None once all are.
 
-    def _worker(self):
+        With a memory budget, waits until a job fits, see `_admit`.
+        """
+        with self._admission:
+            while True:
+                if lane.cursor >= len(lane.queue):
+                    return None
+                if self.memory_budget is None:
+                    position = lane.cursor
+                    break
+                position = self._admit(lane)
+                if position is not None:
+                    break
+                self._admission.wait()
+
+            # Move the job to the cursor, the ones it skipped stay next.
+            job_id = int(lane.queue[position])
+            queue = lane.queue
+            queue[lane.cursor + 1 : position + 1] = queue[lane.cursor : position]
+            queue[lane.cursor] = job_id
+            lane.cursor += 1
+            self.table.rows["seq"][job_id] = next(self._seq)
+            return self.table.job(job_id, lane.flags)
+
+    def _estimate_rss(self, job_ids: np.ndarray, flags=BASE | VALGRIND) -> np.ndarray:
+        """
+        Estimated peak RSS of every job in bytes, the largest of its commands
+        within `flags`, scaled by the measurements of the same method so far.
+        """
+        rows = self.table.rows[job_ids]
+        n = self.sizes[rows["input"]]
+        rss = np.zeros(len(rows))
+        for col, (bit, run_type) in enumerate(RUN_TYPES.items()):
+            est = peak_rss(n, run_type) * self._rss_scale[rows["method"], col]
+            rss = np.where(rows["flags"] & flags & bit, np.maximum(rss, est), rss)
+        return rss
+
+    def _admit(self, lane: Lane) -> Optional[int]:
+        """
+        Reserve memory for the next job of a lane, call with the lock held.
+
+        The next job runs once it fits within the budget. Until then, smaller
+        jobs from the next `ADMISSION_LOOKAHEAD` are packed around the running
+        ones, but only one per worker in a row so the next job isn't starved.
+        A job above the whole budget runs once nothing else does. The budget
+        is shared by every lane.
+
+        @returns: Position of the job within the lane, None to wait for a
+                  running job to finish.
+        """
+        free = self.memory_budget - self._memory_used
+        window = lane.queue[lane.cursor : lane.cursor + ADMISSION_LOOKAHEAD]
+        rss = self._estimate_rss(window[:1], lane.flags)
+        if rss[0] <= free or not self._reserved:
+            if rss[0] > self.memory_budget:
+                print(
+                    f"[Warning]: Job {window[0]} needs about {rss[0] / (1 << 20):.0f} "
+                    "MiB, more than the memory budget, running it alone",
+                    file=sys.stderr,
+                )
+            position = 0
+            lane.skipped = 0
+        elif lane.skipped < len(lane.placement):
+            rss = self._estimate_rss(window, lane.flags)
+            fits = np.flatnonzero(rss <= free)
+            if not len(fits):
+                return None
+            position = int(fits[0])
+            lane.skipped += 1
+        else:
+            return None
+
+        self._reserved[lane.name, int(window[position])] = rss[position]
+        self._memory_used += rss[position]
+        return lane.cursor + position
+
+    def _release(self, lane: Lane, job_id: int):
+        """Give back the memory reserved for a job."""
+        with self._admission:
+            self._memory_used -= self._reserved.pop((lane.name, job_id), 0.0)
+            self._admission.notify_all()
+
+    def _record_memory(self, job_id: int, max_rss: list[int], flags: int):
+        """
+        Log the measured peak RSS of every command of a job within `flags` to
+        memory.csv, and rescale the estimates of its method to the largest
+        measured ratio.
+
+        A child starts out with the RSS of this process (see `_call`), so a
+        peak below it is unknown and left empty.
+        """
+        floor = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        row = self.table.rows[job_id]
+        n = self.sizes[row["input"]]
+        method = self.table.methods[row["method"]]
+        run_types = [
+            (col, run_type)
+            for col, (bit, run_type) in enumerate(RUN_TYPES.items())
+            if row["flags"] & flags & bit
+        ]
+        with self._lock:
+            for (col, run_type), measured in zip(run_types, max_rss):
+                estimated = float(peak_rss(n, run_type))
+                scale = self._rss_scale[row["method"], col]
+                self._memory_log.writerow(
+                    [
+                        job_id,
+                        self.exec_labels[row["exec"]],
+                        method,
+                        self.table.descriptions[row["input"]],
+                        n,
+                        run_type,
+                        row["retries"],
+                        measured if measured > floor else "",
+                        int(estimated * scale) // 1024,
+                    ]
+                )
+                if measured <= floor:
+                    continue
+                ratio = measured * 1024 / estimated
+                if self._rss_measured[row["method"], col]:
+                    ratio = max(ratio, scale)
+                self._rss_scale[row["method"], col] = ratio
+                self._rss_measured[row["method"], col] = True
+
+    def _worker(self, lane: Lane, core=None):
         """Worker function for each thread."""
-        while self.active_queue:
-            job = self.active_queue.pop()
-            job.run(quiet=self.progress, pbar=self.pbar)
+        pin_thread(core)
+        while (job := self._next_job(lane)) is not None:
+            try:
+                max_rss = job.run(quiet=self.progress, pbar=self.pbar, core=core)
+                self._record_memory(job.job_id, max_rss, lane.flags)
+            finally:
+                self._release(lane, job.job_id)
+
+    def _sample_info(self) -> Optional[dict]:
+        """Sampling policy of the valgrind runs for job_details.json."""
+        if self.sample is None:
+            return None
+        return {
+            "Policy": self.sample,
+            "From": [str(i) for i in self.sample_from],
+            "Caches": get_cache_sizes(),
+        }
+
+    def _get_placement(self, jobs: int) -> list[Optional[int]]:
+        """Get the CPU of every worker, None for unpinned workers."""
+        if not self.affinity:
+            return [None] * jobs
+
+        placement = get_placement(jobs, smt=self.smt)
+        if len(placement) < jobs:
+            print(
+                f"[Warning]: Only {len(placement)} cores available, "
+                f"running {len(placement)} jobs concurrently instead of {jobs}",
+                file=sys.stderr,
+            )
+        return placement
+
+    def _lanes(self) -> list[list[Lane]]:
+        """
+        Split the remaining jobs into lanes, so valgrind runs, which are much
+        slower and whose times don't matter, don't perturb the base runs.
+
+        With `valgrind_lane` "after", valgrind runs once every base run is
+        done, on every CPU. With "cores", at the same time, on the cores not
+        used by the base runs. With "shared", every job runs all of its
+        commands back to back within the same worker.
+
+        @returns: Phases to run one after another, with the lanes to run
+                  concurrently within each.
+        """
+        job_ids = self.lane.remaining()
+        flags = self.table.rows["flags"][job_ids]
+        placement = self._get_placement(self.jobs)
+        if self.valgrind_lane == "shared" or not (flags & VALGRIND).any():
+            return [[Lane("all", job_ids.copy(), placement=placement)]]
+
+        base = Lane("base", job_ids[flags & BASE != 0], BASE, placement)
+        job_ids = job_ids[flags & VALGRIND != 0]
+        if self.valgrind_lane == "cores":
+            # Whole cores, so valgrind doesn't share one with a base run.
+            used = set(placement)
+            cores = [i for i in get_cores() if not used.intersection(i)]
+            cpus = tuple(cpu for core in cores for cpu in core)
+            if cpus and self.affinity:
+                placement = [cpus] * (self.valgrind_jobs or len(cpus))
+                return [[base, Lane("valgrind", job_ids, VALGRIND, placement)]]
+            reason = "No cores left" if self.affinity else "No --affinity"
+            print(
+                f"[Warning]: {reason} for valgrind, running it after the base runs",
+                file=sys.stderr,
+            )
+
+        placement = [None] * (self.valgrind_jobs or len(get_allowed_cpus()))
+        return [[base], [Lane("valgrind", job_ids, VALGRIND, placement)]]
 
     def run_jobs(self):
         """Run all the jobs on the local machine."""
-        total_num_jobs = sum([len(job) for job in self.active_queue])
+        total_num_jobs = self.table.num_commands(self.lane.remaining())
         print("===========================", file=sys.stderr)
         print(f"About to run {total_num_jobs} jobs", file=sys.stderr)
         print("===========================", file=sys.stderr)
@@ -581,14 +1573,25 @@ class Scheduler:
         print("Okay, lets do it!", file=sys.stderr)
 
         self.pbar = tqdm(total=total_num_jobs, disable=not self.progress)
+        self._seq = itertools.count()
+        phases = self._lanes()
+        lanes = {
+            lane.name: {"Phase": i, "Jobs": len(lane.placement)}
+            for i, phase in enumerate(phases)
+            for lane in phase
+        }
 
         # Log system info
         write_info(
             self.output.parent,
+            placement=phases[0][0].placement if self.affinity else None,
+            calibration=self.calibration,
             command=" ".join(sys.argv),
             data_details_path=Path(self.data_dir, "details.json"),
             concurrent=self.jobs,
-            exec_path=self.exec,
+            order={"Strategy": self.order, "Seed": self.seed},
+            exec_path=self.execs[0],
+            execs=dict(zip(self.exec_labels, self.execs)),
             runs=self.runs,
             total_num_jobs=total_num_jobs,
             total_num_sorts=total_num_jobs * self.runs,
@@ -596,6 +1599,9 @@ class Scheduler:
             base=self.base,
             callgrind=self.callgrind,
             massif=self.massif,
+            memory_budget=self.memory_budget,
+            valgrind_lane={"Mode": self.valgrind_lane, "Lanes": lanes},
+            valgrind_sample=self._sample_info(),
         )
         # Create my own process group
         try:
@@ -603,10 +1609,27 @@ class Scheduler:
         except PermissionError:
             pass
 
-        threads = []
+        # Peak RSS estimates, rescaled per (method, run type) as jobs finish.
+        self.sizes = input_sizes(self.data_dir, self.table.inputs)
+        self._rss_scale = np.ones((len(self.table.methods), len(RUN_TYPES)))
+        self._rss_measured = np.zeros(self._rss_scale.shape, dtype=bool)
+
+        with open(Path(self.output.parent, "memory.csv"), "a", newline="") as fp:
+            self._memory_log = csv.writer(fp)
+            if fp.tell() == 0:
+                self._memory_log.writerow(MEMORY_COLUMNS)
+            for lanes in phases:
+                self._run_lanes(lanes)
+            self._retry_noisy_jobs()
+
+    def _run_lanes(self, lanes: list[Lane]):
+        """Run every lane concurrently, one thread per CPU of its placement."""
+        threads = [
+            threading.Thread(target=self._worker, args=(lane, core), daemon=True)
+            for lane in lanes
+            for core in lane.placement
+        ]
         try:
-            for _ in range(self.jobs):
-                threads.append(threading.Thread(target=self._worker, daemon=True))
             for i in threads:
                 i.start()
             for i in threads:
@@ -615,6 +1638,117 @@ class Scheduler:
             # Kill myself and all my processes if told to
             os.killpg(0, signal.SIGKILL)
 
+    def _find_noisy_jobs(self) -> set[int]:
+        """Get the ids of every job with a base run above `noise_limits`."""
+        noisy = set()
+        with open(self.output, newline="") as fp:
+            for row in csv.DictReader(fp):
+                if row["run_type"] != "base":
+                    continue
+                for col, limit in self.noise_limits.items():
+                    if float(row[col]) > limit:
+                        noisy.add(int(row["id"]))
+                        break
+        return noisy
+
+    def _drop_base_rows(self, job_ids: set[int]):
+        """Remove the base runs of the given jobs from the output CSV."""
+        tmp = self.output.with_suffix(".tmp")
+        with open(self.output, newline="") as in_fp, open(tmp, "w", newline="") as out_fp:
+            reader = csv.reader(in_fp)
+            writer = csv.writer(out_fp, lineterminator="\n")
+            header = next(reader)
+            writer.writerow(header)
+            id_col = header.index("id")
+            run_type_col = header.index("run_type")
+            for row in reader:
+                if row[run_type_col] == "base" and int(row[id_col]) in job_ids:
+                    continue
+                writer.writerow(row)
+        os.replace(tmp, self.output)
+
+    def _retry_noisy_jobs(self):
+        """
+        Rerun the base runs of perturbed jobs, at reduced concurrency.
+
+        The perturbed rows are replaced, every row records its number of
+        retries within the `retries` column.
+        """
+        if not self.noise_limits or not self.output.is_file():
+            return
+
+        # Executables other than HSO-c may not output every counter.
+        with open(self.output, newline="") as fp:
+            header = next(csv.reader(fp), [])
+        for col in self.noise_limits:
+            if col not in header:
+                raise ValueError(
+                    f"Noise limit column '{col}' is not within '{self.output}'"
+                )
+
+        jobs = self.jobs
+        for _ in range(self.retries):
+            noisy = self._find_noisy_jobs()
+            if not noisy:
+                return
+
+            jobs = max(1, jobs // 2)
+            print(
+                f"Rerunning {len(noisy)} perturbed jobs with {jobs} threads",
+                file=sys.stderr,
+            )
+            self._drop_base_rows(noisy)
+            job_ids = np.array(sorted(noisy), dtype=np.int64)
+            self.table.rows["retries"][job_ids] += 1
+
+            self.pbar.total += len(noisy)
+            self.pbar.refresh()
+            self._run_lanes([Lane("retry", job_ids, BASE, self._get_placement(jobs))])
+
+    def gen_queue(self):
+        """
+        Create a work queue of the remaining jobs, see `workqueue.py`.
+
+        Every unit (the executables of a block) is a single task, so the jobs
+        compared against each other always run on the same node.
+        """
+        self.queue.mkdir(parents=True)
+        with self._lock:
+            job_order = self.lane.remaining()
+            self.lane.cursor = len(self.lane.queue)
+        total_num_jobs = self.table.num_commands(job_order)
+        write_info(
+            self.queue,
+            command=" ".join(sys.argv),
+            concurrent="queue",
+            order={"Strategy": self.order, "Seed": self.seed},
+            data_details_path=Path(self.data_dir, "details.json"),
+            exec_path=self.execs[0],
+            execs=dict(zip(self.exec_labels, self.execs)),
+            runs=self.runs,
+            total_num_jobs=total_num_jobs,
+            total_num_sorts=total_num_jobs * self.runs,
+            arcc_partition=self.arcc_partition,
+            base=self.base,
+            callgrind=self.callgrind,
+            massif=self.massif,
+            valgrind_sample=self._sample_info(),
+        )
+
+        self.table.rows["seq"][job_order] = np.arange(len(job_order))
+        self.table.save(self.queue)
+        tasks = job_order.reshape(-1, len(self.execs))
+        WorkQueue.create(self.queue, tasks)
+        print(f"{self.queue}: {len(tasks)} tasks, {total_num_jobs} jobs")
+
+    def plan(self, result_dirs: list[Path]):
+        """Print the predicted cost of the remaining jobs, see `plan.py`."""
+        model = CostModel.from_results(result_dirs)
+        sizes = input_sizes(self.data_dir, self.table.inputs)
+        table = self.table.like(self.table.rows[self.lane.remaining()])
+        groups = estimate(table, sizes, model, RUN_TYPES)
+        print(format_plan(groups, model, self.jobs))
+
     def gen_slurm(self):
         """Create the slurm.d/ directory with all necessary parameters."""
         if self.slurm.exists() and self.slurm.is_dir():
@@ -623,39 +1757,317 @@ class Scheduler:
             raise FileExistsError("Slurm output cannot be a file")
 
         self.slurm.mkdir()
-        total_num_jobs = sum([len(job) for job in self.active_queue])
+        total_num_jobs = self.table.num_commands(self.lane.remaining())
         write_info(
             self.slurm,
             command=" ".join(sys.argv),
             concurrent="slurm",
+            order={"Strategy": self.order, "Seed": self.seed},
             data_details_path=Path(self.data_dir, "details.json"),
-            exec_path=self.exec,
+            exec_path=self.execs[0],
+            execs=dict(zip(self.exec_labels, self.execs)),
             runs=self.runs,
             total_num_jobs=total_num_jobs,
             total_num_sorts=total_num_jobs * self.runs,
             base=self.base,
             callgrind=self.callgrind,
             massif=self.massif,
+            valgrind_sample=self._sample_info(),
         )
-        index = 0
-        while self.active_queue:
-            current_file = Path(self.slurm, f"{index}.dat")
-            with open(current_file, "w") as slurm_file:
-                size = 0
-                while self.active_queue and size < MAX_BATCH:
-                    job = self.active_queue.pop()
-                    for i in job.cli:
-                        slurm_file.write(i + "\n")
-                    size += len(job)
-            print(f"{current_file}: {size}")
-            index += 1
+        # Every batch is rendered and written by its own worker, only a few
+        # batches are in flight so memory doesn't grow with the sweep.
+        with self._lock:
+            job_order = self.lane.remaining()
+            self.lane.cursor = len(self.lane.queue)
+        self.table.rows["seq"][job_order] = np.arange(len(job_order))
+        bounds = batch_bounds(self.table.rows["flags"][job_order], MAX_BATCH)
+        workers = max(1, min(os.cpu_count() or 1, len(bounds)))
+
+        def batches():
+            for index, (start, end) in enumerate(bounds):
+                job_ids = job_order[start:end]
+                path = Path(self.slurm, f"{index}.dat")
+                yield path, job_ids, self.table.rows[job_ids]
+
+        if workers == 1:
+            _init_writer(self.table.like())
+            for path, job_ids, rows in batches():
+                print(f"{path}: {_write_batch(path, job_ids, rows)}")
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_writer,
+            initargs=(self.table.like(),),
+        ) as pool:
+            pending = collections.deque()
+            for path, job_ids, rows in batches():
+                pending.append((path, pool.submit(_write_batch, path, job_ids, rows)))
+                if len(pending) >= 2 * workers:
+                    path, future = pending.popleft()
+                    print(f"{path}: {future.result()}")
+            for path, future in pending:
+                print(f"{path}: {future.result()}")
+
+
+def order_units(
+    inputs: np.ndarray,
+    blocks: np.ndarray,
+    treatments: np.ndarray,
+    order: str,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """
+    Order the units of work, so slow drifts of the machine state (frequency,
+    temperature, other tenants) are not confounded with method or threshold.
+
+    - sequential: as generated, every threshold of a method back to back.
+    - random: uniformly shuffled.
+    - latin: every (input, block) is a row of a Latin square, so every
+      method/threshold runs at every position within a row equally often.
+      Rows are run in a random order.
+    - round-robin: alternate between inputs, the units of an input are
+      shuffled.
+
+    @param inputs: Input of every unit.
+    @param blocks: Block of every unit.
+    @param treatments: Method/threshold of every unit, as a single integer.
+    @param order: One of ORDERS.
+    @param rng: Source of randomness, seeded for a reproducible order.
+    @returns: The units in run order.
+    """
+    n = len(inputs)
+    if order == "sequential":
+        return np.arange(n)
+    if order == "random":
+        return rng.permutation(n)
+
+    if order == "round-robin":
+        # Rank of every unit within its (shuffled) input, then cycle through
+        # the inputs in a random order.
+        shuffled = rng.permutation(n)
+        by_input = shuffled[np.argsort(inputs[shuffled], kind="stable")]
+        first = np.searchsorted(inputs[by_input], inputs[by_input])
+        rank = np.empty(n, dtype=np.int64)
+        rank[by_input] = np.arange(n) - first
+        input_order = rng.permutation(int(inputs.max(initial=0)) + 1)
+        return np.lexsort((input_order[inputs], rank))
+
+    if order == "latin":
+        _, treatment = np.unique(treatments, return_inverse=True)
+        k = int(treatment.max(initial=0)) + 1
+        position = rng.permutation(k)
+
+        _, row = np.unique(inputs.astype(np.int64) << 16 | blocks, return_inverse=True)
+        row_rank = rng.permutation(int(row.max(initial=0)) + 1)[row]
+        # Cyclic shift of the shuffled treatments.
+        return np.lexsort(((position[treatment] - row_rank) % k, row_rank))
+
+    raise ValueError(f"Invalid order: '{order}'")
+
+
+def exec_labels(execs: list[Path]) -> list[str]:
+    """Name every executable by file name, or by path if the names clash."""
+    names = [i.name for i in execs]
+    if len(set(names)) == len(names):
+        return names
+    return [str(i) for i in execs]
+
+
+def get_common_methods(execs: list[Path]) -> tuple[list[str], list[str]]:
+    """
+    Get the methods supported by every executable.
+
+    @returns: (All, Threshold) methods, in the order of the first executable.
+    """
+    methods = [get_fingerprint(i)["Methods"] for i in execs]
+    valid_methods = [
+        i for i in methods[0]["All"] if all(i in m["All"] for m in methods[1:])
+    ]
+    threshold_methods = [i for i in methods[0]["Threshold"] if i in valid_methods]
+    return valid_methods, threshold_methods
+
+
+def calibration_path(node: Optional[str] = None) -> Path:
+    """Get the path to the calibration of a node, defaults to this node."""
+    return CALIBRATION_DIR / f"{node or platform.node()}.json"
+
+
+def load_calibration(node: Optional[str] = None) -> Optional[dict]:
+    """Load the calibration of a node, None if it was never calibrated."""
+    path = calibration_path(node)
+    if not path.is_file():
+        return None
+    with open(path, "r") as fp:
+        return json.load(fp)
+
+
+def _measure(jobs: list[Job], placement: list[Optional[int]], output: Path):
+    """
+    Run every job once per worker, all workers concurrently.
+
+    @returns: Median wall time of every job id.
+    """
+    def worker(core):
+        pin_thread(core)
+        for job in jobs:
+            job.run(quiet=True, core=core)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in placement]
+    for i in threads:
+        i.start()
+    for i in threads:
+        i.join()
+
+    walls = {}
+    with open(output, newline="") as fp:
+        for row in csv.DictReader(fp):
+            walls.setdefault(int(row["id"]), []).append(int(row["wall_nsecs"]))
+    output.unlink()
+    return {k: statistics.median(v) for k, v in walls.items()}
+
+
+def calibrate(
+    exec_path: Path,
+    data_dir: Path,
+    method: str,
+    runs: int,
+    budget: float,
+    max_jobs: int,
+    affinity=False,
+    smt=False,
+) -> dict:
+    """
+    Find the highest concurrency that does not distort the measured times.
+
+    The reference job set (the first input of every data type) is run by 1,
+    2, 4, ... workers at once. The drift of a level is the mean, over every
+    reference job, of its median wall time relative to the single job level.
+
+    @param exec_path: Path to executable.
+    @param data_dir: Path to input data.
+    @param method: Method to sort the reference inputs with.
+    @param runs: Number of times to sort each reference input.
+    @param budget: Maximum drift, as a fraction (0.02 == 2%).
+    @param max_jobs: Highest concurrency to try.
+    @param affinity: Pin every worker to a dedicated physical core.
+    @param smt: Also pin workers to SMT siblings of used cores.
+    @returns: The calibration, see `calibration_path` for where it is saved.
+    """
+    files = {}
+    for f in sorted(data_dir.glob(r"**/*.gz")):
+        for t in DATA_TYPES:
+            if f"/{t}" in str(f):
+                files.setdefault(t, f)
+                break
+    if not files:
+        raise FileNotFoundError(f"No input data within '{data_dir}'")
+
+    levels = [1]
+    while levels[-1] * 2 <= max_jobs:
+        levels.append(levels[-1] * 2)
+    if levels[-1] != max_jobs:
+        levels.append(max_jobs)
+
+    drift = {}
+    recommended = 1
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp, "calibration.csv")
+        jobs = [
+            Job(i, exec_path, f, desc, method, runs, output, None)
+            for i, (desc, f) in enumerate(sorted(files.items()))
+        ]
+
+        baseline = None
+        for level in levels:
+            placement = get_placement(level, smt=smt) if affinity else [None] * level
+            if len(placement) < level:
+                break
+
+            walls = _measure(jobs, placement, output)
+            if baseline is None:
+                baseline = walls
+            drift[level] = statistics.fmean(walls[i] / baseline[i] - 1 for i in baseline)
+            print(f"{level:>4} jobs: {drift[level]:+.2%}", file=sys.stderr)
+
+            if drift[level] > budget:
+                break
+            recommended = level
+
+    return {
+        "Node": platform.node(),
+        "Date": datetime.now().isoformat(timespec="seconds"),
+        "Executable": get_fingerprint(exec_path)["Executable Version"],
+        "Method": method,
+        "Runs": runs,
+        "Reference inputs": [str(i) for i in sorted(files.values())],
+        "Affinity": affinity,
+        "SMT": smt,
+        "Budget": budget,
+        "Drift": drift,
+        "Recommended jobs": recommended,
+    }
+
+
+def calibrate_main(args):
+    """Run the calibrate subcommand and persist the result for this node."""
+    exec_path = Path(args.get("<EXEC>"))
+    if not exec_path.is_file():
+        raise FileNotFoundError(f"Can't find executable: '{exec_path.absolute()}'")
+
+    data_dir = Path(args.get("<DATA_DIR>"))
+    if not data_dir.is_dir():
+        raise NotADirectoryError("Invalid data directory")
+
+    methods = get_fingerprint(exec_path)["Methods"]
+    valid_methods, threshold_methods = methods["All"], methods["Threshold"]
+    method = (args.get("--methods") or "qsort").split(",")[0]
+    if method not in valid_methods or method in threshold_methods:
+        raise ValueError(f"Invalid reference method: '{method}'")
+
+    affinity = bool(args.get("--affinity"))
+    smt = args.get("--smt")
+    max_jobs = args.get("--max-jobs")
+    if max_jobs is None:
+        max_jobs = len(get_placement(smt=smt)) if affinity else os.cpu_count()
+    max_jobs = int(max_jobs)
+    if max_jobs <= 0:
+        raise ValueError("Max jobs must be >= 1")
+
+    calibration = calibrate(
+        exec_path,
+        data_dir,
+        method=method,
+        runs=int(args.get("--runs") or 10),
+        budget=float(args.get("--budget")) / 100,
+        max_jobs=max_jobs,
+        affinity=affinity,
+        smt=smt,
+    )
+
+    path = calibration_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as fp:
+        json.dump(calibration, fp, indent=4)
+
+    print(f"Recommended: --jobs={calibration['Recommended jobs']} (saved to {path})")
 
 
 if __name__ == "__main__":
-    args = parse_args(docopt(__doc__, version=VERSION))
+    docopt_args = docopt(__doc__, version=VERSION)
+    if docopt_args["calibrate"]:
+        calibrate_main(docopt_args)
+        sys.exit()
+
+    args = parse_args(docopt_args)
+    plan_from = args.pop("plan")
 
     s = Scheduler(**args)
-    if args["slurm"]:
+    if plan_from is not None:
+        s.plan(plan_from)
+    elif args["slurm"]:
         s.gen_slurm()
+    elif args["queue"]:
+        s.gen_queue()
     else:
         s.run_jobs()
@@ -0,0 +1,366 @@
+"""
+Predict the cost of a sweep before running it.
+
+Every command of a `JobTable` is costed from the size of its input: the time
+to start HSO-c and parse the input, then `runs` sorts of n * log2(n) steps
+(n^2 for the plain insertion sorts, see `COMPLEXITY`). The time of a step is
+calibrated per method, data type and run type from previous results (the
+wall_nsecs of their runs), and falls back to conservative constants for
+anything those results don't cover.
+
+Memory is estimated from what HSO-c allocates (the decompressed text, the
+parsed input, a copy to sort and the scratch of merge sorts), scaled to the
+peak RSS measured by previous results (memory.csv), and disk from the size of
+their CSVs and valgrind files.
+"""
+import csv
+import gzip
+import json
+import math
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Time of a single n * log2(n) step of a sort, qsort of int64 is about 4ns.
+DEFAULT_STEP_NSECS = 4.0
+
+# Methods that don't take n * log2(n) steps, as an exponent of n.
+COMPLEXITY = {"basic_ins": 2.0, "fast_ins": 2.0, "shell": 1.5}
+
+# Time to start HSO-c, and to decompress and parse a single element.
+STARTUP_NSECS = 2_000_000
+LOAD_NSECS = 30.0
+
+# Slowdown of every valgrind tool, as configured by `jobs.VALGRIND_TOOLS`.
+VALGRIND_SLOWDOWN = {"callgrind": 100.0, "cachegrind": 50.0, "massif": 20.0}
+
+# Memory of HSO-c: its baseline, and the parsed input, the copy to sort and
+# the scratch of a merge sort (sizeof(sort_t) each) on top of the text.
+BASE_RSS = 4 << 20
+SORT_T_SIZE = 8
+SORT_T_COPIES = 3
+
+# Valgrind keeps a shadow of every allocation plus its own baseline.
+VALGRIND_RSS_FACTOR = 2.0
+VALGRIND_BASE_RSS = 96 << 20
+
+# Disk used by a single CSV row and by every valgrind output file.
+DEFAULT_ROW_BYTES = 250
+DEFAULT_VALGRIND_BYTES = {
+    "callgrind": 2 << 20,
+    "cachegrind": 256 << 10,
+    "massif": 64 << 10,
+}
+
+
+def input_sizes(data_dir: Path, inputs: list[Path]) -> np.ndarray:
+    """
+    Number of elements of every input.
+
+    `data.py` names the inputs of every type 0.gz, 1.gz, ... each one
+    increment larger than the last, starting at the minimum of
+    `details.json`. Inputs that don't follow it are counted.
+    """
+    details_path = Path(data_dir, "details.json")
+    details = {}
+    if details_path.is_file():
+        with open(details_path, "r") as fp:
+            details = json.load(fp)
+
+    sizes = np.empty(len(inputs), dtype=np.int64)
+    for i, path in enumerate(inputs):
+        stem = path.name.split(".")[0]
+        if stem.isdigit() and "minimum" in details and "increment" in details:
+            sizes[i] = details["minimum"] + int(stem) * details["increment"]
+        else:
+            with gzip.open(path, "rb") as fp:
+                chunks = iter(lambda: fp.read(1 << 20), b"")
+                sizes[i] = sum(chunk.count(b"\n") for chunk in chunks)
+    return sizes
+
+
+def sort_steps(n: np.ndarray, method: Optional[str] = None) -> np.ndarray:
+    """Number of steps to sort n elements, n * log2(n) unless in `COMPLEXITY`."""
+    n = np.asarray(n, dtype=float)
+    if method in COMPLEXITY:
+        return n ** COMPLEXITY[method]
+    return n * np.log2(np.maximum(n, 2))
+
+
+def peak_rss(n: np.ndarray, run_type: str = "base") -> np.ndarray:
+    """Peak resident memory in bytes of a single command sorting n elements."""
+    n = np.asarray(n, dtype=float)
+    # Decimal text of every element, at most the digits of n plus a newline.
+    text = n * (np.floor(np.log10(np.maximum(n, 1))) + 2)
+    rss = BASE_RSS + text + n * SORT_T_SIZE * SORT_T_COPIES
+    if run_type != "base":
+        rss = VALGRIND_BASE_RSS + rss * VALGRIND_RSS_FACTOR
+    return rss
+
+
+class CostModel:
+    """Time of a sort step per (method, description, run type)."""
+
+    def __init__(self):
+        # {(method, description, run type): nsecs per step}
+        self.step_nsecs: dict[tuple[str, str, str], float] = {}
+        self.row_bytes = float(DEFAULT_ROW_BYTES)
+        self.valgrind_bytes = {k: float(v) for k, v in DEFAULT_VALGRIND_BYTES.items()}
+        # {(method, run type): largest measured / estimated peak RSS}
+        self.rss_scale: dict[tuple[str, str], float] = {}
+        self.num_runs = 0
+
+    @classmethod
+    def from_results(cls, result_dirs: list[Path]) -> "CostModel":
+        """
+        Calibrate from the CSVs and valgrind files of previous results.
+
+        The step time of a group is the geometric mean of wall_nsecs / steps
+        over every run, so a few slow runs don't dominate.
+        """
+        model = cls()
+        log_steps: dict[tuple[str, str, str], list[float]] = {}
+        csv_bytes, csv_rows = 0, 0
+        valgrind_sizes: dict[str, list[int]] = {k: [] for k in VALGRIND_SLOWDOWN}
+
+        for result_dir in result_dirs:
+            for path in Path(result_dir).glob("output*.csv"):
+                csv_bytes += path.stat().st_size
+                with open(path, "r", newline="") as fp:
+                    for row in csv.DictReader(fp):
+                        csv_rows += 1
+                        size, wall = int(row["size"]), float(row["wall_nsecs"])
+                        if size <= 0 or wall <= 0:
+                            continue
+                        key = (
+                            row["method"],
+                            row.get("description") or "N/A",
+                            row.get("run_type") or "base",
+                        )
+                        steps = float(sort_steps(size, row["method"]))
+                        log_steps.setdefault(key, []).append(math.log(wall / steps))
+
+            memory_path = Path(result_dir, "memory.csv")
+            if memory_path.is_file():
+                with open(memory_path, "r", newline="") as fp:
+                    for row in csv.DictReader(fp):
+                        if not row["max_rss_kb"]:
+                            continue
+                        key = (row["method"], row["run_type"])
+                        estimated = float(peak_rss(int(row["size"]), row["run_type"]))
+                        ratio = int(row["max_rss_kb"]) * 1024 / estimated
+                        model.rss_scale[key] = max(model.rss_scale.get(key, 0), ratio)
+
+            for tool, sizes in valgrind_sizes.items():
+                sizes.extend(
+                    i.stat().st_size
+                    for i in Path(result_dir, "valgrind").glob(f"*_{tool}.out*")
+                )
+
+        model.step_nsecs = {k: math.exp(sum(v) / len(v)) for k, v in log_steps.items()}
+        model.num_runs = sum(len(v) for v in log_steps.values())
+        if csv_rows:
+            model.row_bytes = csv_bytes / csv_rows
+        for tool, sizes in valgrind_sizes.items():
+            if sizes:
+                model.valgrind_bytes[tool] = sum(sizes) / len(sizes)
+        return model
+
+    def step(self, method: str, description: str, run_type: str = "base") -> float:
+        """
+        Time of a single sort step in nsecs.
+
+        Falls back to the same method on any data type, then to the base
+        time of the method times the slowdown of valgrind, then to
+        `DEFAULT_STEP_NSECS`.
+        """
+        key = (method, description, run_type)
+        if key in self.step_nsecs:
+            return self.step_nsecs[key]
+
+        same_method = [
+            v for k, v in self.step_nsecs.items() if k[0] == method and k[2] == run_type
+        ]
+        if same_method:
+            return math.exp(sum(math.log(i) for i in same_method) / len(same_method))
+
+        if run_type != "base":
+            return self.step(method, description) * VALGRIND_SLOWDOWN[run_type]
+        return DEFAULT_STEP_NSECS
+
+    def peak_rss(self, n, method: str, run_type: str = "base") -> float:
+        """Peak RSS in bytes, see `peak_rss`, scaled to previous measurements."""
+        scale = self.rss_scale.get((method, run_type), 1.0)
+        return float(peak_rss(n, run_type)) * scale
+
+    def slowdown(self, run_type: str) -> float:
+        """Slowdown of everything but the sort (startup, loading the input)."""
+        return VALGRIND_SLOWDOWN.get(run_type, 1.0)
+
+
+def estimate(
+    table, sizes: np.ndarray, model: CostModel, run_types: dict[int, str]
+) -> list[dict]:
+    """
+    Cost of every (method, description, run type) of a job table.
+
+    @param table: A `jobs.JobTable`.
+    @param sizes: Number of elements of every input of the table.
+    @param run_types: {flag: run type} of the table, see `jobs.RUN_TYPES`.
+    @returns One dict per group with the number of commands and sorts, the
+             CPU time and the longest command (nsecs), the peak memory of a
+             single command and the CSV and valgrind output (bytes).
+    """
+    rows = table.rows
+    num_inputs = len(table.inputs)
+    rows_per_command = table.output_chunks or None
+
+    groups = []
+    for flag, run_type in run_types.items():
+        has = (rows["flags"] & flag) != 0
+        if not has.any():
+            continue
+
+        # Aggregate per (method, input), the cost only depends on those.
+        key = rows["method"][has].astype(np.int64) * num_inputs + rows["input"][has]
+        count = np.bincount(key, minlength=len(table.methods) * num_inputs)
+        runs_of = rows["runs"][has]
+        if run_type in table.valgrind_runs:
+            runs_of = np.full(len(runs_of), table.valgrind_runs[run_type])
+        runs = np.bincount(
+            key, weights=runs_of, minlength=len(table.methods) * num_inputs
+        )
+        max_runs = int(runs_of.max())
+        out = {}
+        for k in np.flatnonzero(count):
+            method, i = divmod(int(k), num_inputs)
+            method, description = table.methods[method], table.descriptions[i]
+            n = sizes[i]
+            startup = (STARTUP_NSECS + LOAD_NSECS * n) * model.slowdown(run_type)
+            steps = float(sort_steps(n, method))
+            sort = model.step(method, description, run_type) * steps
+
+            group = out.setdefault(
+                (method, description),
+                {
+                    "method": method,
+                    "description": description,
+                    "run_type": run_type,
+                    "commands": 0,
+                    "sorts": 0,
+                    "cpu_nsecs": 0.0,
+                    "longest_nsecs": 0.0,
+                    "peak_rss": 0.0,
+                    "csv_bytes": 0.0,
+                    "valgrind_bytes": 0.0,
+                },
+            )
+            group["commands"] += int(count[k])
+            group["sorts"] += int(runs[k])
+            group["cpu_nsecs"] += count[k] * startup + runs[k] * sort
+            group["longest_nsecs"] = max(
+                group["longest_nsecs"], startup + max_runs * sort
+            )
+            group["peak_rss"] = max(
+                group["peak_rss"], model.peak_rss(n, method, run_type)
+            )
+            csv_rows = count[k] * rows_per_command if rows_per_command else runs[k]
+            group["csv_bytes"] += csv_rows * model.row_bytes
+            if run_type in model.valgrind_bytes:
+                group["valgrind_bytes"] += count[k] * model.valgrind_bytes[run_type]
+        groups.extend(out.values())
+    return groups
+
+
+def summarize(groups: list[dict], by: Optional[str] = None) -> list[dict]:
+    """Sum (max for the peaks) the groups of `estimate` by a key, or all of them."""
+    out = {}
+    for group in groups:
+        key = group[by] if by is not None else "total"
+        total = out.setdefault(
+            key,
+            {
+                "name": key,
+                "commands": 0,
+                "sorts": 0,
+                "cpu_nsecs": 0.0,
+                "longest_nsecs": 0.0,
+                "peak_rss": 0.0,
+                "csv_bytes": 0.0,
+                "valgrind_bytes": 0.0,
+            },
+        )
+        for k in ("commands", "sorts", "cpu_nsecs", "csv_bytes", "valgrind_bytes"):
+            total[k] += group[k]
+        for k in ("longest_nsecs", "peak_rss"):
+            total[k] = max(total[k], group[k])
+    return list(out.values())
+
+
+def wall_nsecs(total: dict, jobs: int) -> float:
+    """Wall time at `jobs` concurrent jobs, never less than the longest command."""
+    return max(total["cpu_nsecs"] / jobs, total["longest_nsecs"])
+
+
+def _duration(nsecs: float) -> str:
+    secs = nsecs / 1e9
+    if secs < 60:
+        return f"{secs:.1f}s"
+    minutes, secs = divmod(int(secs), 60)
+    if minutes < 60:
+        return f"{minutes}m {secs:02d}s"
+    return f"{minutes // 60}h {minutes % 60:02d}m"
+
+
+def _bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_plan(groups: list[dict], model: CostModel, jobs: int) -> str:
+    """Human readable plan, broken down by method, data type and run type."""
+    (total,) = summarize(groups)
+    source = (
+        f"calibrated from {model.num_runs} runs of {len(model.step_nsecs)} groups"
+        if model.num_runs
+        else "uncalibrated, pass previous results with --plan-from"
+    )
+    lines = [
+        f"Model:            {source}",
+        f"Commands:         {total['commands']}",
+        f"Sorts:            {total['sorts']}",
+        f"CPU time:         {_duration(total['cpu_nsecs'])}",
+        f"Wall time:        {_duration(wall_nsecs(total, jobs))} at {jobs} jobs",
+        f"Peak RAM per job: {_bytes(total['peak_rss'])}",
+        f"CSV output:       {_bytes(total['csv_bytes'])}",
+        f"Valgrind output:  {_bytes(total['valgrind_bytes'])}",
+    ]
+
+    header = ("", "commands", "CPU time", "longest", "peak RAM", "CSV", "valgrind")
+    for by in ("method", "description", "run_type"):
+        table = [header]
+        for group in sorted(summarize(groups, by), key=lambda g: -g["cpu_nsecs"]):
+            table.append(
+                (
+                    str(group["name"]),
+                    str(group["commands"]),
+                    _duration(group["cpu_nsecs"]),
+                    _duration(group["longest_nsecs"]),
+                    _bytes(group["peak_rss"]),
+                    _bytes(group["csv_bytes"]),
+                    _bytes(group["valgrind_bytes"]),
+                )
+            )
+        widths = [max(len(row[i]) for row in table) for i in range(len(header))]
+        lines += ["", f"By {by.replace('_', ' ')}:"]
+        for row in table:
+            lines.append(
+                "  ".join(
+                    v.ljust(w) if i == 0 else v.rjust(w)
+                    for i, (v, w) in enumerate(zip(row, widths))
+                ).rstrip()
+            )
+    return "\n".join(lines)
@@ -0,0 +1,5 @@
+"""QST-py, NumPy backed hybrid sorting methods and an HSO-c compatible benchmark."""
+__version__ = "1.0.0"
+
+from .methods import METHODS, THRESHOLD_METHODS
+from .sorts import msort_with_ins, msort_with_network, quicksort_with_ins
@@ -0,0 +1,269 @@
+"""
+Benchmark a single sorting method, drop-in compatible with HSO-c.
+
+The command line, the supported method listing and the output CSV match
+HSO-c, so `jobs.py` and the evaluator work with either executable.
+"""
+import argparse
+import gzip
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from . import __version__
+from .methods import METHODS, THRESHOLD_METHODS
+
+SORT_T = np.int64
+
+CSV_HEADER = [
+    "method",
+    "input",
+    "size",
+    "threshold",
+    "wall_nsecs",
+    "user_nsecs",
+    "system_nsecs",
+    "hw_cpu_cycles",
+    "hw_instructions",
+    "hw_cache_references",
+    "hw_cache_misses",
+    "hw_branch_instructions",
+    "hw_branch_misses",
+    "hw_bus_cycles",
+    "sw_cpu_clock",
+    "sw_task_clock",
+    "sw_page_faults",
+    "sw_context_switches",
+    "sw_cpu_migrations",
+]
+
+
+def load(infile: Path) -> np.ndarray:
+    """Load the input data, one integer per line, optionally gzip'ed."""
+    if not infile.is_file():
+        raise FileNotFoundError(infile)
+
+    opener = gzip.open if infile.suffix == ".gz" else open
+    with opener(infile, "rb") as f:
+        return np.array(f.read().split(), dtype=SORT_T)
+
+
+def measure(func, data: np.ndarray, threshold: int) -> dict[str, int]:
+    """
+    Sort a copy of `data`, measuring the same columns as HSO-c.
+
+    Hardware counters are not available from Python and are always 0, the
+    software counters are taken from the thread CPU clock and rusage. Like
+    HSO-c, `wall_nsecs` is the CPU time of the process rather than the elapsed
+    real time.
+    """
+    to_sort = data.copy()
+
+    usage_start = resource.getrusage(resource.RUSAGE_SELF)
+    times_start = os.times()
+    cpu_start = time.thread_time_ns()
+    wall_start = time.process_time_ns()
+
+    func(to_sort, threshold)
+
+    wall_end = time.process_time_ns()
+    cpu_end = time.thread_time_ns()
+    times_end = os.times()
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+
+    if not np.all(to_sort[:-1] <= to_sort[1:]):
+        raise RuntimeError("Array was not sorted correctly!")
+
+    result = dict.fromkeys(CSV_HEADER[4:], 0)
+    result["wall_nsecs"] = wall_end - wall_start
+    result["user_nsecs"] = round((times_end.user - times_start.user) * 1e9)
+    result["system_nsecs"] = round((times_end.system - times_start.system) * 1e9)
+    result["sw_cpu_clock"] = cpu_end - cpu_start
+    result["sw_task_clock"] = cpu_end - cpu_start
+    result["sw_page_faults"] = (usage_end.ru_minflt - usage_start.ru_minflt) + (
+        usage_end.ru_majflt - usage_start.ru_majflt
+    )
+    result["sw_context_switches"] = (usage_end.ru_nvcsw - usage_start.ru_nvcsw) + (
+        usage_end.ru_nivcsw - usage_start.ru_nivcsw
+    )
+    return result
+
+
+def average_chunks(results: list[dict], chunk_size: int) -> list[dict]:
+    """Average every `chunk_size` results together, same as HSO-c."""
+    if chunk_size <= 0:
+        return results
+
+    averaged = []
+    for start in range(0, len(results), chunk_size):
+        chunk = results[start : start + chunk_size]
+        averaged.append(
+            {k: round(sum(i[k] for i in chunk) / len(chunk)) for k in chunk[0]}
+        )
+    return averaged
+
+
+def write_output(
+    f, method, infile, size, threshold, results, cols=None, vals=None, header=True
+):
+    """Write the results as CSV rows, with the same columns as HSO-c."""
+    if header:
+        line = ",".join(CSV_HEADER)
+        if vals is not None:
+            line += f",{cols}"
+        f.write(line + "\n")
+
+    prefix = f"{method},{infile},{size},{threshold}"
+    suffix = f",{vals}" if vals is not None else ""
+    for result in results:
+        f.write(prefix + "," + ",".join(str(i) for i in result.values()) + suffix + "\n")
+
+
+def nat_int(s: str) -> int:
+    """Type validator for natural integers."""
+    int_val = int(s)
+    if int_val < 1:
+        raise argparse.ArgumentTypeError("Cannot be less than 1")
+    return int_val
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="QST-py",
+        description="Evaluating NumPy sorting algorithms with homebrew methods.",
+    )
+    parser.add_argument(
+        "--cols",
+        action="store",
+        metavar="COLS",
+        help="Columns to pass through to CSV.",
+    )
+    parser.add_argument(
+        "--vals",
+        action="store",
+        metavar="VALS",
+        help="Values to pass through to CSV.",
+    )
+    parser.add_argument(
+        "-c",
+        "--output-chunks",
+        action="store",
+        metavar="CHUNK",
+        type=int,
+        default=0,
+        help="Chunk N times together to a single value (Avg)",
+    )
+    parser.add_argument(
+        "-m",
+        "--method",
+        action="store",
+        metavar="METHOD",
+        default="np_quicksort",
+        help="Sorting method to use.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        action="store",
+        metavar="FILE",
+        type=Path,
+        help="Output to FILE instead of STDOUT",
+    )
+    parser.add_argument(
+        "-r",
+        "--runs",
+        action="store",
+        metavar="N",
+        type=nat_int,
+        default=1,
+        help="Number of times to repeatedly sort the same data.",
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        action="store",
+        metavar="THRESH",
+        type=nat_int,
+        default=4,
+        help="Threshold to switch sorting methods.",
+    )
+    parser.add_argument(
+        "--show-methods",
+        action="store",
+        metavar="TYPE",
+        const="all",
+        nargs="?",
+        choices=("all", "threshold", "nonthreshold"),
+        help="Print supported methods",
+    )
+    parser.add_argument(
+        "-V",
+        "--version",
+        action="version",
+        version=__version__,
+        help="Print program version",
+    )
+    parser.add_argument(
+        "infile",
+        metavar="INFILE",
+        type=Path,
+        nargs="?",
+        help="Input data to sort.",
+    )
+    return parser
+
+
+def show_methods(kind: str):
+    """Print the supported methods, same as `HSO-c --show-methods`."""
+    if kind in ("all", "nonthreshold"):
+        for i in METHODS:
+            if i not in THRESHOLD_METHODS:
+                print(i)
+    if kind in ("all", "threshold"):
+        for i in THRESHOLD_METHODS:
+            print(i)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.show_methods is not None:
+        show_methods(args.show_methods)
+        return 0
+
+    if args.infile is None:
+        parser.error("the following arguments are required: INFILE")
+    if args.method not in METHODS:
+        parser.error(f"Invalid method: '{args.method}'")
+    if (args.cols is None) != (args.vals is None):
+        parser.error("--cols and --vals must be used together")
+
+    data = load(args.infile)
+    func = METHODS[args.method]
+    threshold = args.threshold if args.method in THRESHOLD_METHODS else 0
+    results = [measure(func, data, threshold) for _ in range(args.runs)]
+    results = average_chunks(results, args.output_chunks)
+
+    row = (
+        args.method,
+        args.infile.absolute(),
+        len(data),
+        threshold,
+        results,
+        args.cols,
+        args.vals,
+    )
+    if args.output is None:
+        write_output(sys.stdout, *row)
+    else:
+        # Append, only writing the header for new files (same as HSO-c).
+        header = not args.output.exists()
+        with open(args.output, "a") as f:
+            write_output(f, *row, header=header)
+    return 0
@@ -0,0 +1,46 @@
+"""
+Registry of every supported sorting method.
+
+Every method takes the array to sort in place and a threshold (ignored by
+methods not within `THRESHOLD_METHODS`).
+"""
+import numpy as np
+
+from . import sorts
+
+
+def builtin_sort(arr: np.ndarray, threshold=0):
+    """`list.sort`, including the conversion from and back to NumPy."""
+    values = arr.tolist()
+    values.sort()
+    arr[:] = values
+
+
+def builtin_sorted(arr: np.ndarray, threshold=0):
+    """`sorted`, including the conversion from and back to NumPy."""
+    arr[:] = sorted(arr.tolist())
+
+
+def _np_sort(kind: str):
+    def np_sort(arr: np.ndarray, threshold=0):
+        arr.sort(kind=kind)
+
+    np_sort.__name__ = f"np_{kind}"
+    np_sort.__doc__ = f"`np.ndarray.sort(kind='{kind}')`."
+    return np_sort
+
+
+METHODS = {
+    "builtin_sort": builtin_sort,
+    "builtin_sorted": builtin_sorted,
+    "np_quicksort": _np_sort("quicksort"),
+    "np_mergesort": _np_sort("mergesort"),
+    "np_heapsort": _np_sort("heapsort"),
+    "np_stable": _np_sort("stable"),
+    # Methods from this point support a threshold value.
+    "msort_with_ins": sorts.msort_with_ins,
+    "msort_with_network": sorts.msort_with_network,
+    "quicksort_with_ins": sorts.quicksort_with_ins,
+}
+
+THRESHOLD_METHODS = ("msort_with_ins", "msort_with_network", "quicksort_with_ins")
@@ -0,0 +1,178 @@
+"""
+In-process threshold sweeps of the HSO-c sorting methods.
+
+Every (method, threshold) is run against the same in-memory input through
+`qst.native`, no process is spawned and no input is re-read. The output CSV
+has the same columns as HSO-c (along with the id, description and run_type
+columns from jobs.py) so the evaluator can be used on it directly.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from .bench import SORT_T, load, measure, nat_int, write_output
+from .native import METHODS, THRESHOLD_METHODS, Library
+
+DATA_TYPES = ("random", "ascending", "descending", "pipe_organ", "single_num")
+
+
+def generate(desc: str, size: int, seed=None) -> np.ndarray:
+    """Generate input data, same types as src/data.py."""
+    if desc == "random":
+        return np.random.default_rng(seed).integers(0, size, size, dtype=SORT_T)
+    if desc == "ascending":
+        return np.arange(size, dtype=SORT_T)
+    if desc == "descending":
+        return np.arange(size, dtype=SORT_T)[::-1].copy()
+    if desc == "pipe_organ":
+        half = np.arange(size // 2, dtype=SORT_T)
+        return np.concatenate((half, half[: size - len(half)][::-1]))
+    if desc == "single_num":
+        return np.full(size, 1, dtype=SORT_T)
+    raise ValueError(f"Invalid type: '{desc}'")
+
+
+def parse_threshold(user_input: str) -> list[int]:
+    """Parse a comma seperated range (min,max,[step]) including both endpoints."""
+    tokens = [int(i) for i in user_input.split(",")]
+    if len(tokens) == 1:
+        return tokens
+    if len(tokens) > 3:
+        raise argparse.ArgumentTypeError(f"Invalid threshold value: {user_input}")
+    tokens[1] += 1
+    return list(range(*tokens))
+
+
+def sweep(lib: Library, data: np.ndarray, methods, thresholds, runs: int):
+    """
+    Yield (method, threshold, results) for every combination.
+
+    Methods without a threshold are only run once, with a threshold of 0.
+    """
+    for method in methods:
+        method_thresholds = thresholds if method in THRESHOLD_METHODS else [0]
+        for threshold in method_thresholds:
+
+            def func(arr, t, method=method):
+                lib.sort(arr, method, t)
+
+            yield method, threshold, [
+                measure(func, data, threshold) for _ in range(runs)
+            ]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m qst.microbench",
+        description=__doc__.split("\n\n")[0],
+    )
+    parser.add_argument(
+        "infile",
+        metavar="INFILE",
+        type=Path,
+        nargs="?",
+        help="Input data to sort, generated if not given.",
+    )
+    parser.add_argument(
+        "-d",
+        "--type",
+        action="store",
+        choices=DATA_TYPES,
+        default="random",
+        help="Type of data to generate.",
+    )
+    parser.add_argument(
+        "-n",
+        "--size",
+        action="store",
+        type=nat_int,
+        default=1_000_000,
+        help="Number of elements to generate.",
+    )
+    parser.add_argument(
+        "-m",
+        "--methods",
+        action="store",
+        default=",".join(METHODS),
+        help="Comma seperated list of methods.",
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        action="store",
+        type=parse_threshold,
+        default=[4],
+        help="Comma seperated range for threshold (min,max,[step]).",
+    )
+    parser.add_argument(
+        "-r",
+        "--runs",
+        action="store",
+        type=nat_int,
+        default=10,
+        help="Number of times to repeatedly sort the same data.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        action="store",
+        metavar="FILE",
+        type=Path,
+        help="Output to FILE instead of STDOUT",
+    )
+    parser.add_argument(
+        "--lib",
+        action="store",
+        metavar="FILE",
+        type=Path,
+        help="Shared library to use, see `qst.native`.",
+    )
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    methods = args.methods.split(",")
+    for i in methods:
+        if i not in METHODS:
+            parser.error(f"Invalid method: '{i}'")
+
+    lib = Library(args.lib)
+    if args.infile is not None:
+        data = load(args.infile)
+        desc = next((i for i in DATA_TYPES if f"/{i}" in str(args.infile)), "N/A")
+        infile = args.infile.absolute()
+    else:
+        data = generate(args.type, args.size)
+        desc = args.type
+        infile = f"<{desc}>"
+
+    out = sys.stdout if args.output is None else open(args.output, "w")
+    try:
+        for job_id, (method, threshold, results) in enumerate(
+            sweep(lib, data, methods, args.threshold, args.runs)
+        ):
+            write_output(
+                out,
+                method,
+                infile,
+                len(data),
+                threshold,
+                results,
+                cols="id,description,run_type",
+                vals=f"{job_id},{desc},base",
+                header=job_id == 0,
+            )
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Call the sorting methods of HSO-c in-process, directly on NumPy arrays.
+
+Requires the shared library, `make -C src/c libhso.so`, or any other build
+pointed to by the HSO_LIB environment variable.
+
+Arrays are passed by pointer, they are never copied, so they must already be
+C-contiguous, writable and of `sort_t` (int64). The comparator is the C
+`sort_t_compare`, passed by address, so no Python code runs while sorting and
+the GIL is released for the duration of the call.
+"""
+import ctypes
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+SORT_T = np.int64
+
+DEFAULT_LIB = Path(__file__).resolve().parents[2] / "c" / "libhso.so"
+
+# Method name (same as HSO-c) -> C symbol.
+METHODS = {
+    "qsort": "qsort",
+    "msort_heap": "msort_heap",
+    "basic_ins": "basic_ins_sort",
+    "fast_ins": "fast_ins_sort",
+    "shell": "shell_sort",
+    "cxx_std": "cxx_std_sort",
+    # Methods from this point support a threshold value.
+    "msort_heap_with_old_ins": "msort_heap_with_old_ins",
+    "msort_heap_with_basic_ins": "msort_heap_with_basic_ins",
+    "msort_heap_with_shell": "msort_heap_with_shell",
+    "msort_heap_with_fast_ins": "msort_heap_with_fast_ins",
+    "msort_heap_with_network": "msort_heap_with_network",
+    "msort_with_network": "msort_with_network",
+    "quicksort_with_ins": "quicksort_with_ins",
+    "quicksort_with_fast_ins": "quicksort_with_fast_ins",
+}
+
+THRESHOLD_METHODS = tuple(list(METHODS)[6:])
+
+
+class Library:
+    """Loaded shared library, with the signature of every method set."""
+
+    def __init__(self, path: Optional[Path] = None):
+        if path is None:
+            path = Path(os.environ.get("HSO_LIB", DEFAULT_LIB))
+        if not Path(path).is_file():
+            raise FileNotFoundError(
+                f"Can't find '{path}', build it with `make -C src/c libhso.so`"
+            )
+
+        self.path = Path(path)
+        self._lib = ctypes.CDLL(str(path))
+        self._compare = ctypes.cast(self._lib.sort_t_compare, ctypes.c_void_p)
+
+        self._funcs = {}
+        args = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t, ctypes.c_void_p]
+        for name, symbol in METHODS.items():
+            func = getattr(self._lib, symbol)
+            func.restype = None
+            func.argtypes = args + ([ctypes.c_size_t] if name in THRESHOLD_METHODS else [])
+            self._funcs[name] = func
+
+    def sort(self, arr: np.ndarray, method: str, threshold: int = 0) -> None:
+        """
+        Sort `arr` in place.
+
+        @param arr: Writable, C-contiguous 1D int64 array.
+        @param method: Method name, same as HSO-c.
+        @param threshold: Threshold of methods within `THRESHOLD_METHODS`.
+        """
+        if method not in self._funcs:
+            raise ValueError(f"Invalid method: '{method}'")
+        if arr.dtype != SORT_T or arr.ndim != 1:
+            raise ValueError(f"Expected a 1D {np.dtype(SORT_T)} array")
+        if not arr.flags.c_contiguous or not arr.flags.writeable:
+            raise ValueError("Array must be C-contiguous and writable")
+
+        args = [arr.ctypes.data, len(arr), arr.itemsize, self._compare]
+        if method in THRESHOLD_METHODS:
+            args.append(threshold)
+        self._funcs[method](*args)
+
+
+_library: Optional[Library] = None
+
+
+def get_library() -> Library:
+    """Load the default library a single time."""
+    global _library
+    if _library is None:
+        _library = Library()
+    return _library
+
+
+def sort(arr: np.ndarray, method: str, threshold: int = 0) -> None:
+    """Sort `arr` in place with a method of the default library."""
+    get_library().sort(arr, method, threshold)
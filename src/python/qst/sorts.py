@@ -0,0 +1,234 @@
+"""
+Hybrid sorting methods over NumPy buffers.
+
+Each method mirrors one of HSO-c, but rather than switching to a scalar
+insertion sort for every small partition, all of the small blocks are sorted
+at once, as the rows of a matrix, with a vectorized sorting network.
+
+Every method sorts `arr` (a contiguous 1D array) in place.
+"""
+import functools
+
+import numpy as np
+
+# Merge passes of at most this width use a vectorized binary search across
+# every pair of runs, wider passes have few enough pairs to loop over.
+BATCH_MERGE_WIDTH = 256
+
+
+@functools.lru_cache(maxsize=None)
+def insertion_network(n: int) -> tuple[tuple[int, int], ...]:
+    """
+    Compare-exchange pairs equivalent to an insertion sort of `n` elements.
+
+    Inserting element i compares it against i - 1, i - 2, ..., 0.
+    """
+    return tuple((j - 1, j) for i in range(1, n) for j in range(i, 0, -1))
+
+
+@functools.lru_cache(maxsize=None)
+def batcher_network(n: int) -> tuple[tuple[int, int], ...]:
+    """
+    Compare-exchange pairs of Batcher's odd-even mergesort for `n` elements.
+
+    Pairs referencing indices >= n are dropped, which is equivalent to padding
+    the input with +infinity up to the next power of two.
+    """
+    size = 1
+    while size < n:
+        size *= 2
+
+    pairs = []
+    p = 1
+    while p < size:
+        k = p
+        while k >= 1:
+            for j in range(k % p, size - k, 2 * k):
+                for i in range(min(k, size - j - k)):
+                    a, b = i + j, i + j + k
+                    if a // (2 * p) == b // (2 * p) and b < n:
+                        pairs.append((a, b))
+            k //= 2
+        p *= 2
+    return tuple(pairs)
+
+
+def sort_rows(rows: np.ndarray, network) -> None:
+    """Sort every row of a (blocks, width) matrix in place with a network."""
+    for a, b in network:
+        lo = np.minimum(rows[:, a], rows[:, b])
+        np.maximum(rows[:, a], rows[:, b], out=rows[:, b])
+        rows[:, a] = lo
+
+
+def sort_blocks(arr: np.ndarray, width: int, network) -> None:
+    """Sort every consecutive `width` element block of `arr` in place."""
+    n = len(arr)
+    full = n // width * width
+    if full:
+        # Columns are sliced from a copy, writing back once is faster than
+        # sorting a strided view.
+        rows = arr[:full].reshape(-1, width).copy()
+        sort_rows(rows, network(width))
+        arr[:full] = rows.reshape(-1)
+    if full < n:
+        tail = arr[full:].reshape(1, -1).copy()
+        sort_rows(tail, network(n - full))
+        arr[full:] = tail.reshape(-1)
+
+
+def _batched_searchsorted(runs: np.ndarray, values: np.ndarray, side: str):
+    """Row-wise `np.searchsorted(runs[i], values[i], side)` for every row i."""
+    width = runs.shape[1]
+    lo = np.zeros(values.shape, dtype=np.intp)
+    hi = np.full(values.shape, width, dtype=np.intp)
+    for _ in range(int(width).bit_length()):
+        mid = (lo + hi) // 2
+        pivot = np.take_along_axis(runs, np.minimum(mid, width - 1), axis=1)
+        right = pivot < values if side == "left" else pivot <= values
+        active = lo < hi
+        lo = np.where(active & right, mid + 1, lo)
+        hi = np.where(active & ~right, mid, hi)
+    return lo
+
+
+def _merge_pass(src: np.ndarray, dst: np.ndarray, width: int) -> None:
+    """Merge every pair of consecutive `width` element runs from src to dst."""
+    n = len(src)
+    num_pairs = n // (2 * width)
+    full = num_pairs * 2 * width
+    if num_pairs:
+        pairs = src[:full].reshape(num_pairs, 2, width)
+        left, right = pairs[:, 0], pairs[:, 1]
+        # Equal elements of the left run go first, keeping the merge stable.
+        if width <= BATCH_MERGE_WIDTH:
+            left_pos = _batched_searchsorted(right, left, "left")
+            right_pos = _batched_searchsorted(left, right, "right")
+        else:
+            left_pos = np.empty(left.shape, dtype=np.intp)
+            right_pos = np.empty(right.shape, dtype=np.intp)
+            for i in range(num_pairs):
+                left_pos[i] = np.searchsorted(right[i], left[i], "left")
+                right_pos[i] = np.searchsorted(left[i], right[i], "right")
+
+        base = (np.arange(num_pairs) * 2 * width)[:, None] + np.arange(width)
+        dst[(base + left_pos).reshape(-1)] = left.reshape(-1)
+        dst[(base + right_pos).reshape(-1)] = right.reshape(-1)
+
+    # Trailing partial pair.
+    tail = src[full:]
+    if len(tail) > width:
+        left, right = tail[:width], tail[width:]
+        out = dst[full:]
+        out[np.arange(width) + np.searchsorted(right, left, "left")] = left
+        out[np.arange(len(right)) + np.searchsorted(left, right, "right")] = right
+    else:
+        dst[full:] = tail
+
+
+def _msort(arr: np.ndarray, threshold: int, network) -> None:
+    """Bottom up mergesort, blocks of `threshold` are sorted by a network."""
+    width = max(int(threshold), 1)
+    sort_blocks(arr, width, network)
+
+    src, dst = arr, np.empty_like(arr)
+    while width < len(arr):
+        _merge_pass(src, dst, width)
+        src, dst = dst, src
+        width *= 2
+    if src is not arr:
+        arr[:] = src
+
+
+def msort_with_ins(arr: np.ndarray, threshold: int) -> None:
+    """Mergesort, sorting blocks of `threshold` elements by insertion."""
+    _msort(arr, threshold, insertion_network)
+
+
+def msort_with_network(arr: np.ndarray, threshold: int) -> None:
+    """Mergesort, sorting blocks of `threshold` elements by a Batcher network."""
+    _msort(arr, threshold, batcher_network)
+
+
+def _segment_index(starts: np.ndarray, lengths: np.ndarray):
+    """Flat indices and segment of every element within the segments."""
+    seg = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    idx = np.arange(lengths.sum()) - offsets[seg] + starts[seg]
+    return idx, seg
+
+
+def quicksort_with_ins(arr: np.ndarray, threshold: int) -> None:
+    """
+    Quicksort, partitions of at most `threshold` elements are left for a final
+    insertion sort.
+
+    Rather than recursing, every partition of the same depth is split at once
+    (median of three, three way) and all the leftover partitions are finally
+    sorted together, as the padded rows of a matrix.
+    """
+    threshold = max(int(threshold), 1)
+    n = len(arr)
+    starts = np.array([0])
+    lengths = np.array([n])
+    leaf_starts, leaf_lengths = [], []
+
+    while len(starts):
+        small = lengths <= threshold
+        leaf_starts.append(starts[small])
+        leaf_lengths.append(lengths[small])
+        starts, lengths = starts[~small], lengths[~small]
+        if not len(starts):
+            break
+
+        idx, seg = _segment_index(starts, lengths)
+        values = arr[idx]
+
+        candidates = np.stack(
+            (
+                arr[starts],
+                arr[starts + lengths // 2],
+                arr[starts + lengths - 1],
+            ),
+            axis=1,
+        )
+        pivot = np.sort(candidates, axis=1)[:, 1][seg]
+
+        # Destination within the segment: less than, equal, greater than.
+        cls = (values >= pivot).astype(np.intp) + (values > pivot)
+        counts = np.bincount(seg * 3 + cls, minlength=3 * len(starts))
+        counts = counts.reshape(-1, 3)
+        class_start = np.cumsum(counts, axis=1) - counts
+
+        dest = np.empty(len(idx), dtype=np.intp)
+        seg_first = np.cumsum(lengths) - lengths
+        for c in range(3):
+            mask = cls == c
+            rank = np.cumsum(mask) - 1
+            before = rank[seg_first] - mask[seg_first] + 1
+            dest[mask] = (starts + class_start[:, c])[seg[mask]] + (
+                rank[mask] - before[seg[mask]]
+            )
+        arr[dest] = values
+
+        starts = np.concatenate((starts, starts + class_start[:, 2]))
+        lengths = np.concatenate((counts[:, 0], counts[:, 2]))
+        keep = lengths > 1
+        starts, lengths = starts[keep], lengths[keep]
+
+    # Final insertion sort of every leaf, padded to the same width.
+    starts = np.concatenate(leaf_starts)
+    lengths = np.concatenate(leaf_lengths)
+    keep = lengths > 1
+    starts, lengths = starts[keep], lengths[keep]
+    if not len(starts):
+        return
+
+    width = int(lengths.max())
+    pad = np.iinfo(arr.dtype).max if arr.dtype.kind in "iu" else np.inf
+    rows = np.full((len(starts), width), pad, dtype=arr.dtype)
+    idx, seg = _segment_index(starts, lengths)
+    cols = idx - starts[seg]
+    rows[seg, cols] = arr[idx]
+    sort_rows(rows, insertion_network(width))
+    arr[idx] = rows[seg, cols]
@@ -0,0 +1,204 @@
+"""
+Pick a representative sample of the jobs to run valgrind on.
+
+Valgrind is 20-100 times slower than a base run, so instrumenting every job
+multiplies the cost of a sweep. A sampling policy keeps, per tool:
+
+- sizes: the inputs next to every cache boundary of this node ("cache", the
+  largest input fitting within a cache level and the smallest one that
+  doesn't), or N inputs evenly spread over the sizes of every data type,
+- thresholds: N thresholds of every method, centered on its fastest
+  threshold within previous results, or evenly spread without any,
+- runs: the number of sorts of every command, 1 by default since the
+  instrumented counters barely vary between runs.
+
+Anything left out of a policy keeps every size or threshold.
+"""
+import csv
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from plan import SORT_T_SIZE
+
+SAMPLE_KEYS = ("sizes", "thresholds", "runs")
+
+
+def parse_sample_arg(user_input: str, tools) -> dict[str, dict]:
+    """
+    Parse the --sample argument from the CLI.
+
+    @param user_input: Comma seperated KEY=VALUE pairs, a key prefixed by a
+                       tool (ex: massif.runs=2) only applies to that tool.
+    @param tools: Every valgrind tool.
+    @returns: {tool: {key: value}} of every tool, see `SAMPLE_KEYS`.
+    """
+    defaults = {"sizes": None, "thresholds": None, "runs": 1}
+    overrides = {}
+    for pair in user_input.split(","):
+        if not pair:
+            continue
+        key, sep, value = pair.partition("=")
+        tool, _, key = key.rpartition(".")
+        if not sep or key not in SAMPLE_KEYS or (tool and tool not in tools):
+            raise ValueError(f"Invalid sample: '{pair}'")
+
+        if key == "sizes" and value == "cache":
+            parsed = value
+        else:
+            try:
+                parsed = int(value)
+            except ValueError:
+                parsed = 0
+            if parsed <= 0:
+                raise ValueError(f"Invalid sample: '{pair}', must be >= 1")
+        (overrides.setdefault(tool, {}) if tool else defaults)[key] = parsed
+
+    return {i: {**defaults, **overrides.get(i, {})} for i in tools}
+
+
+def fastest_thresholds(result_dirs: list[Path]) -> dict[tuple[str, str, int], int]:
+    """
+    Fastest threshold of every (method, description, size) of previous
+    results, by the mean wall_nsecs of their base runs.
+    """
+    totals = {}
+    for result_dir in result_dirs:
+        for path in sorted(Path(result_dir).glob("output*.csv")):
+            with open(path, newline="") as fp:
+                for row in csv.DictReader(fp):
+                    if row.get("run_type", "base") != "base":
+                        continue
+                    key = (
+                        row["method"],
+                        row["description"],
+                        int(row["size"]),
+                        int(row["threshold"]),
+                    )
+                    total = totals.setdefault(key, [0.0, 0])
+                    total[0] += float(row["wall_nsecs"])
+                    total[1] += 1
+
+    best = {}
+    for (method, description, size, threshold), (wall, count) in totals.items():
+        group = (method, description, size)
+        if group not in best or wall / count < best[group][0]:
+            best[group] = (wall / count, threshold)
+    return {k: v[1] for k, v in best.items()}
+
+
+def sample_sizes(
+    sizes: np.ndarray, descriptions: list[str], spec, caches: list[int] = ()
+) -> np.ndarray:
+    """
+    Pick the inputs to instrument, independently for every data type.
+
+    @param sizes: Number of elements of every input.
+    @param descriptions: Data type of every input.
+    @param spec: "cache", a number of inputs per data type, or None for all.
+    @param caches: Size of every cache level in bytes, see
+                   `topology.get_cache_sizes`, every input if empty.
+    @returns: Whether every input is sampled.
+    """
+    sizes = np.asarray(sizes)
+    if spec is None or (spec == "cache" and not len(caches)):
+        return np.ones(len(sizes), dtype=bool)
+
+    keep = np.zeros(len(sizes), dtype=bool)
+    descriptions = np.asarray(descriptions)
+    for description in set(descriptions.tolist()):
+        index = np.flatnonzero(descriptions == description)
+        index = index[np.argsort(sizes[index], kind="stable")]
+        if spec == "cache":
+            nbytes = sizes[index] * SORT_T_SIZE
+            for cache in caches:
+                # Inputs fitting within the cache, the next one doesn't.
+                fits = int(np.searchsorted(nbytes, cache, side="right"))
+                keep[index[max(fits - 1, 0)]] = True
+                keep[index[min(fits, len(index) - 1)]] = True
+        else:
+            picks = np.linspace(0, len(index) - 1, min(spec, len(index)))
+            keep[index[picks.round().astype(int)]] = True
+    return keep
+
+
+def sample_thresholds(
+    position: np.ndarray, center: np.ndarray, num_thresholds: int, count: int
+) -> np.ndarray:
+    """
+    Whether the threshold of every job is sampled: the `count` thresholds
+    around its center, or `count` evenly spread ones without a center.
+
+    @param position: Index of every threshold within the sorted thresholds.
+    @param center: Index of the fastest threshold of every job, -1 if unknown.
+    """
+    count = min(count, num_thresholds)
+    start = np.clip(center - count // 2, 0, num_thresholds - count)
+    around = (position >= start) & (position < start + count)
+    spread = np.zeros(num_thresholds, dtype=bool)
+    spread[np.linspace(0, num_thresholds - 1, count).round().astype(int)] = True
+    return np.where(center >= 0, around, spread[position])
+
+
+def _centers(table, sizes, thresholds: np.ndarray, fastest: dict) -> np.ndarray:
+    """
+    Index of the fastest threshold of every (method, input) within
+    `thresholds`, the median of the other sizes of the method if it wasn't
+    measured, -1 if the method wasn't measured at all.
+    """
+    centers = np.full((len(table.methods), len(table.inputs)), -1, dtype=np.int64)
+    if not len(thresholds):
+        return centers
+
+    by_method = {}
+    for (method, _, _), threshold in fastest.items():
+        by_method.setdefault(method, []).append(threshold)
+
+    for m, method in enumerate(table.methods):
+        if method not in by_method:
+            continue
+        fallback = float(np.median(by_method[method]))
+        for i, description in enumerate(table.descriptions):
+            threshold = fastest.get((method, description, int(sizes[i])), fallback)
+            centers[m, i] = int(np.abs(thresholds - threshold).argmin())
+    return centers
+
+
+def sample_jobs(
+    table,
+    sizes: np.ndarray,
+    policy: dict[str, dict],
+    tools: dict[int, str],
+    fastest: Optional[dict] = None,
+    caches: list[int] = (),
+):
+    """
+    Clear the valgrind flags of every job outside the sampling policy, and
+    set the runs of every tool.
+
+    @param table: A `jobs.JobTable`, changed in place.
+    @param sizes: Number of elements of every input of the table.
+    @param policy: See `parse_sample_arg`.
+    @param tools: {flag: tool} of every valgrind tool, see `jobs.RUN_TYPES`.
+    @param fastest: See `fastest_thresholds`.
+    @param caches: See `sample_sizes`.
+    """
+    rows = table.rows
+    thresholds = np.unique(rows["threshold"][rows["threshold"] >= 0])
+    centers = _centers(table, sizes, thresholds, fastest or {})
+    position = np.searchsorted(thresholds, np.maximum(rows["threshold"], 0))
+    position = np.minimum(position, max(len(thresholds) - 1, 0))
+
+    for flag, tool in tools.items():
+        spec = policy[tool]
+        keep = sample_sizes(sizes, table.descriptions, spec["sizes"], caches)
+        keep = keep[rows["input"]]
+        if spec["thresholds"] is not None and len(thresholds):
+            center = centers[rows["method"], rows["input"]]
+            keep &= (rows["threshold"] < 0) | sample_thresholds(
+                position, center, len(thresholds), spec["thresholds"]
+            )
+        rows["flags"][~keep] &= ~np.uint8(flag)
+        if spec["runs"] is not None:
+            table.valgrind_runs[tool] = spec["runs"]
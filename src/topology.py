@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Read the CPU topology from sysfs and place workers on physical cores.
+
+Usage:
+    topology.py [options]
+    topology.py -h | --help
+
+Options:
+    -h, --help               Show this help.
+    -j, --jobs=N             Number of workers to place.
+    --smt                    Also place workers on SMT siblings.
+"""
+import os
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+from docopt import docopt
+
+VERSION = "1.0.0"
+
+SYSFS_CPU = Path("/sys/devices/system/cpu")
+
+
+def parse_cpu_list(cpu_list: str) -> list[int]:
+    """
+    Parse a kernel CPU list.
+
+    @param cpu_list: Ex: "0-3,8,10-11".
+    @returns: Every CPU within the list.
+    """
+    cpus = []
+    for token in cpu_list.strip().split(","):
+        if not token:
+            continue
+        first, _, last = token.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def get_allowed_cpus() -> set[int]:
+    """Get the CPUs this process is allowed to run on (cgroups, taskset, ...)."""
+    try:
+        return os.sched_getaffinity(0)
+    except AttributeError:
+        return set(range(os.cpu_count() or 1))
+
+
+def get_cores(sysfs: Path = SYSFS_CPU) -> list[tuple[int, ...]]:
+    """
+    Group the allowed CPUs by physical core.
+
+    Falls back to one core per CPU if the topology is not exposed.
+
+    @param sysfs: Path to /sys/devices/system/cpu.
+    @returns: The SMT siblings of every physical core, sorted by the first
+              sibling.
+    """
+    allowed = get_allowed_cpus()
+    cores = set()
+    for cpu in sorted(allowed):
+        siblings_path = sysfs / f"cpu{cpu}" / "topology" / "thread_siblings_list"
+        try:
+            siblings = parse_cpu_list(siblings_path.read_text())
+        except (OSError, ValueError):
+            siblings = [cpu]
+        siblings = tuple(i for i in siblings if i in allowed) or (cpu,)
+        cores.add(siblings)
+
+    return sorted(cores)
+
+
+def get_placement(
+    num_workers: Optional[int] = None,
+    smt=False,
+    sysfs: Path = SYSFS_CPU,
+) -> list[int]:
+    """
+    Assign a dedicated CPU to every worker.
+
+    Every physical core is used once before any SMT sibling is, so siblings
+    are only shared when `smt` is set and there are more workers than cores.
+
+    @param num_workers: Number of workers, defaults to every available slot.
+    @param smt: Use SMT siblings, otherwise they are left idle.
+    @returns: The CPU of every worker, may be shorter than `num_workers`.
+    """
+    cores = get_cores(sysfs)
+    if smt:
+        width = max(len(i) for i in cores)
+        cpus = [core[i] for i in range(width) for core in cores if i < len(core)]
+    else:
+        cpus = [core[0] for core in cores]
+
+    if num_workers is not None:
+        cpus = cpus[:num_workers]
+    return cpus
+
+
+def get_cache_sizes(sysfs: Path = SYSFS_CPU) -> list[int]:
+    """
+    Get the size of every data cache level of the first allowed CPU.
+
+    @param sysfs: Path to /sys/devices/system/cpu.
+    @returns: Sizes in bytes, smallest first, empty if sysfs doesn't expose
+              the caches.
+    """
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    cache_dir = sysfs / f"cpu{min(get_allowed_cpus())}" / "cache"
+    sizes = set()
+    for index in cache_dir.glob("index*"):
+        try:
+            if (index / "type").read_text().strip() == "Instruction":
+                continue
+            size = (index / "size").read_text().strip()
+            sizes.add(int(size.rstrip("KMG")) * units.get(size[-1:], 1))
+        except (OSError, ValueError):
+            continue
+    return sorted(sizes)
+
+
+def pin_thread(cpus: Union[None, int, Iterable[int]]):
+    """
+    Pin the calling thread to a CPU, or a set of CPUs, nothing if None.
+
+    Every process the thread starts inherits its affinity. Unlike a
+    `preexec_fn`, this is safe from many threads at once.
+    """
+    if cpus is None:
+        return
+    os.sched_setaffinity(0, {cpus} if isinstance(cpus, int) else set(cpus))
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__, version=VERSION)
+
+    jobs = int(args.get("--jobs")) if args.get("--jobs") else None
+    cores = get_cores()
+    print(f"Physical cores: {len(cores)}")
+    for core in cores:
+        print("  " + ",".join(map(str, core)))
+    print(f"Placement: {get_placement(jobs, smt=args.get('--smt'))}")
+    print(f"Data caches: {[f'{i >> 10}K' for i in get_cache_sizes()]}")
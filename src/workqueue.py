@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Run the jobs of a work queue on shared storage, see `jobs.py --queue`.
+
+Any number of workers, on any number of nodes sharing the queue directory,
+pull tasks (every executable of a unit of jobs) until none are left. A task
+is claimed by renaming it from pending/ to leased/, which only one worker can
+do. The worker keeps touching its lease while the task runs, a lease left
+untouched for --lease seconds belongs to a dead worker and is put back into
+pending/ by whichever worker notices, as another attempt. The retries column
+of a job is its attempt, runs of an attempt that didn't finish may still be
+within the output.
+
+Every worker appends to its own output_<worker>.csv within the queue
+directory, so the queue is a single result once it is empty.
+
+Usage:
+    workqueue.py QUEUE_DIR [options]
+    workqueue.py status QUEUE_DIR
+    workqueue.py -h | --help
+
+Options:
+    -h, --help               Show this help.
+    -j, --jobs=N             Run N tasks in parallel on this node [default: 1].
+    -p, --progress           Enable a progress bar.
+    --lease=SECS             Seconds without a heartbeat before a task is given
+                             to another worker [default: 300].
+    --max-attempts=N         Fail a task once it was leased N times
+                             [default: 3].
+    --affinity               Pin every job to a dedicated physical core, runs
+                             fewer than --jobs tasks at once if there are
+                             fewer cores.
+    --smt                    With --affinity, also pin jobs to SMT siblings.
+"""
+import os
+import platform
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Iterable, Optional
+
+from docopt import docopt
+from tqdm import tqdm
+
+from topology import get_placement, pin_thread
+
+VERSION = "1.0.0"
+
+# Directories of the queue, a task is a file within exactly one of them.
+STATES = ("pending", "leased", "done", "failed")
+
+Task = namedtuple("Task", ["index", "attempt", "path", "job_ids"])
+
+
+def worker_name() -> str:
+    """Unique name of this process across nodes, without dots."""
+    return f"{platform.node()}-{os.getpid()}".replace(".", "_")
+
+
+class WorkQueue:
+    """
+    Queue of tasks within a directory, safe to share between nodes.
+
+    Tasks are named after their position within the run order, pending
+    tasks are `<index>.<attempt>` and leased ones `<index>.<attempt>.<worker>`.
+    Every state change is a single rename, so no locks are needed.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        lease: float = 300.0,
+        max_attempts: int = 3,
+        worker: Optional[str] = None,
+    ):
+        """
+        @param path: Queue directory, see `create`.
+        @param lease: Seconds without a heartbeat before a lease expires.
+        @param max_attempts: Number of leases before a task is failed.
+        @param worker: Name of this worker, see `worker_name`.
+        """
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.worker = worker or worker_name()
+        self.dirs = {i: Path(path, "queue", i) for i in STATES}
+        # Cached listing of pending/, the smallest index last.
+        self._pending: list[str] = []
+
+    @classmethod
+    def create(
+        cls, path: Path, tasks: Iterable[Iterable[int]], **kwargs
+    ) -> "WorkQueue":
+        """
+        Create a queue of tasks, in order.
+
+        The tasks are written to a staging directory first, so workers never
+        see a partial queue.
+
+        @param tasks: Job ids of every task.
+        """
+        staging = Path(path, "queue.tmp")
+        for i in STATES:
+            Path(staging, i).mkdir(parents=True, exist_ok=True)
+        for index, job_ids in enumerate(tasks):
+            with open(Path(staging, "pending", f"{index:012d}.0"), "w") as fp:
+                fp.write(" ".join(str(i) for i in job_ids) + "\n")
+        os.rename(staging, Path(path, "queue"))
+        return cls(path, **kwargs)
+
+    def _now(self) -> float:
+        """Time of the shared filesystem, so leases don't depend on node clocks."""
+        clock = Path(self.path, "queue", f".clock.{self.worker}")
+        clock.touch()
+        return clock.stat().st_mtime
+
+    def claim(self) -> Optional[Task]:
+        """Claim the next pending task, None if nothing is pending."""
+        while True:
+            if not self._pending:
+                self._pending = sorted(os.listdir(self.dirs["pending"]), reverse=True)
+                if not self._pending:
+                    return None
+
+            name = self._pending.pop()
+            pending = Path(self.dirs["pending"], name)
+            leased = Path(self.dirs["leased"], f"{name}.{self.worker}")
+            try:
+                # The lease starts now, rename keeps the mtime.
+                os.utime(pending)
+                os.rename(pending, leased)
+            except FileNotFoundError:
+                # Claimed by another worker
+                continue
+
+            index, attempt = name.split(".")
+            job_ids = [int(i) for i in leased.read_text().split()]
+            return Task(int(index), int(attempt), leased, job_ids)
+
+    def renew(self, task: Task) -> bool:
+        """Heartbeat of a task, False if its lease was lost."""
+        try:
+            os.utime(task.path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _move(self, task: Task, state: str, name: str) -> bool:
+        try:
+            os.rename(task.path, Path(self.dirs[state], name))
+        except FileNotFoundError:
+            print(
+                f"[Warning]: Lost the lease of task {task.index}, "
+                "it may run more than once",
+                file=sys.stderr,
+            )
+            return False
+        return True
+
+    def complete(self, task: Task) -> bool:
+        """Mark a task as done, False if its lease was lost."""
+        return self._move(task, "done", f"{task.index:012d}")
+
+    def fail(self, task: Task) -> bool:
+        """Mark a task as failed, False if its lease was lost."""
+        return self._move(task, "failed", task.path.name)
+
+    def requeue_expired(self) -> int:
+        """
+        Put every expired lease back into pending/, or failed/ once it was
+        leased `max_attempts` times.
+
+        @returns Number of tasks put back into pending/.
+        """
+        now = self._now()
+        requeued = 0
+        for name in os.listdir(self.dirs["leased"]):
+            leased = Path(self.dirs["leased"], name)
+            try:
+                if now - leased.stat().st_mtime < self.lease:
+                    continue
+            except FileNotFoundError:
+                continue
+
+            index, attempt, _ = name.split(".", 2)
+            attempt = int(attempt) + 1
+            if attempt < self.max_attempts:
+                target = Path(self.dirs["pending"], f"{index}.{attempt}")
+            else:
+                target = Path(self.dirs["failed"], name)
+            try:
+                os.rename(leased, target)
+            except FileNotFoundError:
+                # Requeued by another worker, or completed just in time.
+                continue
+            if attempt < self.max_attempts:
+                requeued += 1
+        return requeued
+
+    def status(self) -> dict[str, int]:
+        """Number of tasks in every state."""
+        return {i: len(os.listdir(self.dirs[i])) for i in STATES}
+
+
+def _heartbeat(queue: WorkQueue, held: dict, lock, stop: threading.Event):
+    """Renew every held lease a few times per lease period."""
+    while not stop.wait(queue.lease / 4):
+        with lock:
+            tasks = list(held.values())
+        for task in tasks:
+            queue.renew(task)
+
+
+def work(
+    queue: WorkQueue,
+    table,
+    placement: list[Optional[int]],
+    progress=False,
+):
+    """
+    Run tasks until the queue is empty, one thread per entry of `placement`.
+
+    A worker without a pending task waits for the running ones, so the tasks
+    of a dead worker are still picked up once their lease expires.
+
+    @param table: The `jobs.JobTable` of the queue.
+    @param placement: CPU of every thread, None for unpinned threads.
+    """
+    table.output = Path(queue.path, f"output_{queue.worker}.csv")
+    Path(queue.path, "valgrind").mkdir(exist_ok=True)
+
+    lock = threading.Lock()
+    held: dict[int, Task] = {}
+    stop = threading.Event()
+    pbar = tqdm(total=queue.status()["pending"], unit="task", disable=not progress)
+
+    def worker(core):
+        pin_thread(core)
+        while True:
+            with lock:
+                task = queue.claim()
+                if task is not None:
+                    held[task.index] = task
+                elif not queue.requeue_expired() and not queue.status()["leased"]:
+                    return
+            if task is None:
+                time.sleep(min(queue.lease / 4, 10))
+                continue
+
+            try:
+                for job_id in task.job_ids:
+                    table.rows["retries"][job_id] = task.attempt
+                    table.job(job_id).run(quiet=progress, core=core)
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"[Error]: Task {task.index}: {e}", file=sys.stderr)
+                queue.fail(task)
+            else:
+                queue.complete(task)
+            with lock:
+                del held[task.index]
+            pbar.update()
+
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(queue, held, lock, stop), daemon=True
+    )
+    heartbeat.start()
+    threads = [
+        threading.Thread(target=worker, args=(core,), daemon=True) for core in placement
+    ]
+    try:
+        for i in threads:
+            i.start()
+        for i in threads:
+            i.join()
+    except KeyboardInterrupt:
+        # Kill myself and all my processes if told to, the leases expire.
+        os.killpg(0, signal.SIGKILL)
+    finally:
+        stop.set()
+        pbar.close()
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__, version=VERSION)
+
+    queue_dir = Path(args["QUEUE_DIR"])
+    if not Path(queue_dir, "queue").is_dir():
+        raise NotADirectoryError(f"Not a work queue: '{queue_dir}'")
+    queue = WorkQueue(
+        queue_dir,
+        lease=float(args["--lease"]),
+        max_attempts=int(args["--max-attempts"]),
+    )
+
+    if args["status"]:
+        for k, v in queue.status().items():
+            print(f"{k}: {v}")
+        sys.exit()
+
+    # Yes this is ugly, jobs.py imports this module to create queues.
+    from jobs import JobTable
+
+    jobs = int(args["--jobs"])
+    if jobs <= 0:
+        raise ValueError("Jobs must be >= 1")
+    placement = [None] * jobs
+    if args["--affinity"]:
+        placement = get_placement(jobs, smt=args["--smt"])
+        if len(placement) < jobs:
+            print(
+                f"[Warning]: Only {len(placement)} cores available, "
+                f"running {len(placement)} jobs concurrently instead of {jobs}",
+                file=sys.stderr,
+            )
+
+    # Create my own process group
+    try:
+        os.setpgrp()
+    except PermissionError:
+        pass
+
+    work(queue, JobTable.load(queue_dir), placement, progress=args["--progress"])
+    status = queue.status()
+    print(f"{queue.worker}: {status['done']} done, {status['failed']} failed")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./src")
+import jobs
+
+# Counter columns of the HSO-c CSV, see `mpl.Result`.
+COUNTERS = [
+    "wall_nsecs",
+    "user_nsecs",
+    "system_nsecs",
+    "hw_cpu_cycles",
+    "hw_instructions",
+    "hw_cache_references",
+    "hw_cache_misses",
+    "hw_branch_instructions",
+    "hw_branch_misses",
+    "hw_bus_cycles",
+    "sw_cpu_clock",
+    "sw_task_clock",
+    "sw_page_faults",
+    "sw_context_switches",
+    "sw_cpu_migrations",
+]
+
+
+@pytest.fixture
+def make_table():
+    """
+    Build a `jobs.JobTable.sweep` over fake inputs, `num_inputs` of every data
+    type (random and ascending), labelling every executable by its name.
+    """
+
+    def _make_table(
+        num_inputs=3,
+        execs=(Path("HSO-c"),),
+        methods=("qsort",),
+        threshold_methods=(),
+        thresholds=(4, 8),
+        blocks=(10,),
+        flags=jobs.BASE,
+        output_chunks=0,
+    ):
+        inputs = [
+            Path(f"/data/{t}/{i}.gz")
+            for t in ("random", "ascending")
+            for i in range(num_inputs)
+        ]
+        return jobs.JobTable.sweep(
+            list(execs),
+            [i.name for i in execs],
+            inputs,
+            [i.parent.name for i in inputs],
+            list(methods),
+            set(threshold_methods),
+            list(thresholds),
+            list(blocks),
+            flags,
+            Path("out/output.csv"),
+            output_chunks=output_chunks,
+            rng=0,
+        )
+
+    return _make_table
+
+
+@pytest.fixture
+def table(make_table, request):
+    """A sweep, parametrize it indirectly with the arguments of `make_table`."""
+    return make_table(**getattr(request, "param", {}))
+
+
+@pytest.fixture
+def write_runs():
+    """
+    Write runs (`columns.GROUP_COLUMNS` and `wall_nsecs`) to an HSO-c output CSV,
+    every other counter missing from them is 0.
+    """
+
+    def _write_runs(path: Path, df):
+        df = df.copy()
+        for col in COUNTERS:
+            if col not in df.columns:
+                df[col] = 0
+        if "run_type" not in df.columns:
+            df["run_type"] = "base"
+        df.to_csv(path, index=False)
+
+    return _write_runs
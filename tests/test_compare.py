@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./evaluator")
+from compare import adjust_p_values, compare, main
+
+
+def make_runs(slowdown=1.0, runs=20, seed=0):
+    """Runs of two methods, msort `slowdown` times slower, with 1% noise."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for method, threshold in (("qsort", -1), ("msort", 8)):
+        for size in (1000, 4000, 16000):
+            wall = size * 100 * (slowdown if method == "msort" else 1)
+            for noise in rng.normal(1, 0.01, runs):
+                rows.append((method, "random", threshold, size, int(wall * noise)))
+    return pd.DataFrame(
+        rows, columns=["method", "description", "threshold", "size", "wall_nsecs"]
+    )
+
+
+def test_adjust_p_values():
+    # Ranked: 0.005, 0.01, 0.03, 0.04, 0.5 -> p * 5 / rank: 0.025, 0.025, 0.05,
+    # 0.05, 0.5, already monotone.
+    p = np.array([0.01, 0.04, 0.03, 0.005, 0.5])
+    expected = [0.025, 0.05, 0.05, 0.025, 0.5]
+    assert adjust_p_values(p) == pytest.approx(expected)
+
+    # Ranked: 0.015, 0.02, 0.03 -> p * 3 / rank: 0.045, 0.03, 0.03, the first
+    # is lowered to the smallest above it.
+    p = np.array([0.03, 0.02, 0.015])
+    assert adjust_p_values(p) == pytest.approx([0.03, 0.03, 0.03])
+    assert len(adjust_p_values(np.array([]))) == 0
+
+
+def test_compare():
+    table, summary = compare(make_runs(), make_runs(1.2, seed=1), seed=0)
+    status = table.set_index("method")["status"]
+    assert (status["msort"] == "regression").all()
+    assert (status["qsort"] == "unchanged").all()
+    assert summary["regressions"] == 3 and summary["unchanged"] == 3
+    # Worst regression first.
+    assert list(table["method"][:3]) == ["msort"] * 3
+    assert table["speedup"][:3].to_numpy() == pytest.approx([1 / 1.2] * 3, rel=0.01)
+    assert (table["speedup_high"][:3] < 1).all()
+
+    table, summary = compare(make_runs(), make_runs(seed=1), seed=0)
+    assert summary["regressions"] == summary["improvements"] == 0
+
+
+def test_main(tmp_path, write_runs):
+    baseline = make_runs().assign(exec="old")
+    candidate = make_runs(1.2, seed=1).assign(exec="new")
+    write_runs(tmp_path / "output.csv", pd.concat([baseline, candidate]))
+
+    args = [str(tmp_path), str(tmp_path), "--seed", "0", "--baseline-exec", "old"]
+    report = tmp_path / "report.json"
+    assert main(args + ["--candidate-exec", "new", "--json", str(report)]) == 1
+    summary = json.loads(report.read_text())["summary"]
+    assert summary["regressions"] == 3
+
+    assert main(args + ["--candidate-exec", "old"]) == 0
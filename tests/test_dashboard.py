@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from evaluator.__main__ import Tiles, build_dashboard, downsample, threshold_figure
+
+
+def test_downsample():
+    x = np.arange(10_000)
+    df = pd.DataFrame({"threshold": x[::-1], "mean": (x[::-1] - 5000.0) ** 2})
+    df.loc[df["threshold"] == 7777, "mean"] = 1e12
+
+    # Small enough already.
+    assert len(downsample(df.head(500), "threshold", "mean")) == 500
+
+    for max_points in (1, 2, 50, 500):
+        out = downsample(df, "threshold", "mean", max_points=max_points)
+        assert len(out) <= max(max_points, 2)
+        assert out["threshold"].is_monotonic_increasing
+    # The optimum and a spike survive.
+    out = downsample(df, "threshold", "mean", max_points=50)
+    assert 5000 in set(out["threshold"]) and 7777 in set(out["threshold"])
+
+
+def make_runs():
+    """Two executables interleaved, with a valgrind run that is never shown."""
+    rows = [
+        (exec_, "random", 1000, method, threshold, wall, "base")
+        for exec_, scale in (("old", 1), ("new", 2))
+        for method, threshold in (("qsort", 0), ("msort", 4), ("msort", 8))
+        for wall in np.array([1.0, 3.0]) * scale * (threshold + 1)
+    ]
+    rows.append(("old", "random", 1000, "msort", 4, 1000.0, "massif"))
+    rows.append(("old", "ascending", 10, "qsort", 0, 1.0, "base"))
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "exec",
+            "description",
+            "size",
+            "method",
+            "threshold",
+            "wall_secs",
+            "run_type",
+        ],
+    )
+
+
+def test_tiles():
+    tiles = Tiles(make_runs())
+    assert tiles.executables == ["new", "old"]
+    assert tiles.types == ["ascending", "random"]
+    assert tiles.sizes == {"ascending": [10], "random": [1000]}
+    assert tiles.thresholds == [4, 8]
+
+    tile = tiles.get("random", 1000, "old").set_index(["method", "threshold"])
+    assert list(tile.columns) == ["mean", "std"]
+    assert tile.loc[("msort", 4), "mean"] == 10
+    assert tile.loc[("qsort", 0), "mean"] == 2
+    tile = tiles.get("random", 1000, "new").set_index(["method", "threshold"])
+    assert tile.loc[("msort", 4), "mean"] == 20
+    assert tiles.get("ascending", 10, "new").empty
+
+    with pytest.raises(ValueError):
+        tiles.get("random", 1000)
+    with pytest.raises(ValueError):
+        tiles.get("random", 1000, "newer")
+
+    # A result of a single executable.
+    tiles = Tiles(make_runs().query("exec == 'old'").drop(columns="exec"))
+    assert tiles.executables == []
+    tile = tiles.get("random", 1000)
+    assert len(tile) == 3 and tile["mean"].max() == 18
+
+
+def test_threshold_figure():
+    tile = Tiles(make_runs()).get("random", 1000, "old")
+    fig = threshold_figure(tile, (4, 6))
+    traces = {i.name: i for i in fig.data}
+    assert list(traces["msort"].x) == [4]
+    # qsort has no threshold, a constant line across the range.
+    assert list(traces["qsort"].x) == [4, 6]
+    assert list(traces["qsort"].y) == [2, 2]
+
+
+def test_build_dashboard():
+    df = make_runs()
+    result = SimpleNamespace(df=df, job_details={}, partition=None)
+    app = build_dashboard(result, Tiles(df))
+    selector = app.layout["exec"]
+    assert selector.options == ["new", "old"] and selector.value == "new"
+
+    result.df = df = df.drop(columns="exec")
+    app = build_dashboard(result, Tiles(df))
+    assert app.layout["exec"].style == {"display": "none"}
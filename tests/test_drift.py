@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./evaluator")
+from drift import check, estimate_drift, order_correlation
+
+
+def make_runs(drift=0.0, noise=0.0, order="random", runs=5, seed=0):
+    """
+    A sweep whose runs slow down by `drift` from the first to the last job,
+    with three inputs (jobs) of every group.
+    """
+    rng = np.random.default_rng(seed)
+    jobs = pd.DataFrame(
+        [
+            (method, description, threshold, size)
+            for method, thresholds in (("qsort", [-1]), ("msort", [4, 8, 16, 32]))
+            for description in ("random", "ascending")
+            for size in (1000, 4000, 16000)
+            for threshold in thresholds
+            for _ in range(3)
+        ],
+        columns=["method", "description", "threshold", "size"],
+    )
+    if order == "random":
+        jobs["seq"] = rng.permutation(len(jobs))
+    else:
+        jobs["seq"] = np.arange(len(jobs))
+
+    df = jobs.loc[jobs.index.repeat(runs)].reset_index(drop=True)
+    slope = np.log1p(drift) / (len(jobs) - 1)
+    wall = df["size"] * np.exp(slope * df["seq"] + rng.normal(0, noise, len(df)))
+    df["wall_nsecs"] = wall.round().astype(np.int64)
+    return df
+
+
+def test_estimate_drift():
+    # Relative to the group median, only the drift within every group (about
+    # half of it with three jobs per group) remains.
+    result = estimate_drift(make_runs(drift=0.05))
+    assert 0.01 < result["low"] < result["drift"] < result["high"] < 0.05
+    assert result["stderr"] > 0
+    # Slower by the end, relative to the whole result.
+    bins = result["bins"].to_numpy()
+    assert len(bins) == 10 and bins[0] < 0 < bins[-1]
+
+    result = estimate_drift(make_runs(drift=-0.05, noise=0.01))
+    assert -0.05 < result["low"] < result["drift"] < result["high"] < -0.01
+
+    with pytest.raises(ValueError):
+        estimate_drift(make_runs().assign(seq=0))
+
+
+def test_check_drift():
+    assert check(make_runs(drift=0.05, noise=0.01)) != []
+    assert check(make_runs().drop(columns="seq")) != []
+
+    # Noise alone may move the point estimate past 1%, but not its interval.
+    noisy = [estimate_drift(make_runs(noise=0.05, seed=i)) for i in range(20)]
+    assert max(abs(i["drift"]) for i in noisy) > 0.01
+    for seed in range(20):
+        warnings = check(make_runs(noise=0.05, seed=seed))
+        assert not [i for i in warnings if "drifted" in i]
+
+
+def test_order_correlation():
+    corr = order_correlation(make_runs(order="sequential"))
+    # qsort has a single threshold.
+    assert list(corr.index) == ["msort"]
+    assert corr["msort"] > 0.9
+    assert check(make_runs(order="sequential")) != []
+
+    df = make_runs(order="sequential")
+    df["seq"] = df.groupby(["description", "size"])["seq"].transform(
+        lambda i: i.to_numpy()[::-1]
+    )
+    assert order_correlation(df)["msort"] < -0.9
+
+    corr = order_correlation(make_runs(seed=1))
+    assert abs(corr["msort"]) < 1
+    assert order_correlation(make_runs().query("method == 'qsort'")).empty
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import json
+import sqlite3
+import sys
+
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./evaluator")
+import ingest
+
+HEADER = "method,input,size,threshold,wall_nsecs,id,description,run_type"
+
+
+def row(i: int) -> str:
+    return f"qsort,/data/random/{i}.gz,{1000 * i},-1,{10 * i},{i},random,base\n"
+
+
+@pytest.fixture
+def result_dir(tmp_path):
+    path = tmp_path / "results" / "2024-01-01"
+    path.mkdir(parents=True)
+    job_details = {"Node": "node-1", "ARCC Partition": {"partition": "teton"}}
+    (path / "job_details.json").write_text(json.dumps(job_details))
+    (path / "output.csv").write_text(HEADER + "\n" + row(0) + row(1))
+    return path
+
+
+def count(db, table="result") -> int:
+    return db.execute(f"select count(*) from {table}").fetchone()[0]
+
+
+def test_ingest_watermark(tmp_path, result_dir):
+    db = ingest.connect(str(tmp_path / "db.sqlite"))
+    csv = result_dir / "output.csv"
+    assert ingest.ingest(db, result_dir.parent) == 2
+    assert db.get_watermark(result_dir.name, "output.csv") == (csv.stat().st_size, 2)
+    assert ingest.ingest(db, result_dir.parent) == 0
+
+    # A run still being written is left for the next ingest.
+    partial = row(3)[:10]
+    with open(csv, "a") as fp:
+        fp.write(row(2) + partial)
+    assert ingest.ingest(db, result_dir.parent) == 1
+    offset, num_rows = db.get_watermark(result_dir.name, "output.csv")
+    assert (offset, num_rows) == (csv.stat().st_size - len(partial), 3)
+
+    with open(csv, "a") as fp:
+        fp.write(row(3)[10:])
+    assert ingest.ingest(db, result_dir.parent) == 1
+    assert count(db) == 4
+    rows = db.execute("select id, host, partition, retries from result").fetchall()
+    assert rows == [(i, "node-1", "teton", None) for i in range(4)]
+    db.close()
+
+
+def test_ingest_chunks(tmp_path, result_dir, monkeypatch):
+    with open(result_dir / "output.csv", "a") as fp:
+        fp.writelines(row(i) for i in range(2, 50))
+    monkeypatch.setattr(ingest, "CHUNK_BYTES", 100)
+    db = ingest.connect(str(tmp_path / "db.sqlite"))
+    assert ingest.ingest(db, result_dir.parent) == 50
+    ids = [i[0] for i in db.execute("select id from result order by id")]
+    assert ids == list(range(50))
+    db.close()
+
+
+def test_create_schema_adds_columns(tmp_path, result_dir):
+    # A database from before the retries, core, exec and seq columns.
+    path = tmp_path / "db.sqlite"
+    old = list(ingest.RESULT_COLUMNS)[: list(ingest.RESULT_COLUMNS).index("retries")]
+    conn = sqlite3.connect(path)
+    conn.execute(f"create table result ({ingest._columns(old)})")
+    conn.commit()
+    conn.close()
+
+    db = ingest.connect(str(path))
+    columns = [i[1] for i in db.execute("pragma table_info(result)")]
+    assert columns == list(ingest.RESULT_COLUMNS)
+    assert ingest.ingest(db, result_dir.parent) == 2
+    # Connecting again leaves the columns as is.
+    db.close()
+    db = ingest.connect(str(path))
+    assert len(list(db.execute("pragma table_info(result)"))) == len(columns)
+    db.close()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./evaluator")
+from columns import GROUP_COLUMNS
+from instrumentation import coverage, estimate, interpolate, read_valgrind
+
+MASSIF = """desc: --stacks=yes
+cmd: HSO-c
+time_unit: i
+#-----------
+snapshot=0
+#-----------
+time=0
+mem_heap_B=100
+mem_heap_extra_B=10
+mem_stacks_B=5
+heap_tree=empty
+#-----------
+snapshot=1
+#-----------
+time=10
+mem_heap_B=1000
+mem_heap_extra_B=20
+mem_stacks_B=30
+heap_tree=peak
+#-----------
+snapshot=2
+#-----------
+time=20
+mem_heap_B=500
+mem_heap_extra_B=0
+mem_stacks_B=0
+heap_tree=empty
+"""
+
+CALLGRIND = """version: 1
+creator: callgrind-3.19.0
+events: Ir Dr Dw
+fl=sort.c
+fn=qsort
+1 10 4 2
+totals: 1200 300 150
+"""
+
+
+def test_read_valgrind(tmp_path):
+    (tmp_path / "massif.out").write_text(MASSIF)
+    assert read_valgrind(tmp_path / "massif.out") == {"mem_peak_B": 1050}
+
+    (tmp_path / "callgrind.out").write_text(CALLGRIND)
+    totals = read_valgrind(tmp_path / "callgrind.out")
+    assert totals == {"Ir": 1200, "Dr": 300, "Dw": 150}
+
+    cachegrind = CALLGRIND.replace("totals:", "summary:")
+    (tmp_path / "cachegrind.out").write_text(cachegrind)
+    assert read_valgrind(tmp_path / "cachegrind.out") == totals
+
+
+def make_groups(descriptions=("random",)):
+    return pd.DataFrame(
+        [
+            ("msort", description, threshold, size)
+            for description in descriptions
+            for threshold in (4, 8, 16, 32)
+            for size in (1000, 4000, 16000, 64000)
+        ],
+        columns=GROUP_COLUMNS,
+    )
+
+
+def value(threshold, size):
+    return threshold + 10 * np.log2(size)
+
+
+def test_interpolate():
+    groups = make_groups(("random", "ascending"))
+    measured = groups[
+        (groups["description"] == "random")
+        & groups["threshold"].isin([4, 16])
+        & groups["size"].isin([1000, 16000])
+    ].copy()
+    measured["Ir"] = value(measured["threshold"], measured["size"])
+    # Several rows of a group are averaged.
+    measured = pd.concat(
+        [measured.assign(Ir=measured["Ir"] - 1), measured.assign(Ir=measured["Ir"] + 1)]
+    )
+
+    out = interpolate(measured, groups, "Ir")
+    out = out.set_index(["description", "threshold", "size"]).sort_index()
+    status = out["Ir_status"]
+    assert status["random", 4, 1000] == "measured"
+    assert status["random", 8, 1000] == "interpolated"
+    assert status["random", 8, 4000] == "interpolated"
+    assert status["random", 32, 1000] == "extrapolated"
+    assert status["random", 8, 64000] == "extrapolated"
+    assert (status["ascending"] == "missing").all()
+    assert out.loc["ascending", "Ir"].isna().all()
+    assert (status["random"] == "measured").sum() == 4
+
+    # Linear in the threshold and log2(size) within the measured range, held
+    # constant past it.
+    assert out.loc[("random", 4, 1000), "Ir"] == pytest.approx(value(4, 1000))
+    assert out.loc[("random", 8, 4000), "Ir"] == pytest.approx(value(8, 4000))
+    assert out.loc[("random", 32, 4000), "Ir"] == pytest.approx(value(16, 4000))
+    assert out.loc[("random", 8, 64000), "Ir"] == pytest.approx(value(8, 16000))
+
+
+def test_coverage_and_estimate(tmp_path):
+    groups = make_groups()
+    base = groups.assign(run_type="base")
+    massif = groups[groups["size"] == 1000].assign(run_type="massif")
+    df = pd.concat([base, base, massif], ignore_index=True)
+
+    covered = coverage(df)
+    assert len(covered) == len(groups)
+    assert list(covered.columns) == GROUP_COLUMNS + [
+        "callgrind",
+        "cachegrind",
+        "massif",
+    ]
+    assert covered["massif"].sum() == 4
+    assert (covered["massif"] == (covered["size"] == 1000)).all()
+    assert not covered["callgrind"].any()
+
+    # A work queue result, with one valgrind output file missing.
+    (tmp_path / "valgrind").mkdir()
+    df["id"] = np.arange(len(df))
+    for _, row in df[df["run_type"] == "massif"].iterrows():
+        if row["threshold"] != 32:
+            path = tmp_path / "valgrind" / f"{row['id']}_massif.out"
+            path.write_text(MASSIF.replace("1000", str(1000 * row["threshold"])))
+    half = len(df) // 2
+    df[:half].to_csv(tmp_path / "output_0.csv", index=False)
+    df[half:].to_csv(tmp_path / "output_1.csv", index=False)
+
+    out = estimate(tmp_path, df).set_index(["threshold", "size"])
+    assert out.loc[(8, 1000), "massif_mem_peak_B"] == 8000 + 50
+    assert out.loc[(8, 1000), "massif_mem_peak_B_status"] == "measured"
+    assert out.loc[(32, 1000), "massif_mem_peak_B"] == 16000 + 50
+    assert out.loc[(32, 1000), "massif_mem_peak_B_status"] == "extrapolated"
+    assert out.loc[(8, 4000), "massif_mem_peak_B_status"] == "extrapolated"
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+import itertools
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./src")
+import jobs
+from plan import peak_rss
+
+EXECS = [Path("a/HSO-c"), Path("b/HSO-c-glibc")]
+THRESHOLD_METHODS = {"msort_heap_with_fast_ins", "msort_with_network"}
+THRESHOLDS = [4, 8, 16, 32]
+SWEEP = {
+    "execs": EXECS,
+    "methods": ["qsort", "msort_heap_with_fast_ins", "msort_with_network"],
+    "threshold_methods": THRESHOLD_METHODS,
+    "thresholds": THRESHOLDS,
+    "blocks": [3, 2],
+    "flags": jobs.BASE | jobs.CALLGRIND,
+}
+VALGRIND_SWEEP = dict(SWEEP, flags=jobs.BASE | jobs.CALLGRIND | jobs.MASSIF)
+# A single executable and block, without valgrind.
+SINGLE_SWEEP = dict(SWEEP, execs=EXECS[:1], blocks=[1], flags=jobs.BASE)
+
+
+@pytest.mark.parametrize("table", [SWEEP], indirect=True)
+def test_sweep(table):
+    pairs = 1 + 2 * len(THRESHOLDS)
+    assert len(table) == len(table.inputs) * pairs * 2 * len(EXECS)
+    assert table.num_units * len(EXECS) == len(table)
+
+    # Every unit has every executable once.
+    units = table.rows["exec"].reshape(-1, len(EXECS))
+    assert (np.sort(units, axis=1) == np.arange(len(EXECS))).all()
+
+    # Valgrind only with the first block.
+    first = table.rows["block"] == 0
+    assert (table.rows["flags"][first] == jobs.BASE | jobs.CALLGRIND).all()
+    assert (table.rows["flags"][~first] == jobs.BASE).all()
+    assert table.num_commands() == len(table) + np.count_nonzero(first)
+    assert table.num_commands() == sum(len(table.job(i)) for i in range(len(table)))
+
+
+@pytest.mark.parametrize("table", [dict(SWEEP, execs=EXECS[:1])], indirect=True)
+def test_job_commands(table):
+    for job_id in range(len(table)):
+        job = table.job(job_id)
+        for command in job.commands:
+            cols = command[command.index("--cols") + 1].split(",")
+            vals = command[command.index("--vals") + 1].split(",")
+            assert dict(zip(cols, vals))["id"] == str(job_id)
+            assert ("--threshold" in command) == (job.method in THRESHOLD_METHODS)
+
+
+@pytest.mark.parametrize("table", [VALGRIND_SWEEP], indirect=True)
+def test_job_flags(table):
+    first = int(np.flatnonzero(table.rows["block"] == 0)[0])
+    base, valgrind = table.job(first, jobs.BASE), table.job(first, jobs.VALGRIND)
+    assert len(base) + len(valgrind) == len(table.job(first)) == 3
+    assert base.commands == table.job(first).commands[:1]
+    assert all(i[0] == "valgrind" for i in valgrind.commands)
+
+
+@pytest.mark.parametrize("table", [VALGRIND_SWEEP], indirect=True)
+def test_render(table):
+    table.valgrind_opts = ["--foo"]
+    table.rows["seq"] = np.arange(len(table))
+    job_ids = np.random.default_rng(0).permutation(len(table))[:50]
+    expected = [line for i in job_ids for line in table.job(i).cli]
+    assert table.render(job_ids).splitlines() == expected
+
+
+def test_batch_bounds():
+    flags = np.random.default_rng(0).choice([jobs.BASE, jobs.BASE | jobs.MASSIF], 1000)
+    bounds = jobs.batch_bounds(flags, 100)
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(flags)
+    for (_, end), (start, _) in zip(bounds, bounds[1:]):
+        assert end == start
+
+    counts = 1 + (flags & jobs.MASSIF != 0)
+    sizes = [counts[a:b].sum() for a, b in bounds]
+    assert all(100 <= i <= 101 for i in sizes[:-1])
+    assert 0 < sizes[-1] <= 101
+
+
+@pytest.mark.parametrize("table", [SINGLE_SWEEP], indirect=True)
+@pytest.mark.parametrize("order", jobs.ORDERS)
+def test_order_units(table, order):
+    rows = table.rows
+    treatments = rows["method"].astype(np.int64) << 32 | rows["threshold"].astype(
+        np.uint32
+    )
+    units = jobs.order_units(
+        rows["input"], rows["block"], treatments, order, np.random.default_rng(0)
+    )
+    assert np.array_equal(np.sort(units), np.arange(len(rows)))
+
+    if order == "round-robin":
+        # Every input appears once before any input appears twice.
+        first_pass = rows["input"][units[: len(table.inputs)]]
+        assert len(set(first_pass)) == len(table.inputs)
+    if order == "latin":
+        # Every row (input) runs all of its units back to back.
+        runs = rows["input"][units].reshape(len(table.inputs), -1)
+        assert (runs == runs[:, :1]).all()
+
+
+def test_latin_square():
+    # As many rows as treatments, every treatment is at every position once.
+    k = 5
+    inputs = np.repeat(np.arange(k), k)
+    treatments = np.tile(np.arange(k), k)
+    units = jobs.order_units(
+        inputs, np.zeros_like(inputs), treatments, "latin", np.random.default_rng(1)
+    )
+    square = treatments[units].reshape(k, k)
+    for i in range(k):
+        assert len(set(square[:, i])) == k
+        assert len(set(square[i])) == k
+
+
+@pytest.mark.parametrize(
+    "user_input, expected",
+    [("512M", 512 << 20), ("64G", 64 << 30), ("1.5GB", 3 << 29), ("50%", 4 << 30)],
+)
+def test_parse_memory_arg(user_input, expected):
+    assert jobs.parse_memory_arg(user_input, available=8 << 30) == expected
+
+
+@pytest.mark.parametrize("user_input", ["lots", "0", "-1G"])
+def test_parse_memory_arg_invalid(user_input):
+    with pytest.raises(ValueError):
+        jobs.parse_memory_arg(user_input, available=8 << 30)
+
+
+def test_parse_noise_limits():
+    limits = jobs.parse_noise_limits("sw_cpu_migrations=0, sw_context_switches=5")
+    assert limits == {"sw_cpu_migrations": 0, "sw_context_switches": 5}
+    assert jobs.parse_noise_limits(None) == {}
+    with pytest.raises(ValueError, match="sw_context_switch'"):
+        jobs.parse_noise_limits("sw_context_switch=5")
+    with pytest.raises(ValueError):
+        jobs.parse_noise_limits("sw_cpu_migrations")
+
+
+def test_retry_noisy_jobs_missing_column(tmp_path):
+    scheduler = object.__new__(jobs.Scheduler)
+    scheduler.output = tmp_path / "output.csv"
+    scheduler.output.write_text("method,wall_nsecs,id,run_type\nqsort,10,0,base\n")
+    scheduler.noise_limits = {"sw_cpu_migrations": 0}
+    scheduler.retries = 1
+    with pytest.raises(ValueError, match="sw_cpu_migrations"):
+        scheduler._retry_noisy_jobs()
+
+
+def make_scheduler(table, sizes, budget):
+    """A scheduler of `table` with only the state admission control needs."""
+    scheduler = object.__new__(jobs.Scheduler)
+    scheduler.table = table
+    scheduler.sizes = np.asarray(sizes)
+    scheduler.memory_budget = budget
+    scheduler._lock = threading.Lock()
+    scheduler._admission = threading.Condition(scheduler._lock)
+    scheduler._reserved = {}
+    scheduler._memory_used = 0.0
+    scheduler._rss_scale = np.ones((len(table.methods), len(jobs.RUN_TYPES)))
+    scheduler._seq = itertools.count()
+    return scheduler
+
+
+def qsort_jobs(table) -> np.ndarray:
+    """Id of the qsort job of every input."""
+    qsort = table.methods.index("qsort")
+    job_ids = np.flatnonzero(table.rows["method"] == qsort)
+    return job_ids[np.argsort(table.rows["input"][job_ids])]
+
+
+@pytest.mark.parametrize("table", [SINGLE_SWEEP], indirect=True)
+def test_admit(table):
+    # The random inputs are big, the ascending ones small.
+    sizes = [10**7] * 3 + [10**5] * 3
+    big, small = peak_rss(10**7), peak_rss(10**5)
+    assert big > 3 * small
+    scheduler = make_scheduler(table, sizes, big + 2.5 * small)
+
+    by_input = qsort_jobs(table)
+    b0, b1, s2, s3, s4, b5 = by_input[[0, 1, 3, 4, 5, 2]]
+    lane = jobs.Lane("base", np.array([b0, b1, s2, s3, s4, b5]), jobs.BASE)
+    lane.placement = [None, None]
+
+    def admitted():
+        return scheduler._next_job(lane).job_id
+
+    assert admitted() == b0
+    # b1 doesn't fit next to b0, the small jobs are packed around it, one per
+    # worker in a row.
+    assert admitted() == s2
+    assert admitted() == s3
+    assert list(lane.queue) == [b0, s2, s3, b1, s4, b5]
+    assert lane.skipped == 2
+    assert scheduler._memory_used == big + 2 * small
+
+    # s4 fits once s2 is done, but b1 would starve.
+    scheduler._release(lane, s2)
+    assert scheduler._admit(lane) is None
+    scheduler._release(lane, s3)
+    scheduler._release(lane, b0)
+    assert admitted() == b1
+    assert lane.skipped == 0
+    assert admitted() == s4
+    assert scheduler._admit(lane) is None
+    scheduler._release(lane, b1)
+    assert admitted() == b5
+    assert scheduler._next_job(lane) is None
+
+    order = [b0, s2, s3, b1, s4, b5]
+    assert list(table.rows["seq"][order]) == list(range(len(order)))
+
+
+@pytest.mark.parametrize("table", [SINGLE_SWEEP], indirect=True)
+def test_admit_over_budget(table, capsys):
+    by_input = qsort_jobs(table)
+    scheduler = make_scheduler(table, [10**7] * 3 + [10**5] * 3, peak_rss(10**6))
+    lane = jobs.Lane("base", by_input[[0, 3]], jobs.BASE, [None, None])
+
+    # Above the whole budget, runs alone.
+    assert scheduler._next_job(lane).job_id == by_input[0]
+    assert "running it alone" in capsys.readouterr().err
+    assert scheduler._admit(lane) is None
+    scheduler._release(lane, by_input[0])
+    assert scheduler._next_job(lane).job_id == by_input[3]
+
+
+@pytest.mark.parametrize("table", [SINGLE_SWEEP], indirect=True)
+def test_admit_threads(table):
+    rng = random.Random(0)
+    sizes = [rng.choice([10**5, 10**6, 10**7]) for _ in table.inputs]
+    budget = 1.5 * peak_rss(10**7)
+    scheduler = make_scheduler(table, sizes, budget)
+    lane = jobs.Lane("base", np.arange(len(table)), jobs.BASE, [None] * 4)
+
+    dispatched, over = [], []
+
+    def worker():
+        while (job := scheduler._next_job(lane)) is not None:
+            with scheduler._lock:
+                dispatched.append(job.job_id)
+                if scheduler._memory_used > budget and len(scheduler._reserved) > 1:
+                    over.append(job.job_id)
+            time.sleep(rng.random() / 1000)
+            scheduler._release(lane, job.job_id)
+
+    threads = [threading.Thread(target=worker) for _ in lane.placement]
+    for i in threads:
+        i.start()
+    for i in threads:
+        i.join(timeout=30)
+    assert not any(i.is_alive() for i in threads)
+
+    assert sorted(dispatched) == list(range(len(table)))
+    assert not over
+    assert scheduler._memory_used == pytest.approx(0)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./evaluator")
+from columns import GROUP_COLUMNS
+from mpl import Result
+
+
+def make_runs(methods, description, runs=3):
+    rows = []
+    for method in methods:
+        for threshold in (4, 8):
+            for size in (1000, 4000):
+                for _ in range(runs):
+                    rows.append(
+                        {
+                            "method": method,
+                            "description": description,
+                            "threshold": threshold,
+                            "size": size,
+                            "wall_nsecs": size * threshold,
+                        }
+                    )
+    return pd.DataFrame(rows)
+
+
+def test_result_concats_worker_csvs(tmp_path, write_runs):
+    # A work queue with two workers, every one with its own groups.
+    first = make_runs(["qsort", "msort_heap_with_fast_ins"], "random")
+    second = make_runs(["qsort"], "ascending")
+    write_runs(tmp_path / "output_0.csv", first)
+    write_runs(tmp_path / "output_1.csv", second)
+
+    result = Result(tmp_path, persist_cache=True)
+    assert len(result.df) == len(first) + len(second)
+    groups = result.df.groupby(GROUP_COLUMNS, observed=True).ngroups
+    assert groups == 12
+    assert set(result.df["description"]) == {"random", "ascending"}
+    assert result.df["method"].dtype == "category"
+
+    # The cache follows every CSV, not just the first one.
+    key = result._avg_cache_path("")
+    more = make_runs(["qsort"], "descending")
+    write_runs(tmp_path / "output_1.csv", pd.concat([second, more]))
+    assert Result(tmp_path, persist_cache=True)._avg_cache_path("") != key
+    assert np.isclose(result.get_avg_df()[("mean", "wall_secs")].max(), 32000 / 1e9)
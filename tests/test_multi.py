@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import json
+import sys
+
+import pandas as pd
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./evaluator")
+from mpl import relative_to_baseline
+from multi import RESULT_KEYS, load_results, most_improved, summarize
+
+
+@pytest.fixture
+def result_dirs(tmp_path, write_runs):
+    """The same date on two partitions, msort is best at a different threshold."""
+    paths = []
+    for partition, walls in (
+        ("teton", {-1: 100, 4: 50, 8: 80}),
+        ("moran", {-1: 200, 4: 300, 8: 100}),
+    ):
+        path = tmp_path / partition / "2024-01-01"
+        path.mkdir(parents=True)
+        runs = pd.DataFrame(
+            [
+                ("qsort" if threshold == -1 else "msort", "random", threshold, 1000)
+                for threshold in walls
+                for _ in range(3)
+            ],
+            columns=["method", "description", "threshold", "size"],
+        )
+        runs["wall_nsecs"] = runs["threshold"].map(walls)
+        write_runs(path / "output.csv", runs)
+        details = {
+            "Executable": {
+                "Methods": {"All": ["qsort", "msort"], "Threshold": ["msort"]}
+            },
+            "Node": partition,
+        }
+        (path / "job_details.json").write_text(json.dumps(details))
+        paths.append(path)
+    return paths
+
+
+def test_same_result_names(result_dirs):
+    df = load_results(result_dirs, jobs=1)
+    assert df["result"].nunique() == 2
+    assert len(df) == 6
+
+    best = most_improved(relative_to_baseline(df, "qsort", keys=RESULT_KEYS))
+    best = best.set_index("host")
+    # Every result is relative to its own qsort.
+    assert best.loc["teton", "threshold"] == 4
+    assert best.loc["moran", "threshold"] == 8
+    assert list(best["relative"]) == [50, 50]
+
+    summary = summarize(best.reset_index())
+    assert list(summary["results"]) == [2]
+    assert list(summary["threshold_min"]) == [4]
+    assert list(summary["threshold_max"]) == [8]
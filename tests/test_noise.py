@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./evaluator")
+from noise import classify, get_weighted_avg_df, noise_score
+
+
+def make_runs(runs=8):
+    rows = []
+    for method in ("qsort", "msort_heap_with_fast_ins"):
+        for size in (1000, 4000):
+            for i in range(runs):
+                rows.append(
+                    {
+                        "method": method,
+                        "description": "random",
+                        "threshold": 8,
+                        "size": size,
+                        "wall_nsecs": size * (10 + i),
+                        "sw_task_clock": size * (10 + i) + 500,
+                        "sw_cpu_migrations": 0,
+                        "sw_context_switches": i % 2,
+                        "sw_page_faults": 100 + i % 3,
+                    }
+                )
+    return pd.DataFrame(rows)
+
+
+def test_classify():
+    df = make_runs()
+    df.loc[1, "sw_cpu_migrations"] = 1
+    df.loc[2, "sw_context_switches"] = 40
+    df.loc[3, ["sw_page_faults", "sw_cpu_migrations"]] = [5000, 2]
+    # Much more often than in the other group, but not within its own group.
+    df.loc[df["size"] == 4000, "sw_page_faults"] += 1000
+
+    flags = classify(df)
+    assert list(np.flatnonzero(flags["noisy"])) == [1, 2, 3]
+    assert flags.loc[1, "migrated"] and not flags.loc[1, "context_switches"]
+    assert flags.loc[2, "context_switches"] and not flags.loc[2, "migrated"]
+    assert flags.loc[3, "page_faults"] and flags.loc[3, "migrated"]
+    assert list(flags["noise_weight"][:5]) == [1, 0.5, 0.5, 0.25, 1]
+
+    # The wall time vs. task clock ratio isn't a cause, see the module doc.
+    df["wall_nsecs"] *= 2
+    assert classify(df)["noisy"].sum() == 3
+
+    flags["host"] = "node"
+    score = noise_score(flags)
+    assert score.loc["node", "runs"] == len(df)
+    assert score.loc["node", "score"] == pytest.approx(3 / len(df))
+
+
+def test_weighted_avg_df():
+    df = make_runs(runs=4)
+    df["noise_weight"] = np.tile([1, 0.5, 0.25, 1], len(df) // 4)
+    out = get_weighted_avg_df(df)
+    assert list(out["size"]) == [1000, 1000, 4000, 4000]
+
+    group = df[(df["method"] == "qsort") & (df["size"] == 1000)]
+    x, w = group["wall_nsecs"].to_numpy(float), group["noise_weight"].to_numpy()
+    mean = np.average(x, weights=w)
+    var = np.sum(w * (x - mean) ** 2) / (w.sum() - np.sum(w**2) / w.sum())
+    row = out[(out["method"] == "qsort") & (out["size"] == 1000)].iloc[0]
+    assert row[("mean", "wall_nsecs")] == pytest.approx(mean)
+    assert row[("std", "wall_nsecs")] == pytest.approx(np.sqrt(var))
+
+    # Equal weights are the plain mean and sample std.
+    df["noise_weight"] = 1.0
+    out = get_weighted_avg_df(df)
+    plain = df.groupby(["method", "size"])["wall_nsecs"].agg(["mean", "std"])
+    assert np.allclose(out[("mean", "wall_nsecs")], plain["mean"].sort_index(level=1))
+    assert np.allclose(out[("std", "wall_nsecs")], plain["std"].sort_index(level=1))
+    assert ("mean", "noise_weight") not in out.columns
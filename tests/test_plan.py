@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import csv
+import sys
+
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./src")
+import jobs
+import plan
+
+SWEEP = {
+    "methods": ["qsort", "basic_ins", "msort_heap_with_fast_ins"],
+    "threshold_methods": {"msort_heap_with_fast_ins"},
+    "flags": jobs.BASE | jobs.MASSIF,
+}
+
+
+def test_input_sizes(tmp_path, make_table):
+    (tmp_path / "details.json").write_text(
+        '{"minimum": 1000, "maximum": 3000, "increment": 1000}'
+    )
+    sizes = plan.input_sizes(tmp_path, make_table().inputs)
+    assert list(sizes) == [1000, 2000, 3000] * 2
+
+
+@pytest.mark.parametrize(
+    "table", [{**SWEEP, "output_chunks": i} for i in (0, 2)], indirect=True
+)
+def test_estimate(table):
+    output_chunks = table.output_chunks
+    model = plan.CostModel()
+    sizes = [1000, 2000, 3000] * 2
+    groups = plan.estimate(table, sizes, model, jobs.RUN_TYPES)
+
+    (total,) = plan.summarize(groups)
+    assert total["commands"] == table.num_commands()
+    assert total["sorts"] == 10 * table.num_commands()
+    rows = (output_chunks or 10) * table.num_commands()
+    assert total["csv_bytes"] == pytest.approx(rows * model.row_bytes)
+
+    # Insertion sort is quadratic, the rest take n * log2(n) steps.
+    by_method = {g["name"]: g for g in plan.summarize(groups, "method")}
+    assert by_method["basic_ins"]["cpu_nsecs"] > 10 * by_method["qsort"]["cpu_nsecs"]
+    assert plan.wall_nsecs(total, 4) >= total["cpu_nsecs"] / 4
+
+
+def test_from_results(tmp_path):
+    with open(tmp_path / "output.csv", "w", newline="") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(["method", "size", "wall_nsecs", "description", "run_type"])
+        for n in (1000, 4000):
+            wall = 2 * float(plan.sort_steps(n))
+            writer.writerow(["qsort", n, wall, "random", "base"])
+
+    with open(tmp_path / "memory.csv", "w", newline="") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(jobs.MEMORY_COLUMNS)
+        rss = int(plan.peak_rss(4000) * 3 / 1024)
+        writer.writerow([0, "HSO-c", "qsort", "random", 4000, "base", 0, rss, 0])
+        writer.writerow([1, "HSO-c", "qsort", "random", 1000, "base", 0, "", 0])
+
+    model = plan.CostModel.from_results([tmp_path])
+    assert model.num_runs == 2
+    expected = 3 * plan.peak_rss(4000)
+    assert model.peak_rss(4000, "qsort") == pytest.approx(expected, rel=1e-3)
+    assert model.peak_rss(4000, "cxx_std") == plan.peak_rss(4000)
+    assert model.step("qsort", "random") == pytest.approx(2)
+    # Unseen data types use the same method, valgrind scales the base time.
+    assert model.step("qsort", "ascending") == pytest.approx(2)
+    assert model.step("qsort", "random", "massif") == pytest.approx(
+        2 * plan.VALGRIND_SLOWDOWN["massif"]
+    )
+    assert model.step("cxx_std", "random") == plan.DEFAULT_STEP_NSECS
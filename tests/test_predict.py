@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./evaluator")
+from predict import ThresholdModel, main
+
+
+def make_best(num_results=6, seed=0):
+    """Best thresholds of two groups, log2-linear in two random features."""
+    rng = np.random.default_rng(seed)
+    results = [f"r{i}" for i in range(num_results)]
+    features = pd.DataFrame(
+        rng.normal(size=(num_results, 2)), index=results, columns=["a", "b"]
+    )
+    rows = []
+    for size, scale in ((1000, 1), (4000, -1)):
+        log2 = 4 + scale * features["a"] + 0.5 * features["b"]
+        log2 += rng.normal(0, 0.2, num_results)
+        for result, threshold in zip(results, 2**log2):
+            rows.append((result, "msort", "random", size, threshold))
+    best = pd.DataFrame(
+        rows, columns=["result", "method", "description", "size", "threshold"]
+    )
+    return best, features
+
+
+def test_loo_error():
+    best, features = make_best()
+    alpha = 0.5
+    model = ThresholdModel(alpha=alpha).fit(best, features)
+    assert list(model.groups["num_results"]) == [6, 6]
+
+    # Refit without every result in turn, on the same standardized features.
+    x = features.to_numpy()
+    x = (x - x.mean(axis=0)) / x.std(axis=0)
+    for group, size in enumerate(model.groups["size"]):
+        y = np.log2(best[best["size"] == size]["threshold"].to_numpy())
+        errors = []
+        for i in range(len(x)):
+            keep = np.arange(len(x)) != i
+            x_mean, y_mean = x[keep].mean(axis=0), y[keep].mean()
+            xc = x[keep] - x_mean
+            gram = xc.T @ xc + alpha * np.eye(x.shape[1])
+            w = np.linalg.solve(gram, xc.T @ (y[keep] - y_mean))
+            errors.append(y[i] - (y_mean + (x[i] - x_mean) @ w))
+        loo_error = np.sqrt(np.mean(np.square(errors)))
+        assert model.groups["loo_error"][group] == pytest.approx(loo_error)
+
+
+def test_loo_error_missing_results():
+    best, features = make_best()
+    # The larger inputs are only seen on 3 of the results.
+    best = best[(best["size"] == 1000) | best["result"].isin(["r0", "r1", "r2"])]
+    model = ThresholdModel().fit(best, features)
+    assert list(model.groups["num_results"]) == [6, 3]
+    assert model.groups["loo_error"].notna().all()
+
+    # A single result has no error.
+    model = ThresholdModel().fit(best[best["result"] == "r0"], features)
+    assert model.groups["loo_error"].isna().all()
+
+
+def test_main_same_result_names(tmp_path, write_runs):
+    # The same date of two partitions, with different CPUs.
+    paths = []
+    for partition, count in (("teton", 16), ("moran", 32)):
+        path = tmp_path / partition / "2024-01-01"
+        path.mkdir(parents=True)
+        runs = pd.DataFrame(
+            [
+                ("msort", "random", threshold, 1000, threshold * count)
+                for threshold in (4, 8, 16)
+            ],
+            columns=["method", "description", "threshold", "size", "wall_nsecs"],
+        )
+        write_runs(path / "output.csv", runs)
+        details = {
+            "Executable": {"Methods": {"All": ["msort"], "Threshold": ["msort"]}},
+            "CPU Info": {"count": count, "l2_cache_size": 1 << 20},
+        }
+        (path / "job_details.json").write_text(json.dumps(details))
+        paths.append(str(path))
+
+    cpu = tmp_path / "cpu.json"
+    cpu.write_text(json.dumps({"count": 24, "l2_cache_size": 1 << 20}))
+    output = tmp_path / "pred.csv"
+    main(paths + ["-j", "1", "--cpu", str(cpu), "-o", str(output)])
+    pred = pd.read_csv(output)
+    assert list(pred["num_results"]) == [2]
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import io
+import sys
+import time
+
+import numpy as np
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./src/python")
+from qst import METHODS, THRESHOLD_METHODS
+from qst.bench import CSV_HEADER, measure, write_output
+from qst.sorts import batcher_network, insertion_network, sort_rows
+
+rng = np.random.default_rng(0)
+inputs = {
+    "random": lambda n: rng.integers(-(2**62), 2**62, n),
+    "duplicates": lambda n: rng.integers(-5, 5, n),
+    "ascending": lambda n: np.arange(n),
+    "descending": lambda n: np.arange(n)[::-1],
+    "single_num": lambda n: np.full(n, 7),
+}
+
+
+@pytest.mark.parametrize("width", range(1, 33))
+@pytest.mark.parametrize("network", [insertion_network, batcher_network])
+def test_networks(network, width):
+    rows = rng.integers(-3, 3, (200, width))
+    expected = np.sort(rows, axis=1)
+    sort_rows(rows, network(width))
+    assert np.array_equal(rows, expected)
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 15, 16, 17, 255, 1000, 4099])
+@pytest.mark.parametrize("desc", inputs)
+def test_methods(method, size, desc):
+    data = inputs[desc](size).astype(np.int64)
+    thresholds = [1, 2, 3, 8, 13, 64] if method in THRESHOLD_METHODS else [0]
+    for threshold in thresholds:
+        arr = data.copy()
+        METHODS[method](arr, threshold)
+        assert np.array_equal(arr, np.sort(data)), threshold
+
+
+def test_output_schema():
+    f = io.StringIO()
+    results = [dict.fromkeys(CSV_HEADER[4:], 1)] * 2
+    write_output(f, "qsort", "in.gz", 10, 0, results, "id,description", "3,random")
+    header, *rows = f.getvalue().splitlines()
+    assert header.split(",") == CSV_HEADER + ["id", "description"]
+    assert len(rows) == 2
+    assert all(len(i.split(",")) == len(CSV_HEADER) + 2 for i in rows)
+
+
+def test_measure():
+    def sleep_sort(arr, threshold):
+        time.sleep(0.2)
+        arr.sort()
+
+    result = measure(sleep_sort, np.arange(1000)[::-1], 0)
+    assert list(result) == CSV_HEADER[4:]
+    # CPU time, same as HSO-c, sleeping is not counted.
+    assert 0 < result["wall_nsecs"] < 100_000_000
+    assert result["hw_cpu_cycles"] == 0
+
+
+def test_native():
+    native = pytest.importorskip("qst.native")
+    try:
+        lib = native.Library()
+    except FileNotFoundError:
+        pytest.skip("libhso.so is not built")
+
+    for method in native.METHODS:
+        arr = inputs["duplicates"](1000)
+        expected = np.sort(arr)
+        lib.sort(arr, method, 8)
+        assert np.array_equal(arr, expected), method
+
+    with pytest.raises(ValueError):
+        lib.sort(np.arange(10, dtype=np.int32), "qsort")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import csv
+import sys
+
+import numpy as np
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./src")
+import jobs
+import sample
+
+TOOLS = list(jobs.VALGRIND_TOOLS)
+SIZES = np.array([1000 * 4**i for i in range(8)] * 2)
+THRESHOLDS = [4, 8, 12, 16, 20, 24, 28, 32]
+SWEEP = {
+    "num_inputs": 8,
+    "methods": ["qsort", "msort_heap_with_fast_ins"],
+    "threshold_methods": {"msort_heap_with_fast_ins"},
+    "thresholds": THRESHOLDS,
+    "flags": jobs.BASE | jobs.CALLGRIND | jobs.MASSIF,
+}
+
+
+def test_parse_sample_arg():
+    policy = sample.parse_sample_arg("sizes=cache,thresholds=3,massif.runs=2", TOOLS)
+    assert policy["callgrind"] == {"sizes": "cache", "thresholds": 3, "runs": 1}
+    assert policy["massif"] == {"sizes": "cache", "thresholds": 3, "runs": 2}
+
+
+@pytest.mark.parametrize("user_input", ["sizes", "foo=1", "bar.runs=1", "runs=0"])
+def test_parse_sample_arg_invalid(user_input):
+    with pytest.raises(ValueError):
+        sample.parse_sample_arg(user_input, TOOLS)
+
+
+@pytest.mark.parametrize("table", [SWEEP], indirect=True)
+def test_sample_sizes(table):
+    descriptions = table.descriptions
+    keep = sample.sample_sizes(SIZES, descriptions, 3)
+    assert list(np.flatnonzero(keep)) == [0, 4, 7, 8, 12, 15]
+
+    # 64K fits 8000 elements, not 32000.
+    keep = sample.sample_sizes(SIZES, descriptions, "cache", [64 << 10])
+    assert list(SIZES[keep]) == [4000, 16000] * 2
+    assert sample.sample_sizes(SIZES, descriptions, "cache").all()
+
+
+@pytest.mark.parametrize("table", [SWEEP], indirect=True)
+def test_sample_jobs(tmp_path, table):
+    with open(tmp_path / "output.csv", "w", newline="") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(["method", "description", "size", "threshold", "wall_nsecs"])
+        for t in THRESHOLDS:
+            writer.writerow(["msort_heap_with_fast_ins", "random", 1000, t, abs(t - 24)])
+    fastest = sample.fastest_thresholds([tmp_path])
+    assert fastest == {("msort_heap_with_fast_ins", "random", 1000): 24}
+
+    policy = sample.parse_sample_arg("thresholds=3,massif.sizes=2", TOOLS)
+    tools = {jobs.CALLGRIND: "callgrind", jobs.MASSIF: "massif"}
+    sample.sample_jobs(table, SIZES, policy, tools, fastest=fastest)
+    assert table.valgrind_runs == {"callgrind": 1, "massif": 1}
+
+    rows = table.rows
+    assert (rows["flags"] & jobs.BASE).all()
+    callgrind = rows[(rows["flags"] & jobs.CALLGRIND) != 0]
+    sampled = set(callgrind["threshold"][callgrind["threshold"] >= 0].tolist())
+    # Centered on 24 everywhere, the only measured method.
+    assert sampled == {20, 24, 28}
+    assert (callgrind["threshold"] < 0).sum() == len(table.inputs)
+
+    massif = rows[(rows["flags"] & jobs.MASSIF) != 0]
+    assert set(SIZES[massif["input"]].tolist()) == {1000, 1000 * 4**7}
+
+    job = table.job(int(np.flatnonzero(rows["flags"] & jobs.MASSIF)[0]))
+    runs = [i[i.index("--runs") + 1] for i in job.commands]
+    assert runs == ["10", "1", "1"]
+    assert table.render([job.job_id]).splitlines() == job.cli
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./evaluator")
+from significance import analyze, bootstrap_speedup, mann_whitney, pad_groups
+
+
+def test_pad_groups():
+    values = np.array([1.0, 2, 3, 4, 5])
+    out, counts = pad_groups(values, np.array([2, 0, 2, 0, 0]), 4)
+    assert list(counts) == [3, 0, 2, 0]
+    assert out.shape == (4, 3)
+    assert list(out[0]) == [2, 4, 5]
+    assert list(out[2, :2]) == [1, 3]
+    assert np.isnan(out[2, 2]) and np.isnan(out[[1, 3]]).all()
+
+    out, counts = pad_groups(np.empty(0), np.empty(0, dtype=np.intp), 2)
+    assert out.shape == (2, 1) and list(counts) == [0, 0]
+
+
+def test_mann_whitney():
+    # Pooled: 1 2 3 3 3 4 5 6 7, a single tie of three values.
+    # U = 5 + 5 + 4.5 + 4.5 = 19, mu = 4 * 5 / 2 = 10,
+    # var = 4 * 5 / 12 * (10 - (27 - 3) / (9 * 8)) = 16.1111,
+    # z = (19 - 10 - 0.5) / sqrt(var) = 2.1177, p = 0.0342.
+    x, nx = pad_groups(np.array([1.0, 2, 3, 3]), np.zeros(4, dtype=np.intp), 1)
+    y, ny = pad_groups(np.array([3.0, 4, 5, 6, 7]), np.zeros(5, dtype=np.intp), 1)
+    u, p = mann_whitney(x, nx, y, ny)
+    assert u[0] == 19
+    assert p[0] == pytest.approx(0.034204, rel=1e-4)
+
+    # Symmetric, and every row is independent of the padding of the others.
+    u, p_swapped = mann_whitney(y, ny, x, nx)
+    assert u[0] == 4 * 5 - 19 and p_swapped[0] == pytest.approx(p[0])
+    values = np.array([1.0, 2, 3, 3, 10, 10, 10])
+    xs, nxs = pad_groups(values, np.array([0, 0, 0, 0, 1, 1, 1]), 2)
+    ys, nys = pad_groups(np.array([3.0, 4, 5, 6, 7, 10]), np.array([0] * 5 + [1]), 2)
+    u, p = mann_whitney(xs, nxs, ys, nys)
+    assert u[0] == 19 and p[0] == pytest.approx(0.034204, rel=1e-4)
+    # Only ties, no variance.
+    assert u[1] == 1.5 and p[1] == 1
+
+
+def test_bootstrap_speedup():
+    codes = np.repeat([0, 1], [4, 6])
+    x, nx = pad_groups(np.array([2.0] * 4 + [1, 2, 3, 4, 5, 6]), codes, 2)
+    y, ny = pad_groups(np.array([4.0] * 5 + [7.0] * 3), np.repeat([0, 1], [5, 3]), 2)
+
+    low, high = bootstrap_speedup(x, nx, y, ny, num_resamples=500, rng=0)
+    # Constant runs, every resample has the same ratio.
+    assert low[0] == high[0] == 2
+    # The padding is never drawn, mean(x) is within [1, 6].
+    assert 7 / 6 <= low[1] < 2 < high[1] <= 7
+    again = bootstrap_speedup(x, nx, y, ny, num_resamples=500, rng=0)
+    assert list(again[0]) == list(low) and list(again[1]) == list(high)
+
+    narrow = bootstrap_speedup(x, nx, y, ny, confidence=0.5, num_resamples=500, rng=0)
+    assert low[1] < narrow[0][1] < narrow[1][1] < high[1]
+
+
+def test_analyze_near_best():
+    rng = np.random.default_rng(0)
+    rows = []
+    for method, threshold, mean in (
+        ("qsort", -1, 100),
+        ("msort", 4, 80),
+        ("msort", 8, 79),
+        ("msort", 16, 95),
+    ):
+        for wall in rng.normal(mean, 1, 20):
+            rows.append((method, "random", threshold, 1000, wall))
+    df = pd.DataFrame(
+        rows, columns=["method", "description", "threshold", "size", "wall_nsecs"]
+    )
+
+    table = analyze(df, num_resamples=500, seed=0).set_index("threshold")
+    assert list(table.index) == [4, 8, 16]
+    assert table.loc[8, "best"] and table["best"].sum() == 1
+    assert table.loc[4, "near_best"] and table.loc[8, "near_best"]
+    assert not table.loc[16, "near_best"]
+    assert table["significant"].all()
+    assert table.loc[8, "speedup"] == pytest.approx(100 / 79, rel=0.01)
+
+    with pytest.raises(ValueError):
+        analyze(df, baseline="basic_ins")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+
+# HACK: There really isn't a better way to do this just for testing IMO.
+sys.path.insert(0, "./src")
+from workqueue import WorkQueue
+
+
+def test_claim(tmp_path):
+    tasks = [[0, 1], [2, 3], [4, 5]]
+    a = WorkQueue.create(tmp_path, tasks, worker="a")
+    b = WorkQueue(tmp_path, worker="b")
+
+    # Tasks are claimed in order, once.
+    claimed = [a.claim(), b.claim(), a.claim()]
+    assert [i.job_ids for i in claimed] == tasks
+    assert a.claim() is None and b.claim() is None
+    assert a.status() == {"pending": 0, "leased": 3, "done": 0, "failed": 0}
+
+    assert a.complete(claimed[0])
+    assert b.fail(claimed[1])
+    assert a.complete(claimed[2])
+    assert a.status() == {"pending": 0, "leased": 0, "done": 2, "failed": 1}
+
+
+def test_expired_lease(tmp_path):
+    a = WorkQueue.create(tmp_path, [[0]], lease=60, max_attempts=2, worker="a")
+    b = WorkQueue(tmp_path, lease=60, max_attempts=2, worker="b")
+
+    task = a.claim()
+    assert b.requeue_expired() == 0
+
+    # Worker a died, b picks the task up as another attempt.
+    old = time.time() - 120
+    os.utime(task.path, (old, old))
+    assert b.requeue_expired() == 1
+    retry = b.claim()
+    assert retry.attempt == 1 and retry.job_ids == [0]
+    assert not a.renew(task)
+    assert not a.complete(task)
+
+    # Out of attempts
+    os.utime(retry.path, (old, old))
+    assert a.requeue_expired() == 0
+    assert a.status() == {"pending": 0, "leased": 0, "done": 0, "failed": 1}